@@ -1,5 +1,20 @@
 # ---------------------------------------------------------------------------- #
 
-from .src.app import app
+from typing import Any
+
+# ---------------------------------------------------------------------------- #
+
+
+def __getattr__(name: str) -> Any:
+    """
+    Import the web application lazily (e.g. for uvicorn's "mrkr:app"). The
+    OCR worker processes import parts of this package, and must not create
+    the application, its database engines and its worker threads.
+    """
+    if name == "app":
+        from .src.app import app
+        return app
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 # ---------------------------------------------------------------------------- #
@@ -2,36 +2,58 @@
 
 from fastapi import FastAPI, Request, Response, Form, HTTPException, Depends
 from fastapi.responses import HTMLResponse, RedirectResponse
+from fastapi.responses import StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
 from fastapi.exceptions import RequestValidationError
 from starlette.middleware.gzip import GZipMiddleware
 from starlette.exceptions import HTTPException as StarlettHTTPException
-from typing import Annotated, Callable, List
+from typing import Annotated, AsyncGenerator, BinaryIO, Callable, Generator
+from typing import List, Sequence
+from PIL import features
+import contextlib
+import email.utils
 import datetime
+import math
 import os
 
 # ---------------------------------------------------------------------------- #
 
 from .logging import Logger
 from .config import config
-from .database import Database
+from .database import AsyncDatabase, Database
 from .session import SessionManager
-from .project import ProjectManager
+from .project import AsyncProjectManager, ProjectManager
 from .worker import WorkerManager
 from .file import FileProviderFactory
 from .models import *
 
 # ---------------------------------------------------------------------------- #
 
-app = FastAPI()
+
+@contextlib.asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncGenerator[None, None]:
+    """
+    Close the pooled database connections once the application stops.
+    """
+    yield
+
+    await database.dispose()
+
+    logger.info("Database connections closed.")
+
+app = FastAPI(lifespan=lifespan)
 
 app.mount("/static", StaticFiles(directory="mrkr/static"), name="static")
 app.add_middleware(GZipMiddleware, minimum_size=1000)
 
 logger = Logger(name="mrkr.app")
 templates = Jinja2Templates(directory="mrkr/templates", autoescape=True)
-database = Database(alias="POSTGRES")
+# requests are handled with an async database, background workers get a
+# pool of their own, so that long OCR transactions cannot take the
+# connections of interactive requests
+database = AsyncDatabase(alias="POSTGRES")
+worker_database = Database(alias="POSTGRES", role="worker")
 
 worker = WorkerManager()
 
@@ -58,6 +80,112 @@ def url_path_for(name: str) -> str:
 # ---------------------------------------------------------------------------- #
 
 
+def page_image_headers(
+    task: Task,
+    page: int,
+    version: str | None,
+    variant: str | None = None
+) -> dict[str, str]:
+    """
+    Return the caching headers for a task's page image. Image URLs that carry
+    the file's etag as version never change and may be cached indefinitely.
+    """
+    if task.etag is None:
+        return {}
+
+    if variant:
+        headers = {"ETag": f'"{task.etag}-{page}-{variant}"'}
+    else:
+        headers = {"ETag": f'"{task.etag}-{page}"'}
+
+    if task.modified:
+        headers["Last-Modified"] = email.utils.format_datetime(
+            task.modified.astimezone(datetime.timezone.utc), usegmt=True)
+
+    if version == task.etag:
+        headers["Cache-Control"] = \
+            f"private, max-age={config.image_max_age}, immutable"
+    else:
+        headers["Cache-Control"] = "private, no-cache"
+
+    return headers
+
+
+def negotiate_image_format(
+    request: Request
+) -> ImageFormat:
+    """
+    Choose the most compact image format the client accepts (and that Pillow
+    is able to encode).
+    """
+    accept = request.headers.get("Accept", "")
+
+    for format in (ImageFormat.avif, ImageFormat.webp):
+        if format.media_type in accept and features.check(format.value.lower()):
+            return format
+
+    return ImageFormat.jpeg
+
+
+def requested_image_width(
+    width: int | None,
+    dpr: float
+) -> int | None:
+    """
+    Return the width (in pixels) an image should be downscaled to. Widths are
+    rounded up to steps so that only a few variants per page are cached.
+    """
+    if width is None or width <= 0:
+        return None
+
+    dpr = min(max(dpr, 1.0), config.image.max_dpr)
+    step = config.image.width_step
+
+    return math.ceil(width * dpr / step) * step
+
+
+def file_response(
+    file: BinaryIO,
+    media_type: str,
+    headers: dict[str, str]
+) -> Response:
+    """
+    Stream an open file (e.g. a page cache entry) to the client in chunks,
+    without loading it into memory. The file is closed once it is sent.
+    """
+    size = file.seek(0, os.SEEK_END)
+    file.seek(0)
+
+    def chunks() -> Generator[bytes, None, None]:
+        with file:
+            while chunk := file.read(config.image.chunk_size):
+                yield chunk
+
+    return StreamingResponse(
+        content=chunks(), media_type=media_type,
+        headers={**headers, "Content-Length": str(size)})
+
+
+def is_not_modified(
+    request: Request,
+    headers: dict[str, str]
+) -> bool:
+    """
+    Check whether the client's cached copy (If-None-Match) is still valid.
+    """
+    if_none_match = request.headers.get("If-None-Match")
+
+    if not if_none_match or "ETag" not in headers:
+        return False
+
+    tags = [tag.strip().removeprefix("W/")
+            for tag in if_none_match.split(",")]
+
+    return "*" in tags or headers["ETag"] in tags
+
+# ---------------------------------------------------------------------------- #
+
+
 @app.middleware("http")
 async def add_process_time_header(
     request: Request,
@@ -74,6 +202,8 @@ async def add_process_time_header(
     response = await call_next(request)
 
     if "/static" in request.url.path:
+        response.headers.setdefault(
+            "Cache-Control", f"public, max-age={config.static_max_age}")
         return response
 
     response.headers["Access-Control-Allow-Origin"] = "https://yoursite.com"
@@ -95,9 +225,12 @@ async def add_process_time_header(
     # response.headers["X-Frame-Options"] = "DENY"
     response.headers["X-XSS-Protection"] = "1; mode=block"
 
-    response.headers["Cache-Control"] = "no-cache, no-store, must-revalidate"
-    response.headers["Pragma"] = "no-cache"
-    response.headers["Expires"] = "0"
+    # responses may opt into caching by setting their own cache control
+    if "Cache-Control" not in response.headers:
+        response.headers["Cache-Control"] = \
+            "no-cache, no-store, must-revalidate"
+        response.headers["Pragma"] = "no-cache"
+        response.headers["Expires"] = "0"
 
     return response
 
@@ -335,7 +468,7 @@ async def projects_page(
     """
     Display the projects page.
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     projects = await manager.list_projects()
 
@@ -361,7 +494,7 @@ async def project_page(
     """
     Display the project page.
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     project = await manager.get_project(id=id)
 
@@ -391,7 +524,7 @@ async def scan_project(
     """
     Scan a project's source and update the task list accordingly.
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     project = await manager.get_project(id=id)
 
@@ -402,7 +535,7 @@ async def scan_project(
         project.status = ProjectStatus.scan_pending
         project.last_scan = datetime.datetime.now()
         session.database.add(project)
-        session.database.commit()
+        await session.database.commit()
 
         worker.put("scan-project", id=project.id)
         logger.debug("Project scan queued.")
@@ -421,7 +554,7 @@ async def scan_project_worker(
     """
     Scan a project's source and update the task list accordingly.
     """
-    with database.session() as session:
+    with worker_database.session() as session:
         manager = ProjectManager(session=session)
 
         project = await manager.get_project(id=id)
@@ -444,13 +577,28 @@ async def task_page(
     """
     Display the task page.
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     task = await manager.get_task(id=id)
 
     if not task:
         raise HTTPException(status_code=400, detail="Bad Request")
 
+    # the thumbnail is stretched to the preview's width until it is replaced
+    image_width = config.image.preview_width
+    blocks, links = [], {}
+    if task.ocr and page < len(task.ocr.pages):
+        image_width = min(image_width, int(task.ocr.pages[page].width))
+
+        blocks = await manager.get_page_blocks(page=task.ocr.pages[page])
+        links = await manager.get_page_links(page=task.ocr.pages[page])
+
+    try:
+        max_pages = await manager.get_page_count(task=task)
+    except Exception as exception:
+        logger.error(f"Pages of task {task.id} not counted: {exception}")
+        max_pages = 0
+
     return templates.TemplateResponse(
         request=session.request,
         name="page-task.jinja",
@@ -459,7 +607,10 @@ async def task_page(
             "config": config.htmx_config,
             "task": task,
             "page": page,
-            "max_pages": len(task.ocr.pages) if task.ocr else 0,
+            "max_pages": max_pages,
+            "image_width": image_width,
+            "blocks": blocks,
+            "links": links,
         }
     )
 
@@ -471,22 +622,205 @@ async def task_page(
 async def task_image(
     session: AuthHttpSessionDep,
     id: int,
-    page: int = 0
+    page: int = 0,
+    width: int | None = None,
+    dpr: float = 1.0,
+    v: str | None = None
 ) -> Response:
     """
-    Return a source file's page as an image.
+    Return a source file's page as an image. The format is negotiated using
+    the Accept header, and the image is downscaled to the requested width
+    (in CSS pixels, multiplied by the device pixel ratio).
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     task = await manager.get_task(id=id)
 
     if not task:
         raise HTTPException(status_code=400, detail="Bad Request")
 
-    content = FileProviderFactory.get_provider(
-        task.project.provider).file_to_jpeg_bytes(uri=task.uri, page=page)
+    format = negotiate_image_format(request=session.request)
+    width = requested_image_width(width=width, dpr=dpr)
+
+    headers = page_image_headers(
+        task=task, page=page, version=v, variant=f"{format.value}-{width}")
+    headers["Vary"] = "Accept"
+
+    if is_not_modified(request=session.request, headers=headers):
+        return Response(status_code=304, headers=headers)
 
-    return Response(content=content, media_type="image/jpeg")
+    file = await manager.get_page_image(
+        task=task, page=page, format=format, width=width)
+
+    return file_response(
+        file=file, media_type=format.media_type, headers=headers)
+
+# ---------------------------------------------------------------------------- #
+
+
+async def task_pyramid_response(
+    session: SessionManager,
+    id: int,
+    page: int,
+    variant: str,
+    version: str | None,
+    media_type: str = "image/jpeg"
+) -> Response:
+    """
+    Return a variant of a source file's page pyramid.
+    """
+    manager = AsyncProjectManager(session=session.database)
+
+    task = await manager.get_task(id=id)
+
+    if not task:
+        raise HTTPException(status_code=400, detail="Bad Request")
+
+    headers = page_image_headers(
+        task=task, page=page, version=version, variant=variant)
+
+    if is_not_modified(request=session.request, headers=headers):
+        return Response(status_code=304, headers=headers)
+
+    file = await manager.get_pyramid_image(
+        task=task, page=page, variant=variant)
+
+    if file is None:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    return file_response(file=file, media_type=media_type, headers=headers)
+
+
+@app.get("/task/thumbnail")
+async def task_thumbnail(
+    session: AuthHttpSessionDep,
+    id: int,
+    page: int = 0,
+    v: str | None = None
+) -> Response:
+    """
+    Return a thumbnail of a source file's page.
+    """
+    return await task_pyramid_response(
+        session=session, id=id, page=page, variant="thumbnail", version=v)
+
+
+@app.get("/task/preview")
+async def task_preview(
+    session: AuthHttpSessionDep,
+    id: int,
+    page: int = 0,
+    v: str | None = None
+) -> Response:
+    """
+    Return a screen-sized preview of a source file's page.
+    """
+    return await task_pyramid_response(
+        session=session, id=id, page=page, variant="preview", version=v)
+
+
+@app.get("/task/tiles")
+async def task_tiles(
+    session: AuthHttpSessionDep,
+    id: int,
+    page: int = 0,
+    v: str | None = None
+) -> Response:
+    """
+    Return the layout of the zoom tiles of a source file's page.
+    """
+    return await task_pyramid_response(
+        session=session, id=id, page=page, variant="manifest", version=v,
+        media_type="application/json")
+
+
+@app.get("/task/tile")
+async def task_tile(
+    session: AuthHttpSessionDep,
+    id: int,
+    x: int,
+    y: int,
+    page: int = 0,
+    v: str | None = None
+) -> Response:
+    """
+    Return a full resolution zoom tile of a source file's page.
+    """
+    return await task_pyramid_response(
+        session=session, id=id, page=page, variant=f"tile-{x}-{y}",
+        version=v)
+
+# ---------------------------------------------------------------------------- #
+
+
+async def get_task_page(
+    session: SessionManager,
+    id: int,
+    page: int
+) -> Page:
+    """
+    Return a page of a task's current OCR run.
+    """
+    manager = AsyncProjectManager(session=session.database)
+
+    task = await manager.get_task(id=id)
+
+    if not task:
+        raise HTTPException(status_code=400, detail="Bad Request")
+
+    result = await manager.get_page(task=task, page=page)
+
+    if not result:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+    return result
+
+
+@app.get("/task/blocks/region", response_model=List[PageBlock])
+async def task_blocks_region(
+    session: AuthHttpSessionDep,
+    id: int,
+    left: float,
+    top: float,
+    right: float,
+    bottom: float,
+    page: int = 0
+) -> Sequence[PageBlock]:
+    """
+    Return the blocks of a task's page that intersect a rectangle (given in
+    percent of the page's dimensions), in reading order.
+    """
+    if left > right or top > bottom:
+        raise HTTPException(status_code=400, detail="Bad Request")
+
+    manager = AsyncProjectManager(session=session.database)
+
+    result = await get_task_page(session=session, id=id, page=page)
+
+    return await manager.find_blocks(
+        page=result, left=left, top=top, right=right, bottom=bottom)
+
+
+@app.get("/task/blocks/nearest", response_model=PageBlock | None)
+async def task_blocks_nearest(
+    session: AuthHttpSessionDep,
+    id: int,
+    x: float,
+    y: float,
+    page: int = 0,
+    max_distance: float | None = None
+) -> PageBlock | None:
+    """
+    Return the block of a task's page that is closest to a point (given in
+    percent of the page's dimensions), or null if there is no block within
+    max_distance (in percent of the page's width).
+    """
+    manager = AsyncProjectManager(session=session.database)
+
+    result = await get_task_page(session=session, id=id, page=page)
+
+    return await manager.find_nearest_block(
+        page=result, x=x, y=y, max_distance=max_distance)
 
 # ---------------------------------------------------------------------------- #
 
@@ -499,7 +833,7 @@ async def run_ocr(
     """
     Run OCR for a project's task.
     """
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     task = await manager.get_task(id=id)
 
@@ -510,7 +844,7 @@ async def run_ocr(
         task.status = TaskStatus.ocr_pending
         task.last_ocr = datetime.datetime.now()
         session.database.add(task)
-        session.database.commit()
+        await session.database.commit()
 
         worker.put("run-ocr", id=task.id)
         logger.debug("Task OCR queued.")
@@ -529,7 +863,7 @@ async def run_ocr_worker(
     """
     Run OCR on a task.
     """
-    with database.session() as session:
+    with worker_database.session() as session:
         manager = ProjectManager(session=session)
 
         task = await manager.get_task(id=id)
@@ -540,6 +874,9 @@ async def run_ocr_worker(
 
         await manager.run_ocr(task=task)
 
+    logger.debug(
+        f"Worker connection pool: {worker_database.pool_statistics()}")
+
 # ---------------------------------------------------------------------------- #
 
 
@@ -552,7 +889,7 @@ async def save_labels(
     user_content: Annotated[List[str], Form()]
 ) -> Response:
 
-    manager = ProjectManager(session=session.database)
+    manager = AsyncProjectManager(session=session.database)
 
     if len(labeltype_id) != len(block_ids) or \
             len(block_ids) != len(user_content):
@@ -567,12 +904,11 @@ async def save_labels(
 
     for label in task.labels:
         for link in label.links:
-            session.database.delete(link)
-        session.database.delete(label)
+            await session.database.delete(link)
+        await session.database.delete(label)
 
     for item in zip(labeltype_id, block_ids, user_content):
         block_ids_list = item[1].split(",")
-        block_ids_values = [int(block_id) for block_id in block_ids_list]
 
         label = Label(
             task=task,
@@ -583,15 +919,16 @@ async def save_labels(
         session.database.add(label)
         # session.database.commit()
 
-        for block_id in block_ids_values:
-            link = LabelLink(
-                label=label,
-                block_id=block_id
-            )
+        for block_id in block_ids_list:
+            try:
+                link = LabelLink.from_block_key(label=label, key=block_id)
+            except ValueError:
+                await session.database.rollback()
+                raise HTTPException(status_code=400, detail="Bad Request")
 
             session.database.add(link)
 
-    session.database.commit()
+    await session.database.commit()
 
     # await manager.swap_user_labels(task=task, user_labels=labels)
 
@@ -0,0 +1,211 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import json
+import asyncio
+import logging
+import pathlib
+import sqlmodel
+import threading
+import concurrent.futures
+from typing import Callable, List, Optional, Set
+
+# ---------------------------------------------------------------------------- #
+
+from .models import *
+from .config import config
+from .database import Database
+from .project import ProjectManager
+
+# ---------------------------------------------------------------------------- #
+
+
+class OcrCheckpoint():
+    """
+    Records which tasks of a project have been processed by a batch OCR run,
+    so that an interrupted run can resume. The checkpoint is a JSON file in
+    the cache directory that is replaced atomically after each task.
+    """
+    logger: logging.Logger
+    path: pathlib.Path
+    done: Set[int]
+
+    _lock: threading.Lock
+
+    def __init__(
+        self,
+        project_id: int
+    ) -> None:
+        """
+        Initialize the checkpoint and load it, if present.
+        """
+        self.logger = logging.getLogger("mrkr.batch")
+
+        self.path = pathlib.Path(config.cache.directory) / \
+            f"ocr-project-{project_id}.json"
+
+        self.done = set()
+        self._lock = threading.Lock()
+
+        if self.path.exists():
+            self.done = set(json.loads(self.path.read_text())["done"])
+
+            self.logger.info(
+                f"Checkpoint with {len(self.done)} processed tasks loaded.")
+
+    def add(self, task_id: int) -> None:
+        """
+        Mark a task as processed.
+        """
+        with self._lock:
+            self.done.add(task_id)
+
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+
+            temporary = self.path.with_suffix(".tmp")
+            temporary.write_text(json.dumps({"done": sorted(self.done)}))
+            os.replace(temporary, self.path)
+
+    def remove(self) -> None:
+        """
+        Delete the checkpoint, e.g. once all tasks are processed.
+        """
+        with self._lock:
+            self.done = set()
+            self.path.unlink(missing_ok=True)
+
+# ---------------------------------------------------------------------------- #
+
+
+class ProjectOcrBatch():
+    """
+    Runs OCR for all tasks of a project. Several tasks are processed at the
+    same time (each with its own database session), while their pages share
+    the OCR process pool. Tasks whose file did not change since their last
+    OCR are skipped by ProjectManager.run_ocr.
+    """
+    logger: logging.Logger
+    database: Database
+    project_id: int
+    provider: OcrProvider
+    concurrency: int
+    force_ocr: bool
+    checkpoint: OcrCheckpoint
+
+    def __init__(
+        self,
+        database: Database,
+        project_id: int,
+        provider: OcrProvider,
+        concurrency: int,
+        force_ocr: bool = False,
+        restart: bool = False
+    ) -> None:
+        """
+        Initialize the batch. With restart, the checkpoint of a previous run
+        is discarded.
+        """
+        self.logger = logging.getLogger("mrkr.batch")
+
+        self.database = database
+        self.project_id = project_id
+        self.provider = provider
+        self.concurrency = max(1, concurrency)
+        self.force_ocr = force_ocr
+
+        self.checkpoint = OcrCheckpoint(project_id=project_id)
+
+        if restart:
+            self.checkpoint.remove()
+
+    def pending_tasks(self) -> List[int]:
+        """
+        Return the ids of the project's tasks that still have to be
+        processed.
+        """
+        with self.database.session() as session:
+            if session.get(Project, self.project_id) is None:
+                raise Exception(f"Project {self.project_id} not found.")
+
+            query = sqlmodel.select(Task.id).where(
+                Task.project_id == self.project_id,
+                Task.abandoned == False  # noqa: E712
+            ).order_by(Task.id)
+
+            tasks = session.exec(query).all()
+
+        return [id for id in tasks if id not in self.checkpoint.done]
+
+    def run(
+        self,
+        tasks: List[int],
+        progress: Optional[Callable[[int, bool], None]] = None
+    ) -> List[int]:
+        """
+        Run OCR for the given tasks and return the ids of the tasks that
+        failed. The progress callback is called with each task's id and
+        whether it succeeded. Failed tasks are not checkpointed, so they are
+        retried when the batch is resumed.
+        """
+        failed = []
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=self.concurrency,
+            thread_name_prefix="ocr-project"
+        ) as executor:
+            futures = {
+                executor.submit(self._run_task, id): id for id in tasks
+            }
+
+            try:
+                for future in concurrent.futures.as_completed(futures):
+                    id = futures[future]
+                    success = future.result()
+
+                    if success:
+                        self.checkpoint.add(task_id=id)
+                    else:
+                        failed.append(id)
+
+                    if progress:
+                        progress(id, success)
+            except BaseException:
+                # e.g. on ctrl+c, tasks that have not started are dropped;
+                # running tasks finish and are picked up again on resume
+                for future in futures:
+                    future.cancel()
+                raise
+
+        if not failed and not self.pending_tasks():
+            self.checkpoint.remove()
+
+        return failed
+
+    def _run_task(self, id: int) -> bool:
+        """
+        Run OCR for a single task in its own database session. Errors (e.g.
+        a lost database connection) fail the task, not the batch.
+        """
+        try:
+            with self.database.session() as session:
+                manager = ProjectManager(session=session)
+
+                task = asyncio.run(manager.get_task(id=id))
+
+                if task is None:
+                    return False
+
+                asyncio.run(manager.run_ocr(
+                    task=task,
+                    provider=self.provider,
+                    force_ocr=self.force_ocr
+                ))
+
+                return task.status == TaskStatus.ready
+        except Exception as exception:
+            self.logger.exception(exception)
+            self.logger.warning(f"OCR for task {id} failed.")
+
+            return False
+
+# ---------------------------------------------------------------------------- #
@@ -0,0 +1,654 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import sys
+import time
+import asyncio
+import uuid
+import numpy
+import random
+import shutil
+import pathlib
+import logging
+import datetime
+import platform
+import resource
+import sqlmodel
+from PIL import Image, ImageDraw, ImageFont
+from typing import Any, Dict, List
+
+# ---------------------------------------------------------------------------- #
+
+from .models import *
+from .database import AsyncDatabase, Database, DatabaseSession
+from .project import AsyncProjectManager, ProjectManager
+from .blockwriter import BlockWriter
+from .file.local import LocalFileProvider
+from .ocr import BlockArray, OcrProviderFactory, Preprocessor, ocr_executor
+from .config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class PreprocessingBenchmark():
+    """
+    Measures how preprocessing settings trade OCR throughput against word
+    confidence. All variants run on the same pages in a single process, so
+    the throughput numbers are comparable to each other (but not to the
+    parallel OCR of the application).
+    """
+    logger: logging.Logger
+    provider: OcrProvider
+    pages: List[Image.Image]
+
+    variants: Dict[str, Preprocessing] = {
+        "none": Preprocessing(),
+        "grayscale": Preprocessing(grayscale=True),
+        "binarize": Preprocessing(binarize=True),
+        "150dpi": Preprocessing(grayscale=True, target_dpi=150),
+        "100dpi": Preprocessing(grayscale=True, target_dpi=100),
+        "deskew": Preprocessing(deskew=True),
+        "crop_margins": Preprocessing(crop_margins=True),
+        "all": Preprocessing(binarize=True, target_dpi=150, deskew=True,
+                             crop_margins=True)
+    }
+
+    formats: List[str] = [".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff"]
+
+    def __init__(
+        self,
+        provider: OcrProvider,
+        uri: str,
+        max_pages: int
+    ) -> None:
+        """
+        Initialize the benchmark and render up to max_pages pages of the
+        images and PDFs matching the uri (relative to the data directory).
+        """
+        self.logger = logging.getLogger("mrkr.benchmark")
+
+        self.provider = provider
+
+        file_provider = LocalFileProvider()
+
+        self.pages = []
+        for file in file_provider.list_files(uri=uri):
+            if len(self.pages) >= max_pages:
+                break
+            if pathlib.Path(file.uri).suffix.lower() not in self.formats:
+                continue
+
+            self.pages.extend(file_provider.file_to_image(
+                uri=file.uri,
+                first_page=0,
+                last_page=max_pages - len(self.pages) - 1
+            ))
+
+        if len(self.pages) == 0:
+            raise Exception(f"No pages found for '{uri}'.")
+
+        self.logger.info(f"Benchmarking with {len(self.pages)} pages.")
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Run OCR on all pages once per variant and report pages per second,
+        the number of words and their mean confidence.
+        """
+        ocr_provider = OcrProviderFactory.get_provider(provider=self.provider)
+
+        # warm up, e.g. to load the language model of the tesseract api
+        ocr_provider.run_ocr(image=self.pages[0])
+
+        results = []
+        for name, settings in self.variants.items():
+            preprocessor = Preprocessor(settings=settings)
+
+            confidences = []
+            start = time.perf_counter()
+
+            for page in self.pages:
+                dpi = page.info.get("dpi", (config.ocr.default_dpi,))[0]
+
+                image, _, _ = preprocessor.process(
+                    image=page, dpi=round(dpi))
+                blocks = ocr_provider.run_ocr(image=image)
+
+                confidences.append(blocks.confidence)
+
+            seconds = time.perf_counter() - start
+            confidence = numpy.concatenate(confidences)
+
+            results.append({
+                "variant": name,
+                "pages": len(self.pages),
+                "seconds": round(seconds, 3),
+                "pages_per_second": round(len(self.pages) / seconds, 3),
+                "words": int(len(confidence)),
+                "confidence": round(float(numpy.nanmean(confidence)), 4)
+                if numpy.any(~numpy.isnan(confidence)) else None
+            })
+
+            self.logger.info(f"Variant '{name}' done.")
+
+        return results
+
+# ---------------------------------------------------------------------------- #
+
+
+class PipelineBenchmark():
+    """
+    Measures the throughput of the complete OCR path: a temporary project
+    with the demo files and generated documents is scanned and every task
+    is processed with ProjectManager.run_ocr against the database. The
+    project is removed afterwards.
+    """
+    logger: logging.Logger
+    database: Database
+    provider: OcrProvider
+    documents: int
+    pages: int
+    use_cache: bool
+    seed: int
+
+    formats: List[str] = [".pdf", ".jpg", ".jpeg", ".png", ".tif", ".tiff"]
+
+    def __init__(
+        self,
+        database: Database,
+        provider: OcrProvider,
+        documents: int,
+        pages: int,
+        use_cache: bool = False,
+        seed: int = 0
+    ) -> None:
+        """
+        Initialize the benchmark. It uses the given number of generated
+        documents with the given number of pages each.
+        """
+        self.logger = logging.getLogger("mrkr.benchmark")
+
+        self.database = database
+        self.provider = provider
+        self.documents = documents
+        self.pages = pages
+        self.use_cache = use_cache
+        self.seed = seed
+
+    async def run(self) -> Dict[str, Any]:
+        """
+        Run the benchmark and return its results.
+        """
+        name = f"benchmark-{uuid.uuid4().hex[:8]}"
+        directory = pathlib.Path("data") / name
+
+        try:
+            self._prepare_files(directory=directory)
+
+            with self.database.session() as session:
+                return await self._run(session=session, name=name)
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+
+    async def _run(
+        self,
+        session: DatabaseSession,
+        name: str
+    ) -> Dict[str, Any]:
+        """
+        Scan the benchmark project, run OCR for all its tasks and clean up.
+        """
+        user = User(name=name)
+
+        project = Project(
+            name=name,
+            description="A temporary benchmark project.",
+            creator=user,
+            provider=SourceProvider.local,
+            uri=f"{name}/*",
+            status=ProjectStatus.scan_pending
+        )
+
+        session.add(user)
+        session.add(project)
+        session.commit()
+
+        manager = ProjectManager(session=session)
+
+        try:
+            start = time.perf_counter()
+
+            with manager.timer.stage("scan"):
+                await manager.scan_project(project=project)
+
+            if project.status != ProjectStatus.ready:
+                raise Exception("Benchmark project could not be scanned.")
+
+            pages = 0
+            for task in project.tasks:
+                await manager.run_ocr(
+                    task=task,
+                    provider=self.provider,
+                    force_ocr=True,
+                    use_cache=self.use_cache
+                )
+
+                if task.status != TaskStatus.ready or task.ocr is None:
+                    raise Exception(f"OCR for '{task.name}' failed.")
+
+                pages += len(task.ocr.pages)
+
+                self.logger.info(f"Task '{task.name}' processed.")
+
+            seconds = time.perf_counter() - start
+            documents = len(project.tasks)
+        finally:
+            self._remove_project(session=session, project=project)
+
+        # the workers' peak memory is only reported once they have exited
+        ocr_executor.shutdown()
+
+        return {
+            "created": datetime.datetime.now().isoformat(),
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "settings": {
+                "provider": self.provider.value,
+                "ocr_workers": ocr_executor.workers,
+                "pages_in_flight": config.ocr.pages_in_flight,
+                "use_cache": self.use_cache,
+                "synthetic_documents": self.documents,
+                "synthetic_pages": self.pages
+            },
+            "documents": documents,
+            "pages": pages,
+            "seconds": round(seconds, 3),
+            "pages_per_second": round(pages / seconds, 3),
+            "peak_rss_mb": {
+                "main": self._peak_rss(resource.RUSAGE_SELF),
+                "workers": self._peak_rss(resource.RUSAGE_CHILDREN)
+            },
+            "stages": manager.timer.report()
+        }
+
+    def _prepare_files(self, directory: pathlib.Path) -> None:
+        """
+        Copy the demo files and generate the synthetic documents.
+        """
+        directory.mkdir(parents=True)
+
+        for file in sorted(pathlib.Path("data/demo").glob("*")):
+            if file.suffix.lower() in self.formats:
+                shutil.copy(file, directory / file.name)
+
+        generator = random.Random(self.seed)
+
+        for document in range(self.documents):
+            images = [
+                self._generate_page(generator=generator)
+                for _ in range(self.pages)
+            ]
+
+            images[0].save(
+                directory / f"synthetic{document + 1}.pdf",
+                save_all=True,
+                append_images=images[1:],
+                resolution=config.ocr.default_dpi
+            )
+
+    @staticmethod
+    def _generate_page(generator: random.Random) -> Image.Image:
+        """
+        Generate a letter-sized page of random words at the default dpi.
+        """
+        dpi = config.ocr.default_dpi
+
+        image = Image.new("L", (int(8.5 * dpi), 11 * dpi), 255)
+        draw = ImageDraw.Draw(image)
+        font = ImageFont.load_default(size=dpi // 8)
+
+        words = ["invoice", "amount", "total", "street", "name", "account",
+                 "date", "payment", "number", "customer", "order", "due"]
+
+        margin = dpi
+        line_height = dpi // 5
+
+        for y in range(margin, image.height - margin, line_height):
+            line = " ".join(
+                generator.choice(words)
+                if generator.random() > 0.2
+                else str(generator.randint(1, 99999))
+                for _ in range(generator.randint(4, 9))
+            )
+            draw.text((margin, y), line, fill=0, font=font)
+
+        return image
+
+    @staticmethod
+    def _remove_project(
+        session: DatabaseSession,
+        project: Project
+    ) -> None:
+        """
+        Delete the benchmark project with all its tasks and OCR results.
+        """
+        session.rollback()
+
+        for task in project.tasks:
+            for ocr in session.exec(
+                    sqlmodel.select(Ocr).where(Ocr.task_id == task.id)):
+                for page in ocr.pages:
+                    for block in page.blocks:
+                        session.delete(block)
+                    packed = session.get(PackedBlocks, page.id)
+                    if packed is not None:
+                        session.delete(packed)
+                    session.delete(page)
+                session.delete(ocr)
+            session.delete(task)
+
+        creator = project.creator
+        session.delete(project)
+        session.delete(creator)
+
+        session.commit()
+
+    @staticmethod
+    def _peak_rss(who: int) -> float:
+        """
+        Return the peak resident set size (in MiB) of this process or of the
+        largest of its terminated child processes.
+        """
+        kilobytes = resource.getrusage(who).ru_maxrss
+
+        return round(kilobytes / 1024, 1)
+
+# ---------------------------------------------------------------------------- #
+
+
+class BlockInsertBenchmark():
+    """
+    Measures how fast the blocks of OCR runs are written to the database with
+    each of the block insert modes, and with packed storage. The blocks are
+    generated and written to a temporary task within a transaction that is
+    rolled back afterwards.
+    """
+    logger: logging.Logger
+    database: Database
+    modes: List[BlockInsertMode]
+    packed: bool
+    words: int
+    pages: int
+    seed: int
+
+    def __init__(
+        self,
+        database: Database,
+        modes: List[BlockInsertMode],
+        words: int,
+        pages: int,
+        packed: bool = True,
+        seed: int = 0
+    ) -> None:
+        """
+        Initialize the benchmark. Each mode writes the given number of pages
+        with the given number of words each.
+        """
+        self.logger = logging.getLogger("mrkr.benchmark")
+
+        self.database = database
+        self.modes = modes
+        self.packed = packed
+        self.words = words
+        self.pages = pages
+        self.seed = seed
+
+    def run(self) -> List[Dict[str, Any]]:
+        """
+        Run the benchmark and report the rows (i.e. blocks) per second of
+        each mode.
+        """
+        blocks = self._generate_blocks()
+
+        variants = [(mode.value, mode, BlockStorage.rows)
+                    for mode in self.modes]
+
+        if self.packed:
+            variants.append(
+                ("packed", BlockInsertMode.orm, BlockStorage.packed))
+
+        results = []
+        for name, mode, storage in variants:
+            with self.database.session() as session:
+                try:
+                    seconds = self._run(session=session, mode=mode,
+                                        storage=storage, blocks=blocks)
+                finally:
+                    session.rollback()
+
+            rows = self.words * self.pages
+
+            results.append({
+                "mode": name,
+                "rows": rows,
+                "seconds": round(seconds, 3),
+                "rows_per_second": round(rows / seconds, 1)
+            })
+
+            self.logger.info(f"Mode '{name}' done.")
+
+        return results
+
+    def _run(
+        self,
+        session: DatabaseSession,
+        mode: BlockInsertMode,
+        storage: BlockStorage,
+        blocks: BlockArray
+    ) -> float:
+        """
+        Write all pages with one mode and return the seconds it took,
+        including the final flush.
+        """
+        name = f"benchmark-{uuid.uuid4().hex[:8]}"
+
+        user = User(name=name)
+        project = Project(
+            name=name,
+            description="A temporary benchmark project.",
+            creator=user,
+            provider=SourceProvider.local,
+            uri=f"{name}/*",
+            status=ProjectStatus.ready
+        )
+        task = Task(
+            project=project,
+            name=name,
+            created=datetime.datetime.now(),
+            status=TaskStatus.ready,
+            abandoned=False,
+            uri=f"{name}/{name}.pdf"
+        )
+        ocr = Ocr(
+            task=task,
+            etag=name,
+            provider=OcrProvider.tesseract,
+            created=datetime.datetime.now()
+        )
+
+        session.add(ocr)
+        session.flush()
+
+        writer = BlockWriter(session=session, mode=mode, storage=storage)
+
+        start = time.perf_counter()
+
+        for index in range(self.pages):
+            page = Page(ocr=ocr, page=index, width=1700, height=2200)
+            session.add(page)
+
+            writer.insert(page=page, blocks=blocks)
+
+        session.flush()
+
+        return time.perf_counter() - start
+
+    def _generate_blocks(self) -> BlockArray:
+        """
+        Generate the words of a page on a regular grid.
+        """
+        generator = numpy.random.default_rng(self.seed)
+
+        columns = 10
+        index = numpy.arange(self.words)
+
+        confidence = numpy.round(generator.uniform(0.3, 1.0, self.words), 5)
+        confidence[generator.random(self.words) < 0.05] = numpy.nan
+
+        return BlockArray(
+            content=[
+                "".join(generator.choice(list("abcdefghij"),
+                                         int(generator.integers(2, 10))))
+                for _ in range(self.words)
+            ],
+            confidence=confidence,
+            left=(index % columns) * (100.0 / columns),
+            top=(index // columns) * (100.0 / (self.words // columns + 1)),
+            width=numpy.full(self.words, 100.0 / columns * 0.8),
+            height=numpy.full(self.words, 1.0)
+        )
+
+# ---------------------------------------------------------------------------- #
+
+
+class RequestBenchmark():
+    """
+    Demonstrates how database access affects concurrent requests: many
+    simulated requests run concurrently on one event loop, each listing the
+    projects and running a slow query (pg_sleep). With the synchronous
+    database, every query blocks the event loop and the requests run one
+    after another; with the async database, they overlap up to the size of
+    the connection pool.
+    """
+    logger: logging.Logger
+    database: Database
+    async_database: AsyncDatabase
+    requests: int
+    concurrency: int
+    delay: float
+
+    def __init__(
+        self,
+        database: Database,
+        async_database: AsyncDatabase,
+        requests: int,
+        concurrency: int,
+        delay: float
+    ) -> None:
+        """
+        Initialize the benchmark. The delay is the duration (in seconds) of
+        the slow query of each request.
+        """
+        self.logger = logging.getLogger("mrkr.benchmark")
+
+        self.database = database
+        self.async_database = async_database
+        self.requests = requests
+        self.concurrency = max(1, concurrency)
+        self.delay = delay
+
+    async def run(self) -> List[Dict[str, Any]]:
+        """
+        Run the requests with both databases and report requests per second,
+        latency percentiles and the longest stall of the event loop.
+        """
+        results = [
+            await self._measure(name="sync", request=self._sync_request),
+            await self._measure(name="async", request=self._async_request)
+        ]
+
+        await self.async_database.dispose()
+
+        return results
+
+    async def _measure(
+        self,
+        name: str,
+        request: Any
+    ) -> Dict[str, Any]:
+        """
+        Run all requests with a limited number in flight.
+        """
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies: List[float] = []
+
+        async def limited() -> None:
+            async with semaphore:
+                start = time.perf_counter()
+                await request()
+                latencies.append(time.perf_counter() - start)
+
+        # warm up, e.g. to open the first connection
+        await request()
+
+        stop = asyncio.Event()
+        monitor = asyncio.create_task(self._loop_lag(stop=stop))
+
+        start = time.perf_counter()
+        await asyncio.gather(*(limited() for _ in range(self.requests)))
+        seconds = time.perf_counter() - start
+
+        stop.set()
+        lag = await monitor
+
+        percentiles = numpy.percentile(latencies, [50, 95]) * 1000
+
+        self.logger.info(f"Mode '{name}' done.")
+
+        return {
+            "mode": name,
+            "requests": self.requests,
+            "concurrency": self.concurrency,
+            "seconds": round(seconds, 3),
+            "requests_per_second": round(self.requests / seconds, 1),
+            "latency_p50_ms": round(float(percentiles[0]), 1),
+            "latency_p95_ms": round(float(percentiles[1]), 1),
+            "max_loop_lag_ms": round(lag * 1000, 1)
+        }
+
+    async def _sync_request(self) -> None:
+        with self.database.session() as session:
+            await ProjectManager(session=session).list_projects()
+            session.exec(self._slow_query(session=session))  # type: ignore
+
+    async def _async_request(self) -> None:
+        async with self.async_database.session() as session:
+            await AsyncProjectManager(session=session).list_projects()
+            await session.exec(  # type: ignore
+                self._slow_query(session=session))
+
+    def _slow_query(self, session: Any) -> Any:
+        """
+        Return a query that takes the configured delay on postgresql.
+        """
+        if session.bind.dialect.name != "postgresql":
+            return sqlmodel.text("SELECT 1")
+
+        return sqlmodel.text(f"SELECT pg_sleep({float(self.delay)})")
+
+    @staticmethod
+    async def _loop_lag(stop: asyncio.Event) -> float:
+        """
+        Measure the longest time the event loop was unable to run a task
+        that wakes up every 10 milliseconds.
+        """
+        lag = 0.0
+
+        while not stop.is_set():
+            start = time.perf_counter()
+            await asyncio.sleep(0.01)
+            lag = max(lag, time.perf_counter() - start - 0.01)
+
+        return lag
+
+# ---------------------------------------------------------------------------- #
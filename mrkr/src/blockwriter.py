@@ -0,0 +1,199 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import csv
+import numpy
+import logging
+import sqlmodel
+import sqlalchemy
+from typing import Any, Dict, List, Optional
+
+# ---------------------------------------------------------------------------- #
+
+from .models import *
+from .database import DatabaseSession
+from .timer import StageTimer
+from .ocr import BlockArray
+
+# ---------------------------------------------------------------------------- #
+
+
+class BlockWriter():
+    """
+    Writes the blocks of a page to the database. Besides creating one ORM
+    object per block, the blocks can be written with a single batched insert
+    or with postgresql's COPY, which avoid the ORM's per-object overhead.
+    All modes return the ids of the new blocks in the order of the blocks.
+
+    With packed storage, all blocks of a page are written as a single row
+    instead, and the blocks are identified by their position on the page.
+
+    The time spent converting the blocks into rows (or packing them) is
+    recorded as the stage "convert" of the timer.
+    """
+    logger: logging.Logger
+    session: DatabaseSession
+    mode: BlockInsertMode
+    storage: BlockStorage
+    timer: StageTimer
+
+    def __init__(
+        self,
+        session: DatabaseSession,
+        mode: BlockInsertMode,
+        storage: BlockStorage = BlockStorage.rows,
+        timer: Optional[StageTimer] = None
+    ) -> None:
+        """
+        Initialize the writer.
+        """
+        self.logger = logging.getLogger("mrkr.database")
+
+        self.session = session
+        self.mode = mode
+        self.storage = storage
+        self.timer = timer or StageTimer()
+
+    def insert(
+        self,
+        page: Page,
+        blocks: BlockArray
+    ) -> numpy.ndarray:
+        """
+        Write the blocks of a page, which is flushed first (so that it has an
+        id), and return the ids of the blocks (or their positions, if they
+        are packed). The blocks are written within the session's transaction.
+        """
+        if self.storage == BlockStorage.packed:
+            with self.timer.stage("convert"):
+                data = blocks.pack()
+
+            return self._insert_packed(page=page, data=data, count=len(blocks))
+
+        self.session.flush()
+
+        if len(blocks) == 0:
+            return numpy.empty(0, dtype=numpy.int64)
+
+        with self.timer.stage("convert"):
+            rows = list(blocks.rows())
+
+        if self.mode == BlockInsertMode.orm:
+            ids = self._insert_orm(page=page, rows=rows)
+        elif self.mode == BlockInsertMode.bulk:
+            ids = self._insert_bulk(page=page, rows=rows)
+        elif self.mode == BlockInsertMode.copy:
+            ids = self._insert_copy(page=page, rows=rows)
+        else:
+            raise Exception(f"Unknown block insert mode '{self.mode}'.")
+
+        self.logger.debug(
+            f"{len(ids)} blocks of page {page.id} written ({self.mode.value}).")
+
+        return numpy.asarray(ids, dtype=numpy.int64)
+
+    def _insert_packed(
+        self,
+        page: Page,
+        data: bytes,
+        count: int
+    ) -> numpy.ndarray:
+        """
+        Write the packed blocks of a page as a single row.
+        """
+        page.storage = BlockStorage.packed
+
+        self.session.add(PackedBlocks(page=page, data=data))
+        self.session.flush()
+
+        return numpy.arange(count, dtype=numpy.int64)
+
+    def _insert_orm(
+        self,
+        page: Page,
+        rows: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Add one ORM object per block.
+        """
+        objects = [Block(page=page, **row) for row in rows]
+
+        self.session.add_all(objects)
+        self.session.flush()
+
+        return [block.id for block in objects]
+
+    def _insert_bulk(
+        self,
+        page: Page,
+        rows: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Insert all blocks with one statement. SQLAlchemy sends the rows as
+        batched multi-row inserts and returns the ids in parameter order.
+        """
+        parameters = [{"page_id": page.id, **row} for row in rows]
+
+        statement = sqlmodel.insert(Block).returning(
+            Block.id, sort_by_parameter_order=True)
+
+        result = self.session.connection().execute(statement, parameters)
+
+        return list(result.scalars())
+
+    def _insert_copy(
+        self,
+        page: Page,
+        rows: List[Dict[str, Any]]
+    ) -> List[int]:
+        """
+        Stream all blocks with COPY. Since COPY does not return anything, the
+        ids are drawn from the table's sequence beforehand.
+        """
+        connection = self.session.connection()
+
+        if connection.dialect.name != "postgresql":
+            raise Exception(
+                "Inserting blocks with COPY requires postgresql.")
+
+        table = Block.__table__.name
+
+        ids = connection.execute(
+            sqlalchemy.text(
+                f"SELECT nextval(pg_get_serial_sequence('{table}', 'id')) "
+                f"FROM generate_series(1, :count)"),
+            {"count": len(rows)}
+        ).scalars().all()
+        ids = sorted(ids)
+
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+
+        # missing confidences are written as empty (i.e. null) fields
+        for id, row in zip(ids, rows):
+            writer.writerow((
+                id, page.id, row["type"].name, row["content"],
+                "" if row["confidence"] is None else row["confidence"],
+                row["left"], row["top"], row["width"], row["height"]
+            ))
+
+        buffer.seek(0)
+
+        columns = ", ".join(
+            f'"{column}"' for column in ("id", "page_id", "type", "content",
+                                         "confidence", "left", "top", "width",
+                                         "height"))
+
+        cursor = connection.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {table} ({columns}) FROM STDIN "
+                f"WITH (FORMAT csv, FORCE_NOT_NULL (\"content\"))",
+                buffer
+            )
+        finally:
+            cursor.close()
+
+        return ids
+
+# ---------------------------------------------------------------------------- #
@@ -0,0 +1,281 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import uuid
+import hashlib
+import logging
+import pathlib
+import threading
+from collections import OrderedDict
+from typing import Any, BinaryIO, Callable, Dict, Set
+
+# ---------------------------------------------------------------------------- #
+
+from .config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class DiskCache():
+    """
+    A content-addressed cache that keeps its entries as files on the local
+    disk. Once the cache exceeds its size limit, the least recently used
+    entries are evicted.
+    """
+    logger: logging.Logger
+    name: str
+    directory: pathlib.Path
+    max_size: int
+
+    _lock: threading.Lock
+    _entries: OrderedDict[str, int] | None
+    _size: int
+
+    def __init__(
+        self,
+        name: str,
+        max_size: int
+    ) -> None:
+        """
+        Initialize the cache. The cache's directory is created lazily.
+        """
+        self.logger = logging.getLogger('mrkr.cache')
+
+        self.name = name
+        self.directory = pathlib.Path(config.cache.directory) / name
+        self.max_size = max_size
+
+        self._lock = threading.Lock()
+        self._entries = None
+        self._size = 0
+
+    @staticmethod
+    def key(*parts: Any) -> str:
+        """
+        Derive a cache key from a set of values (e.g. an etag and a page).
+        """
+        value = "\x1f".join(str(part) for part in parts)
+        return hashlib.sha256(value.encode()).hexdigest()
+
+    def get(
+        self,
+        key: str
+    ) -> pathlib.Path | None:
+        """
+        Return the path of a cached entry or None if the entry is unknown.
+        """
+        path = self._path(key=key)
+
+        with self._lock:
+            self._load()
+
+            try:
+                os.utime(path)
+                size = path.stat().st_size
+            except FileNotFoundError:
+                self._forget(key=key)
+                return None
+
+            self._remember(key=key, size=size)
+
+        self.logger.debug(f"Cache '{self.name}' hit for key {key}.")
+
+        return path
+
+    def open(
+        self,
+        key: str
+    ) -> BinaryIO | None:
+        """
+        Open a cached entry for reading or return None if the entry is
+        unknown. The file is opened while holding the lock, so it cannot be
+        evicted in between, and an open file stays readable even if its
+        entry is evicted while it is streamed to a client.
+        """
+        path = self._path(key=key)
+
+        with self._lock:
+            self._load()
+
+            try:
+                file = path.open("rb")
+            except FileNotFoundError:
+                self._forget(key=key)
+                return None
+
+            os.utime(file.fileno())
+            self._remember(key=key, size=os.fstat(file.fileno()).st_size)
+
+        self.logger.debug(f"Cache '{self.name}' hit for key {key}.")
+
+        return file
+
+    def read(
+        self,
+        key: str
+    ) -> bytes | None:
+        """
+        Return the content of a cached entry or None if the entry is unknown.
+        """
+        file = self.open(key=key)
+        if file is None:
+            return None
+
+        with file:
+            return file.read()
+
+    def put(
+        self,
+        key: str,
+        content: bytes
+    ) -> pathlib.Path:
+        """
+        Store an entry and return its path. Evicts old entries if necessary.
+        """
+        return self.put_file(key=key, writer=lambda file: file.write(content))
+
+    def put_many(
+        self,
+        entries: Dict[str, bytes]
+    ) -> None:
+        """
+        Store several entries that belong together (e.g. the variants of a
+        page). Old entries are evicted once all of them are written, and
+        none of the new entries is evicted in favour of another.
+        """
+        for key, content in entries.items():
+            self._write(key=key, writer=lambda file: file.write(content))
+
+        with self._lock:
+            self._load()
+            for key in entries:
+                size = self._path(key=key).stat().st_size
+                self._remember(key=key, size=size)
+            self._evict(keep=set(entries))
+
+        self.logger.debug(
+            f"Cache '{self.name}' stored {len(entries)} keys.")
+
+    def put_file(
+        self,
+        key: str,
+        writer: Callable[[BinaryIO], Any]
+    ) -> pathlib.Path:
+        """
+        Store an entry whose content is written by a callback and return its
+        path. This avoids holding large entries in memory.
+        """
+        path = self._write(key=key, writer=writer)
+
+        with self._lock:
+            self._load()
+            self._remember(key=key, size=path.stat().st_size)
+            self._evict(keep={key})
+
+        self.logger.debug(f"Cache '{self.name}' stored key {key}.")
+
+        return path
+
+    def _write(
+        self,
+        key: str,
+        writer: Callable[[BinaryIO], Any]
+    ) -> pathlib.Path:
+        """
+        Write an entry's file atomically without updating the index.
+        """
+        path = self._path(key=key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        temporary = path.with_name(f".{path.name}.{uuid.uuid4().hex}")
+        try:
+            with temporary.open("wb") as file:
+                writer(file)
+            os.replace(temporary, path)
+        finally:
+            temporary.unlink(missing_ok=True)
+
+        return path
+
+    def _path(self, key: str) -> pathlib.Path:
+        """
+        Return the path of an entry. Entries are spread over subdirectories.
+        """
+        return self.directory / key[:2] / key
+
+    def _load(self) -> None:
+        """
+        Build the in-memory index from the files on disk. Must be called
+        while holding the lock.
+        """
+        if self._entries is not None:
+            return
+
+        files = []
+        if self.directory.is_dir():
+            for path in self.directory.glob("*/*"):
+                if path.name.startswith("."):
+                    continue
+                try:
+                    stat = path.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, path.name, stat.st_size))
+
+        self._entries = OrderedDict()
+        self._size = 0
+
+        for _, key, size in sorted(files):
+            self._remember(key=key, size=size)
+
+        self.logger.debug(f"Cache '{self.name}' loaded with "
+                          f"{len(self._entries)} entries.")
+
+    def _remember(self, key: str, size: int) -> None:
+        """
+        Mark an entry as most recently used.
+        """
+        if self._entries is None:
+            return
+
+        self._forget(key=key)
+        self._entries[key] = size
+        self._size += size
+
+    def _forget(self, key: str) -> None:
+        """
+        Remove an entry from the index (but not from the disk).
+        """
+        if self._entries is None or key not in self._entries:
+            return
+
+        self._size -= self._entries.pop(key)
+
+    def _evict(self, keep: Set[str]) -> None:
+        """
+        Delete the least recently used entries (except the kept ones) until
+        the cache fits into its size limit.
+        """
+        if self._entries is None:
+            return
+
+        for key in list(self._entries):
+            if self._size <= self.max_size:
+                break
+            if key in keep:
+                continue
+
+            self._forget(key=key)
+            self._path(key=key).unlink(missing_ok=True)
+
+            self.logger.debug(f"Cache '{self.name}' evicted key {key}.")
+
+# ---------------------------------------------------------------------------- #
+
+
+page_cache = DiskCache(name="pages", max_size=config.cache.page_cache_size)
+ocr_cache = DiskCache(name="ocr", max_size=config.cache.ocr_cache_size)
+index_cache = DiskCache(name="index", max_size=config.cache.index_cache_size)
+spill_cache = DiskCache(name="spill", max_size=config.cache.spill_cache_size)
+
+# ---------------------------------------------------------------------------- #
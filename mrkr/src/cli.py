@@ -1,16 +1,23 @@
 # ---------------------------------------------------------------------------- #
 
+import json
+import asyncio
 import typer
 import bcrypt
 import dotenv
-from typing import Optional
+from typing import List, Optional
 
 # ---------------------------------------------------------------------------- #
 
-from .database import Database
+from .database import AsyncDatabase, Database
 from .logging import Logger
 from .config import config
 from .models import *
+from .benchmark import BlockInsertBenchmark, PipelineBenchmark
+from .benchmark import RequestBenchmark
+from .benchmark import PreprocessingBenchmark
+from .batch import ProjectOcrBatch
+from .migrations import MigrationManager
 
 # ---------------------------------------------------------------------------- #
 
@@ -25,15 +32,82 @@ dotenv.load_dotenv(".env")  # todo
 @cli.command()
 def create_tables() -> None:
     """
-    Create all tables in the database.
+    Create all tables in the database. Tables that exist already are brought
+    up to date by the migrations.
     """
-    Database(alias="POSTGRES").create_tables()
+    database = Database(alias="POSTGRES")
+    database.create_tables()
+
+    MigrationManager(database=database).migrate()
 
     logger.info("Tables created.")
 
 # ---------------------------------------------------------------------------- #
 
 
+@cli.command()
+def migrate(
+    target: Optional[int] = None
+) -> None:
+    """
+    Apply the pending schema migrations (up to the target version).
+    """
+    applied = MigrationManager(
+        database=Database(alias="POSTGRES")).migrate(target=target)
+
+    for migration in applied:
+        typer.echo(f"Applied {migration.version}: {migration.description}")
+
+    logger.info(f"{len(applied)} migrations applied.")
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def migration_status() -> None:
+    """
+    Show which schema migrations have been applied.
+    """
+    status = MigrationManager(database=Database(alias="POSTGRES")).status()
+
+    for migration in status:
+        applied = migration["applied"].isoformat(timespec="seconds") \
+            if migration["applied"] else "pending"
+        typer.echo(f"{migration['version']:>4}  {applied:<20}  "
+                   f"{migration['description']}")
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def check_query_plans(
+    output: Optional[str] = None
+) -> None:
+    """
+    Explain the queries that filter on foreign keys and check that they use
+    the indexes.
+    """
+    results = MigrationManager(
+        database=Database(alias="POSTGRES")).check_plans()
+
+    typer.echo(f"{'query':<24}{'index':<28}{'used':<40}")
+
+    for result in results:
+        used = ", ".join(result["used"]) or "none"
+        marker = "" if result["ok"] else "  <- missing"
+        typer.echo(f"{result['check']:<24}{result['index']:<28}"
+                   f"{used:<40}{marker}")
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+
+    if not all(result["ok"] for result in results):
+        raise typer.Exit(code=1)
+
+# ---------------------------------------------------------------------------- #
+
+
 @cli.command()
 def drop_tables() -> None:
     """
@@ -110,3 +184,245 @@ def insert_demo() -> None:
     logger.info("Demo data inserted.")
 
 # ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def set_preprocessing(
+    project_id: int,
+    grayscale: bool = False,
+    binarize: bool = False,
+    threshold: Optional[int] = None,
+    target_dpi: Optional[int] = None,
+    deskew: bool = False,
+    crop_margins: bool = False
+) -> None:
+    """
+    Set the image preprocessing applied before OCR for a project. Run it
+    without options to disable preprocessing.
+    """
+    with Database(alias="POSTGRES").session() as session:
+        project = session.get(Project, project_id)
+
+        if project is None:
+            raise Exception(f"Project {project_id} not found.")
+
+        project.preprocessing = Preprocessing(
+            grayscale=grayscale,
+            binarize=binarize,
+            threshold=threshold,
+            target_dpi=target_dpi,
+            deskew=deskew,
+            crop_margins=crop_margins
+        ).model_dump()
+
+        session.add(project)
+        session.commit()
+
+    logger.info("Preprocessing updated.")
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def benchmark_preprocessing(
+    uri: str = "demo/*",
+    provider: OcrProvider = OcrProvider.tesseract,
+    max_pages: int = 10,
+    output: Optional[str] = None
+) -> None:
+    """
+    Compare OCR throughput and word confidence for several preprocessing
+    settings. The uri is a pattern relative to the data directory.
+    """
+    results = PreprocessingBenchmark(
+        provider=provider,
+        uri=uri,
+        max_pages=max_pages
+    ).run()
+
+    typer.echo(f"{'variant':<14}{'pages/s':>10}{'words':>8}{'confidence':>12}")
+    for result in results:
+        confidence = result["confidence"]
+        typer.echo(
+            f"{result['variant']:<14}"
+            f"{result['pages_per_second']:>10.2f}"
+            f"{result['words']:>8}"
+            f"{confidence if confidence is not None else '-':>12}"
+        )
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def benchmark_ocr(
+    provider: OcrProvider = OcrProvider.tesseract,
+    documents: int = 5,
+    pages: int = 4,
+    use_cache: bool = False,
+    seed: int = 0,
+    output: Optional[str] = None
+) -> None:
+    """
+    Measure the throughput of the complete OCR pipeline for the demo files
+    and generated documents, using a temporary project in the database.
+    """
+    results = asyncio.run(
+        PipelineBenchmark(
+            database=Database(alias="POSTGRES"),
+            provider=provider,
+            documents=documents,
+            pages=pages,
+            use_cache=use_cache,
+            seed=seed
+        ).run()
+    )
+
+    typer.echo(f"{results['pages']} pages in {results['seconds']:.2f}s "
+               f"({results['pages_per_second']:.2f} pages/s), peak rss "
+               f"{results['peak_rss_mb']['main']} MiB (main), "
+               f"{results['peak_rss_mb']['workers']} MiB (workers)")
+
+    for stage, result in results["stages"].items():
+        typer.echo(f"{stage:<12}{result['seconds']:>10.2f}s"
+                   f"{result['calls']:>8} calls")
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def benchmark_inserts(
+    mode: Optional[List[BlockInsertMode]] = None,
+    words: int = 2000,
+    pages: int = 20,
+    packed: bool = True,
+    seed: int = 0,
+    output: Optional[str] = None
+) -> None:
+    """
+    Compare how fast OCR blocks are written to the database with each block
+    insert mode (all modes, unless some are given) and with packed storage.
+    Nothing is persisted.
+    """
+    results = BlockInsertBenchmark(
+        database=Database(alias="POSTGRES"),
+        modes=mode or list(BlockInsertMode),
+        words=words,
+        pages=pages,
+        packed=packed,
+        seed=seed
+    ).run()
+
+    typer.echo(f"{'mode':<8}{'rows':>10}{'seconds':>10}{'rows/s':>12}")
+    for result in results:
+        typer.echo(
+            f"{result['mode']:<8}"
+            f"{result['rows']:>10}"
+            f"{result['seconds']:>10.2f}"
+            f"{result['rows_per_second']:>12.0f}"
+        )
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def benchmark_requests(
+    requests: int = 200,
+    concurrency: int = 20,
+    delay: float = 0.05,
+    output: Optional[str] = None
+) -> None:
+    """
+    Compare concurrent requests with synchronous and async database access.
+    Each simulated request lists the projects and runs a query that takes
+    the given delay (in seconds).
+    """
+    results = asyncio.run(
+        RequestBenchmark(
+            database=Database(alias="POSTGRES"),
+            async_database=AsyncDatabase(alias="POSTGRES"),
+            requests=requests,
+            concurrency=concurrency,
+            delay=delay
+        ).run()
+    )
+
+    typer.echo(f"{'mode':<8}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}"
+               f"{'loop lag ms':>14}")
+    for result in results:
+        typer.echo(
+            f"{result['mode']:<8}"
+            f"{result['requests_per_second']:>10.1f}"
+            f"{result['latency_p50_ms']:>10.1f}"
+            f"{result['latency_p95_ms']:>10.1f}"
+            f"{result['max_loop_lag_ms']:>14.1f}"
+        )
+
+    if output:
+        with open(output, "w") as file:
+            json.dump(results, file, indent=4)
+
+# ---------------------------------------------------------------------------- #
+
+
+@cli.command()
+def ocr_project(
+    project_id: int,
+    provider: OcrProvider = OcrProvider.tesseract,
+    concurrency: int = 4,
+    force_ocr: bool = False,
+    restart: bool = False
+) -> None:
+    """
+    Run OCR for all tasks of a project. An interrupted run resumes where it
+    stopped, unless --restart is given.
+    """
+    database = Database(alias="POSTGRES", role="worker")
+
+    batch = ProjectOcrBatch(
+        database=database,
+        project_id=project_id,
+        provider=provider,
+        concurrency=concurrency,
+        force_ocr=force_ocr,
+        restart=restart
+    )
+
+    tasks = batch.pending_tasks()
+
+    if batch.checkpoint.done:
+        typer.echo(f"Resuming: {len(batch.checkpoint.done)} tasks already "
+                   f"processed, {len(tasks)} remaining.")
+
+    with typer.progressbar(length=len(tasks), label="OCR") as progressbar:
+        failed = batch.run(
+            tasks=tasks,
+            progress=lambda id, success: progressbar.update(1)
+        )
+
+    statistics = database.pool_statistics()
+    if statistics:
+        typer.echo(f"Waited {statistics['wait_total']:.2f}s in total (at most "
+                   f"{statistics['wait_max']:.2f}s) for "
+                   f"{statistics['checkouts']} database connections.")
+
+    if failed:
+        typer.echo(f"OCR failed for {len(failed)} tasks: "
+                   f"{', '.join(str(id) for id in sorted(failed))}. "
+                   f"Run the command again to retry them.")
+        raise typer.Exit(code=1)
+
+    logger.info(f"OCR for {len(tasks)} tasks finished.")
+
+# ---------------------------------------------------------------------------- #
@@ -4,7 +4,8 @@ import pydantic
 
 # ---------------------------------------------------------------------------- #
 
-from .models import FlashMessage, FlashType, UserFlashMessage
+from .models import FlashMessage, FlashType, UserFlashMessage, ImageFormat
+from .models import BlockInsertMode, BlockStorage
 
 
 # ---------------------------------------------------------------------------- #
@@ -18,8 +19,118 @@ class HtmxConfig(pydantic.BaseModel):
     timeout: int = 20000
 
 
+class CacheConfig(pydantic.BaseModel):
+    # directory in which all on-disk caches are kept
+    directory: str = "cache"
+    # maximum size (in bytes) of the rendered page image cache
+    page_cache_size: int = 1024 * 1024 * 1024
+    # maximum size (in bytes) of the ocr result cache
+    ocr_cache_size: int = 1024 * 1024 * 1024
+    # maximum size (in bytes) of the cache for spatial block indexes
+    index_cache_size: int = 256 * 1024 * 1024
+    # maximum size (in bytes) of the cache for local copies of remote files
+    spill_cache_size: int = 10 * 1024 * 1024 * 1024
+
+
+class FileConfig(pydantic.BaseModel):
+    # hashlib algorithm used for file checksums (etags); note that changing
+    # the algorithm changes all etags and thus invalidates existing OCR runs
+    checksum_algorithm: str = "sha256"
+    # size (in bytes) of the chunks read while computing checksums
+    checksum_buffer_size: int = 1024 * 1024
+    # number of files that are checksummed concurrently
+    checksum_workers: int = 8
+
+
+class S3Config(pydantic.BaseModel):
+    # maximum number of pooled (keep-alive) connections to the s3 service
+    max_pool_connections: int = 32
+    # size (in bytes) of the ranged requests used to download objects
+    range_size: int = 8 * 1024 * 1024
+    # number of ranged requests that are sent concurrently
+    download_workers: int = 8
+    # number of retries for failed requests
+    max_attempts: int = 5
+
+
+class OcrConfig(pydantic.BaseModel):
+    # tesseract language(s), e.g. "eng" or "eng+deu"
+    language: str = "eng"
+    # number of OCR worker processes (0 = one per cpu core)
+    workers: int = 0
+    # number of pages per worker process that are rendered ahead
+    pages_in_flight: int = 2
+    # resolution (in dpi) assumed for images that do not state one; pdf pages
+    # are rendered at this resolution, too
+    default_dpi: int = 200
+    # time budget (in seconds) for the OCR of a single page; pages exceeding
+    # it are recorded as partial or failed (0 = no limit)
+    page_timeout: float = 120
+    # time budget (in seconds) for the OCR of a whole document; pages not
+    # processed within it are recorded as failed (0 = no limit)
+    document_timeout: float = 1800
+    # number of grid cells per axis of the pages' spatial block indexes
+    index_cells: int = 32
+
+
+class DatabaseConfig(pydantic.BaseModel):
+    # how the blocks of an OCR run are written: one ORM object per block
+    # ("orm"), one batched insert per page ("bulk") or postgresql's COPY
+    # ("copy")
+    block_insert: BlockInsertMode = BlockInsertMode.bulk
+    # how the blocks of new pages are stored: one row per block ("rows") or
+    # all blocks of a page packed into a single row ("packed")
+    block_storage: BlockStorage = BlockStorage.rows
+    # number of connections kept open in the pool; this and the following
+    # pool settings can be overridden per database alias (and role) with
+    # environment variables, see Database
+    pool_size: int = 5
+    # number of connections that may be opened beyond the pool size
+    max_overflow: int = 10
+    # seconds to wait for a connection before giving up
+    pool_timeout: float = 30
+    # seconds after which connections are replaced (-1 = never)
+    pool_recycle: int = 1800
+    # whether connections are tested before they are handed out
+    pool_pre_ping: bool = True
+    # maximum duration (in milliseconds) of a single statement (0 = no limit)
+    statement_timeout: int = 0
+    # waits for a connection longer than this (in seconds) are logged
+    checkout_warning: float = 0.5
+
+
+class ImageConfig(pydantic.BaseModel):
+    # maximum edge length (in pixels) of page thumbnails
+    thumbnail_size: int = 256
+    # maximum width (in pixels) of screen-sized page previews
+    preview_width: int = 1280
+    # edge length (in pixels) of full resolution zoom tiles
+    tile_size: int = 256
+    # jpeg quality of thumbnails, previews and tiles
+    pyramid_quality: int = 80
+    # encoding quality of page images per format
+    quality: dict[ImageFormat, int] = {
+        ImageFormat.jpeg: 85,
+        ImageFormat.webp: 80,
+        ImageFormat.avif: 60
+    }
+    # requested image widths are rounded up to multiples of this step (in
+    # pixels) so that only a few sizes per page have to be cached
+    width_step: int = 256
+    # maximum device pixel ratio a client may request
+    max_dpr: float = 3.0
+    # size (in bytes) of the chunks cached images are streamed in
+    chunk_size: int = 64 * 1024
+
+
 class Config(pydantic.BaseModel):
     htmx_config: HtmxConfig = HtmxConfig()
+    cache: CacheConfig = CacheConfig()
+    file: FileConfig = FileConfig()
+    s3: S3Config = S3Config()
+    ocr: OcrConfig = OcrConfig()
+    image: ImageConfig = ImageConfig()
+    database: DatabaseConfig = DatabaseConfig()
     # length of the random csrf token
     csrf_token_length: int = 32
     # name of the session id to be used in the http header/browser
@@ -30,6 +141,10 @@ class Config(pydantic.BaseModel):
     session_token_length: int = 32
     # whether to enforce csrf tokens
     force_csrf_token: bool = True
+    # max-age (in seconds) for static assets
+    static_max_age: int = 86400
+    # max-age (in seconds) for versioned (i.e. immutable) page images
+    image_max_age: int = 31536000
     # flash messages
     flash_messages: dict[FlashMessage, UserFlashMessage] = {
         FlashMessage.session_expired: UserFlashMessage(
@@ -2,10 +2,15 @@
 
 import sqlmodel
 import sqlalchemy
+import sqlalchemy.pool
+import sqlalchemy.ext.asyncio
+import sqlmodel.ext.asyncio.session
 import os
+import time
 import logging
-from typing import Any, Generator
-from contextlib import contextmanager
+import threading
+from typing import Any, AsyncGenerator, Dict, Generator
+from contextlib import asynccontextmanager, contextmanager
 
 # ---------------------------------------------------------------------------- #
 
@@ -40,24 +45,134 @@ class DatabaseSession(sqlmodel.Session):
 # ---------------------------------------------------------------------------- #
 
 
+class AsyncDatabaseSession(sqlmodel.ext.asyncio.session.AsyncSession):
+    """
+    A child of the SQLModel async session that provides additional
+    functionality. Objects are not expired on commit, since expired
+    attributes could only be reloaded by awaiting them.
+    """
+    logger: logging.Logger
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        kwargs.setdefault("expire_on_commit", False)
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger('mrkr.database')
+        self.logger.debug("New async database session initialized.")
+
+    async def commit(self) -> None:
+        """
+        Commit the session.
+        """
+        self.logger.debug("Committing to async database session.")
+
+        try:
+            await super().commit()
+        except Exception as exception:
+            self.logger.exception(exception)
+            raise Exception("Unable to commit to database session.")
+
+# ---------------------------------------------------------------------------- #
+
+
+class TimedQueuePool(sqlalchemy.pool.QueuePool):
+    """
+    A queue pool that measures how long connections are waited for. Waits
+    longer than the configured threshold are logged as warnings.
+    """
+    logger: logging.Logger
+    checkouts: int
+    wait_total: float
+    wait_max: float
+
+    _stats_lock: threading.Lock
+
+    def __init__(self, *args: Any, **kwargs: Any) -> None:
+        super().__init__(*args, **kwargs)
+        self.logger = logging.getLogger('mrkr.database')
+
+        self.checkouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        self._stats_lock = threading.Lock()
+
+    def _do_get(self) -> Any:
+        start = time.perf_counter()
+
+        try:
+            return super()._do_get()
+        finally:
+            wait = time.perf_counter() - start
+
+            with self._stats_lock:
+                self.checkouts += 1
+                self.wait_total += wait
+                self.wait_max = max(self.wait_max, wait)
+
+            if wait > config.database.checkout_warning:
+                self.logger.warning(
+                    f"Waited {wait:.3f}s for a database connection "
+                    f"({self.status()}).")
+
+    def statistics(self) -> Dict[str, Any]:
+        """
+        Return the pool's usage and the time spent waiting for connections.
+        """
+        with self._stats_lock:
+            return {
+                "size": self.size(),
+                "checked_out": self.checkedout(),
+                "overflow": max(0, self.overflow()),
+                "checkouts": self.checkouts,
+                "wait_total": round(self.wait_total, 6),
+                "wait_max": round(self.wait_max, 6)
+            }
+
+
+class TimedAsyncQueuePool(TimedQueuePool,
+                          sqlalchemy.pool.AsyncAdaptedQueuePool):
+    """
+    The timed queue pool for async engines.
+    """
+
+# ---------------------------------------------------------------------------- #
+
+
 class Database():
     """
     A wrapper for the SQLModel connection that utilizes environment variables
     to establish a connection.
+
+    Each Database has its own engine and thus its own connection pool. The
+    pool is configured with the variables <alias>_POOL_SIZE,
+    <alias>_MAX_OVERFLOW, <alias>_POOL_TIMEOUT, <alias>_POOL_RECYCLE,
+    <alias>_POOL_PRE_PING and <alias>_STATEMENT_TIMEOUT (in milliseconds).
+    A database with a role (e.g. "worker") prefers <alias>_<role>_<name>, so
+    that the pools of the web requests and of the background workers can be
+    sized separately.
     """
     alias: str
+    role: str | None
     host: str | None
     port: str | None
     user: str | None
     password: str | None
     database: str | None
 
+    pool_size: int
+    max_overflow: int
+    pool_timeout: float
+    pool_recycle: int
+    pool_pre_ping: bool
+    statement_timeout: int
+
     engine: sqlalchemy.engine.base.Engine | None
     logger: logging.Logger
 
     def __init__(
         self,
-        alias: str
+        alias: str,
+        role: str | None = None
     ) -> None:
         """
         Initialize the AsyncDatabase class.
@@ -65,16 +180,44 @@ class Database():
         self.logger = logging.getLogger('mrkr.database')
 
         self.alias = alias
+        self.role = role
         self.host = os.getenv(f"{alias}_HOST")
         self.port = os.getenv(f"{alias}_PORT")
         self.user = os.getenv(f"{alias}_USER")
         self.password = os.getenv(f"{alias}_PASSWORD")
         self.database = os.getenv(f"{alias}_DATABASE")
 
+        defaults = config.database
+
+        self.pool_size = int(self._getenv(
+            "POOL_SIZE", defaults.pool_size))
+        self.max_overflow = int(self._getenv(
+            "MAX_OVERFLOW", defaults.max_overflow))
+        self.pool_timeout = float(self._getenv(
+            "POOL_TIMEOUT", defaults.pool_timeout))
+        self.pool_recycle = int(self._getenv(
+            "POOL_RECYCLE", defaults.pool_recycle))
+        self.pool_pre_ping = str(self._getenv(
+            "POOL_PRE_PING", defaults.pool_pre_ping)).lower() in \
+            ("1", "true", "yes")
+        self.statement_timeout = int(self._getenv(
+            "STATEMENT_TIMEOUT", defaults.statement_timeout))
+
         self.engine = None
 
         self.logger.debug(f"Database with alias = {alias} initialized.")
 
+    def _getenv(self, name: str, default: Any) -> Any:
+        """
+        Get a pool setting of the database's role or alias.
+        """
+        if self.role:
+            value = os.getenv(f"{self.alias}_{self.role.upper()}_{name}")
+            if value:
+                return value
+
+        return os.getenv(f"{self.alias}_{name}") or default
+
     def connect(
         self
     ) -> None:
@@ -87,8 +230,25 @@ class Database():
         connection_string = f"postgresql://{self.user}:" \
             f"{self.password}@{self.host}:{self.port}/{self.database}"
 
+        connect_args = {}
+        if self.statement_timeout:
+            connect_args["options"] = \
+                f"-c statement_timeout={self.statement_timeout}"
+
+        if self.role:
+            connect_args["application_name"] = f"mrkr-{self.role}"
+
         try:
-            self.engine = sqlmodel.create_engine(connection_string)
+            self.engine = sqlmodel.create_engine(
+                connection_string,
+                poolclass=TimedQueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=self.pool_pre_ping,
+                connect_args=connect_args
+            )
         except Exception as exception:
             self.logger.exception(exception)
             raise Exception("Unable to create database engine.")
@@ -100,6 +260,17 @@ class Database():
         self.logger.debug(
             f"Database connection for alias = {self.alias} established.")
 
+    def pool_statistics(self) -> Dict[str, Any]:
+        """
+        Return the usage of the connection pool and the time spent waiting
+        for connections.
+        """
+        if self.engine is None or \
+                not isinstance(self.engine.pool, TimedQueuePool):
+            return {}
+
+        return self.engine.pool.statistics()
+
     def create_tables(self) -> None:
         self.connect()
 
@@ -137,3 +308,86 @@ class Database():
             yield session
 
 # ---------------------------------------------------------------------------- #
+
+
+class AsyncDatabase(Database):
+    """
+    The async counterpart of Database for request handlers: queries are sent
+    with asyncpg and awaited, so that a slow query does not block other
+    requests on the event loop. The connection and pool settings are the
+    same as for Database.
+    """
+    engine: sqlalchemy.ext.asyncio.AsyncEngine | None  # type: ignore
+
+    def connect(
+        self
+    ) -> None:
+        """
+        Create the async engine. Connections are established on demand.
+        """
+        if self.engine is not None:
+            return
+
+        connection_string = f"postgresql+asyncpg://{self.user}:" \
+            f"{self.password}@{self.host}:{self.port}/{self.database}"
+
+        server_settings = {}
+        if self.statement_timeout:
+            server_settings["statement_timeout"] = str(self.statement_timeout)
+
+        if self.role:
+            server_settings["application_name"] = f"mrkr-{self.role}"
+
+        try:
+            self.engine = sqlalchemy.ext.asyncio.create_async_engine(
+                connection_string,
+                poolclass=TimedAsyncQueuePool,
+                pool_size=self.pool_size,
+                max_overflow=self.max_overflow,
+                pool_timeout=self.pool_timeout,
+                pool_recycle=self.pool_recycle,
+                pool_pre_ping=self.pool_pre_ping,
+                connect_args={"server_settings": server_settings}
+            )
+        except Exception as exception:
+            self.logger.exception(exception)
+            raise Exception("Unable to create async database engine.")
+
+        self.logger.debug(
+            f"Async database engine for alias = {self.alias} created.")
+
+    def create_tables(self) -> None:
+        raise Exception("Use Database to create tables.")
+
+    def drop_tables(self) -> None:
+        raise Exception("Use Database to drop tables.")
+
+    def get_database_session(self) -> AsyncDatabaseSession:  # type: ignore
+        """
+        Get an async session from the database engine. The caller has to
+        close it.
+        """
+        self.connect()
+
+        return AsyncDatabaseSession(self.engine)
+
+    @asynccontextmanager
+    async def session(  # type: ignore
+        self
+    ) -> AsyncGenerator[AsyncDatabaseSession, None]:
+        """
+        Get an async session from the database engine.
+        """
+        self.connect()
+
+        async with AsyncDatabaseSession(self.engine) as session:
+            yield session
+
+    async def dispose(self) -> None:
+        """
+        Close all pooled connections, e.g. when the application stops.
+        """
+        if self.engine is not None:
+            await self.engine.dispose()
+
+# ---------------------------------------------------------------------------- #
@@ -1,6 +1,7 @@
 # ---------------------------------------------------------------------------- #
 
-from .base import FileObject
+from .base import BaseFileProvider, FileObject
 from .factory import FileProviderFactory
+from .pyramid import PagePyramid
 
 # ---------------------------------------------------------------------------- #
@@ -6,13 +6,18 @@ import contextlib
 import pathlib
 import pdf2image
 import hashlib
+import shutil
+import tempfile
 import io
-from typing import List, Generator
+import concurrent.futures
+from typing import Callable, List, Generator, Optional
 from PIL import Image
 
 # ---------------------------------------------------------------------------- #
 
-from ..models import FileObject
+from .buffer import BufferReader
+from ..config import config
+from ..models import FileObject, ImageFormat
 
 # ---------------------------------------------------------------------------- #
 
@@ -31,10 +36,12 @@ class BaseFileProvider():
 
     def list_files(
         self,
-        uri: str
+        uri: str,
+        progress: Optional[Callable[[int, int], None]] = None
     ) -> List[FileObject]:
         """
-        List all files in a directory.
+        List all files in a directory. The optional progress callback receives
+        the number of processed files and the total number of files.
         """
         raise NotImplementedError
 
@@ -48,20 +55,128 @@ class BaseFileProvider():
         """
         raise NotImplementedError
 
-    def file_to_image(
+    @contextlib.contextmanager
+    def read_buffer(
+        self,
+        uri: str
+    ) -> Generator[memoryview, None, None]:
+        """
+        Yields the file's content as a read-only buffer. Slices of the buffer
+        must be released before the context is left.
+        """
+        with self.read_file(uri=uri) as file:
+            with memoryview(file.read()) as buffer:
+                yield buffer
+
+    @contextlib.contextmanager
+    def local_file(
+        self,
+        uri: str
+    ) -> Generator[pathlib.Path, None, None]:
+        """
+        Yields the path of a local copy of the file. The copy is deleted
+        afterwards.
+        """
+        suffix = pathlib.Path(uri).suffix
+
+        with tempfile.NamedTemporaryFile(suffix=suffix) as copy:
+            with self.read_file(uri=uri) as file:
+                shutil.copyfileobj(file, copy)
+            copy.flush()
+
+            yield pathlib.Path(copy.name)
+
+    def iter_images(
         self,
         uri: str
+    ) -> Generator[Image.Image, None, None]:
+        """
+        Yield a file's pages as images, one page at a time. Each image is
+        rendered only when requested and closed once the next one is
+        requested, so that only a single page is held in memory.
+        """
+        filename = pathlib.Path(uri)
+
+        if filename.suffix.lower() != ".pdf":
+            for image in self.file_to_image(uri=uri):
+                try:
+                    yield image
+                finally:
+                    image.close()
+            return
+
+        with self.local_file(uri=uri) as path:
+            try:
+                info = pdf2image.pdfinfo_from_path(str(path))
+            except Exception as exception:
+                self.logger.exception(exception)
+                raise Exception(f"File '{uri}' could not be read.")
+
+            # poppler counts pages starting with one
+            for page in range(1, int(info["Pages"]) + 1):
+                try:
+                    images = pdf2image.convert_from_path(
+                        str(path),
+                        dpi=config.ocr.default_dpi,
+                        first_page=page,
+                        last_page=page
+                    )
+                except Exception as exception:
+                    self.logger.exception(exception)
+                    raise Exception(f"File '{uri}' could not be read.")
+
+                for image in images:
+                    try:
+                        yield image
+                    finally:
+                        image.close()
+
+                del images
+
+    def file_to_image(
+        self,
+        uri: str,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None
     ) -> List[Image.Image]:
         """
-        Convert a file to a set of images.
+        Convert a file to a set of images. Optionally, only the pages from
+        first_page to last_page (zero-based, inclusive) are converted.
+        """
+        filename = pathlib.Path(uri)
+
+        try:
+            if filename.suffix.lower() == ".pdf":
+                return self._read_pdf_file(
+                    uri=uri, first_page=first_page, last_page=last_page)
+            else:
+                return self._read_image_file(
+                    uri=uri, first_page=first_page, last_page=last_page)
+        except Exception as exception:
+            self.logger.exception(exception)
+            raise Exception(f"File '{uri}' could not be read.")
+
+    def page_count(
+        self,
+        uri: str
+    ) -> int:
+        """
+        Get the number of pages of a file without rendering it. Files that
+        are neither PDFs nor images are rejected; of images, only the header
+        is read.
         """
         filename = pathlib.Path(uri)
 
         try:
             if filename.suffix.lower() == ".pdf":
-                return self._read_pdf_file(uri=uri)
+                with self.local_file(uri=uri) as path:
+                    info = pdf2image.pdfinfo_from_path(str(path))
+                    return int(info["Pages"])
             else:
-                return self._read_image_file(uri=uri)
+                with self.read_buffer(uri=uri) as buffer:
+                    with BufferReader(buffer=buffer) as reader:
+                        with Image.open(reader):
+                            return 1
         except Exception as exception:
             self.logger.exception(exception)
             raise Exception(f"File '{uri}' could not be read.")
@@ -72,11 +187,38 @@ class BaseFileProvider():
         page: int = 0,
         quality: int = 95
     ) -> bytes:
-        images = self.file_to_image(uri=uri)
+        return self.file_to_image_bytes(
+            uri=uri, page=page, format=ImageFormat.jpeg, quality=quality)
+
+    def file_to_image_bytes(
+        self,
+        uri: str,
+        page: int = 0,
+        format: ImageFormat = ImageFormat.jpeg,
+        quality: int = 95,
+        width: Optional[int] = None
+    ) -> bytes:
+        """
+        Encode a page of a file as an image. If a width is given, larger
+        pages are downscaled to that width.
+        """
+        images = self.file_to_image(uri=uri, first_page=page, last_page=page)
+
+        if len(images) == 0:
+            raise Exception(f"Page {page} of file '{uri}' does not exist.")
+
+        image = images[0]
+
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        if width is not None and image.width > width:
+            height = round(image.height * width / image.width)
+            image = image.resize((width, height), Image.Resampling.LANCZOS)
 
         image_bytes = io.BytesIO()
 
-        images[page].save(image_bytes, format="JPEG", quality=quality)
+        image.save(image_bytes, format=format.value, quality=quality)
 
         image_bytes.seek(0)
 
@@ -86,30 +228,79 @@ class BaseFileProvider():
 
     def get_checksum(self, uri: str) -> str:
         """
-        Get the checksum of a file.
+        Get the checksum of a file. The file is streamed in chunks, so that
+        it is not held in memory; providers that can map their files into
+        memory hash the mapped buffer instead.
         """
-        sha256 = hashlib.sha256()
+        checksum = hashlib.new(config.file.checksum_algorithm)
 
         with self.read_file(uri=uri) as file:
-            while chunk := file.read(4096):
-                sha256.update(chunk)
+            while chunk := file.read(config.file.checksum_buffer_size):
+                checksum.update(chunk)
+
+        return checksum.hexdigest()
+
+    def get_checksums(
+        self,
+        uris: List[str],
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[str]:
+        """
+        Get the checksums of several files using a bounded thread pool. The
+        checksums are returned in the order of the uris.
+        """
+        checksums: List[str] = [""] * len(uris)
+
+        if len(uris) == 0:
+            return checksums
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.file.checksum_workers,
+            thread_name_prefix="checksum"
+        ) as executor:
+            futures = {
+                executor.submit(self.get_checksum, uri=uri): index
+                for index, uri in enumerate(uris)
+            }
+
+            for done, future in enumerate(
+                    concurrent.futures.as_completed(futures), start=1):
+                checksums[futures[future]] = future.result()
 
-        return sha256.hexdigest()
+                if progress:
+                    progress(done, len(uris))
+
+        return checksums
 
     def _read_image_file(
         self,
-        uri: str
+        uri: str,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None
     ) -> List[Image.Image]:
-        with self.read_file(uri=uri) as file:
-            image = Image.open(io.BytesIO(file.read()))
-            return [image]
+        if (first_page or 0) > 0 or (last_page is not None and last_page < 0):
+            return []
+
+        with self.read_buffer(uri=uri) as buffer:
+            with BufferReader(buffer=buffer) as reader:
+                image = Image.open(reader)
+                image.load()
+                return [image]
 
     def _read_pdf_file(
         self,
-        uri: str
+        uri: str,
+        first_page: Optional[int] = None,
+        last_page: Optional[int] = None
     ) -> List[Image.Image]:
-        with self.read_file(uri=uri) as file:
-            images = pdf2image.convert_from_bytes(file.read())
+        # poppler counts pages starting with one
+        with self.local_file(uri=uri) as path:
+            images = pdf2image.convert_from_path(
+                str(path),
+                dpi=config.ocr.default_dpi,
+                first_page=first_page + 1 if first_page is not None else None,
+                last_page=last_page + 1 if last_page is not None else None
+            )
             return images
 
 # ---------------------------------------------------------------------------- #
@@ -0,0 +1,106 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import mmap
+import pathlib
+import contextlib
+from typing import Generator
+
+# ---------------------------------------------------------------------------- #
+
+
+@contextlib.contextmanager
+def map_file(
+    path: pathlib.Path
+) -> Generator[memoryview, None, None]:
+    """
+    Yields a memory-mapped, read-only view of a local file. The file's content
+    is paged in by the operating system instead of being copied.
+    """
+    with path.open("rb") as file:
+        # empty files cannot be mapped
+        if path.stat().st_size == 0:
+            with memoryview(b"") as buffer:
+                yield buffer
+            return
+
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as map:
+            with memoryview(map) as buffer:
+                yield buffer
+
+# ---------------------------------------------------------------------------- #
+
+
+class BufferReader(io.RawIOBase):
+    """
+    A read-only, seekable file object on top of a buffer (e.g. a memory-mapped
+    file). Reads copy only the requested bytes, never the whole buffer.
+    """
+    _view: memoryview
+    _position: int
+
+    def __init__(
+        self,
+        buffer: memoryview
+    ) -> None:
+        """
+        Initialize the reader.
+        """
+        super().__init__()
+
+        self._view = buffer.cast("B")
+        self._position = 0
+
+    def readable(self) -> bool:
+        return True
+
+    def seekable(self) -> bool:
+        return True
+
+    def readinto(self, buffer: memoryview) -> int:  # type: ignore[override]
+        """
+        Read bytes into a pre-allocated buffer.
+        """
+        size = min(len(buffer), len(self._view) - self._position)
+
+        if size <= 0:
+            return 0
+
+        buffer[:size] = self._view[self._position:self._position + size]
+        self._position += size
+
+        return size
+
+    def seek(self, offset: int, whence: int = io.SEEK_SET) -> int:
+        """
+        Change the stream position.
+        """
+        if whence == io.SEEK_SET:
+            position = offset
+        elif whence == io.SEEK_CUR:
+            position = self._position + offset
+        elif whence == io.SEEK_END:
+            position = len(self._view) + offset
+        else:
+            raise ValueError(f"Invalid whence: {whence}")
+
+        if position < 0:
+            raise ValueError("Negative seek position.")
+
+        self._position = position
+
+        return self._position
+
+    def tell(self) -> int:
+        return self._position
+
+    def close(self) -> None:
+        """
+        Close the reader and release the underlying buffer.
+        """
+        if not self.closed:
+            self._view.release()
+
+        super().close()
+
+# ---------------------------------------------------------------------------- #
@@ -2,6 +2,7 @@
 
 from .base import BaseFileProvider
 from .local import LocalFileProvider
+from .s3 import S3FileProvider
 from ..models import SourceProvider
 
 # ---------------------------------------------------------------------------- #
@@ -19,6 +20,8 @@ class FileProviderFactory():
         match provider:
             case SourceProvider.local:
                 return LocalFileProvider()
+            case SourceProvider.s3:
+                return S3FileProvider()
             case _:
                 raise Exception(f"Unknown file provider: {provider}")
 
@@ -0,0 +1,122 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import sqlite3
+import logging
+import pathlib
+import threading
+
+# ---------------------------------------------------------------------------- #
+
+from ..config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class FingerprintCache():
+    """
+    A persistent cache of file checksums (per hash algorithm). A checksum is
+    only reused as long as the file's size, modification time and inode are
+    unchanged.
+    """
+    logger: logging.Logger
+    path: pathlib.Path
+
+    _lock: threading.Lock
+    _connection: sqlite3.Connection | None
+
+    def __init__(
+        self,
+        path: pathlib.Path
+    ) -> None:
+        """
+        Initialize the cache. The database is opened lazily.
+        """
+        self.logger = logging.getLogger('mrkr.cache')
+
+        self.path = path
+
+        self._lock = threading.Lock()
+        self._connection = None
+
+    def get(
+        self,
+        path: str,
+        algorithm: str,
+        stat: os.stat_result
+    ) -> str | None:
+        """
+        Return the cached checksum of a file or None if the file is unknown or
+        has changed.
+        """
+        with self._lock:
+            row = self._connect().execute(
+                "SELECT checksum FROM checksum WHERE path = ? AND "
+                "algorithm = ? AND size = ? AND mtime_ns = ? AND inode = ?",
+                (path, algorithm, stat.st_size, stat.st_mtime_ns, stat.st_ino)
+            ).fetchone()
+
+        if row is None:
+            return None
+
+        return row[0]
+
+    def put(
+        self,
+        path: str,
+        algorithm: str,
+        stat: os.stat_result,
+        checksum: str
+    ) -> None:
+        """
+        Store the checksum of a file.
+        """
+        with self._lock:
+            connection = self._connect()
+            connection.execute(
+                "INSERT OR REPLACE INTO checksum "
+                "(path, algorithm, size, mtime_ns, inode, checksum) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                (path, algorithm, stat.st_size, stat.st_mtime_ns, stat.st_ino,
+                 checksum)
+            )
+            connection.commit()
+
+    def _connect(self) -> sqlite3.Connection:
+        """
+        Open the database and create the table if necessary. Must be called
+        while holding the lock.
+        """
+        if self._connection is not None:
+            return self._connection
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        connection = sqlite3.connect(self.path, check_same_thread=False)
+        connection.execute("PRAGMA journal_mode = WAL")
+        connection.execute("PRAGMA synchronous = NORMAL")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS checksum ("
+            "path TEXT NOT NULL, "
+            "algorithm TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "mtime_ns INTEGER NOT NULL, "
+            "inode INTEGER NOT NULL, "
+            "checksum TEXT NOT NULL, "
+            "PRIMARY KEY (path, algorithm))"
+        )
+        connection.commit()
+
+        self._connection = connection
+
+        self.logger.debug(f"Fingerprint cache '{self.path}' opened.")
+
+        return connection
+
+# ---------------------------------------------------------------------------- #
+
+
+fingerprint_cache = FingerprintCache(
+    path=pathlib.Path(config.cache.directory) / "fingerprints.sqlite")
+
+# ---------------------------------------------------------------------------- #
@@ -1,13 +1,17 @@
 # ---------------------------------------------------------------------------- #
 
 import pathlib
+import hashlib
 import contextlib
 import io
-from typing import List, Generator
+from typing import Callable, List, Generator, Optional
 
 # ---------------------------------------------------------------------------- #
 
 from .base import BaseFileProvider, FileObject
+from .buffer import map_file
+from .fingerprint import fingerprint_cache
+from ..config import config
 
 # ---------------------------------------------------------------------------- #
 
@@ -19,7 +23,8 @@ class LocalFileProvider(BaseFileProvider):
 
     def list_files(
         self,
-        uri: str
+        uri: str,
+        progress: Optional[Callable[[int, int], None]] = None
     ) -> List[FileObject]:
         """
         List all files in a directory.
@@ -29,18 +34,49 @@ class LocalFileProvider(BaseFileProvider):
         if len(files) == 0:
             return []
 
+        checksums = self.get_checksums(
+            uris=[str(file) for file in files], progress=progress)
+
         result = []
-        for file in files:
+        for file, checksum in zip(files, checksums):
             result.append(
                 FileObject(
                     name=file.name,
                     uri=str(file.resolve()),
-                    etag=self.get_checksum(str(file))
+                    etag=checksum
                 )
             )
 
         return result
 
+    def get_checksum(self, uri: str) -> str:
+        """
+        Get the checksum of a file. Checksums are cached and only recomputed
+        if the file's size, modification time or inode have changed. The
+        file is hashed through a memory map, without copying it.
+        """
+        filename = pathlib.Path(uri).resolve()
+
+        stat = filename.stat()
+
+        algorithm = config.file.checksum_algorithm
+
+        checksum = fingerprint_cache.get(
+            path=str(filename), algorithm=algorithm, stat=stat)
+
+        if checksum is None:
+            digest = hashlib.new(algorithm)
+
+            with self.read_buffer(uri=str(filename)) as buffer:
+                digest.update(buffer)
+
+            checksum = digest.hexdigest()
+            fingerprint_cache.put(
+                path=str(filename), algorithm=algorithm, stat=stat,
+                checksum=checksum)
+
+        return checksum
+
     @contextlib.contextmanager
     def read_file(
         self,
@@ -57,4 +93,31 @@ class LocalFileProvider(BaseFileProvider):
         with pathlib.Path(uri).open("rb") as file:
             yield file
 
+    @contextlib.contextmanager
+    def read_buffer(
+        self,
+        uri: str
+    ) -> Generator[memoryview, None, None]:
+        """
+        Yields a memory-mapped, read-only view of the file.
+        """
+        with self.local_file(uri=uri) as path:
+            with map_file(path=path) as buffer:
+                yield buffer
+
+    @contextlib.contextmanager
+    def local_file(
+        self,
+        uri: str
+    ) -> Generator[pathlib.Path, None, None]:
+        """
+        Yields the file's path. Local files do not need to be copied.
+        """
+        filename = pathlib.Path(uri)
+
+        if not filename.is_file():
+            raise FileNotFoundError(f"File {filename} not found.")
+
+        yield filename
+
 # ---------------------------------------------------------------------------- #
@@ -0,0 +1,151 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import re
+import json
+import math
+from typing import Generator, Tuple
+from PIL import Image
+
+# ---------------------------------------------------------------------------- #
+
+from ..config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class PagePyramid():
+    """
+    An image pyramid of a single page: a thumbnail, a screen-sized preview and
+    a grid of full resolution zoom tiles. The manifest describes the grid so
+    that clients can place the tiles.
+    """
+    image: Image.Image
+    tile_size: int
+    quality: int
+
+    def __init__(
+        self,
+        image: Image.Image
+    ) -> None:
+        """
+        Initialize the pyramid from a rendered page.
+        """
+        if image.mode not in ("RGB", "L"):
+            image = image.convert("RGB")
+
+        self.image = image
+        self.tile_size = config.image.tile_size
+        self.quality = config.image.pyramid_quality
+
+    @property
+    def columns(self) -> int:
+        """
+        Return the number of tile columns.
+        """
+        return math.ceil(self.image.width / self.tile_size)
+
+    @property
+    def rows(self) -> int:
+        """
+        Return the number of tile rows.
+        """
+        return math.ceil(self.image.height / self.tile_size)
+
+    @staticmethod
+    def is_variant(name: str, manifest: bytes | None = None) -> bool:
+        """
+        Check whether a variant exists. Tiles are checked against the grid
+        described by a manifest, if one is given.
+        """
+        if name in ("manifest", "thumbnail", "preview"):
+            return True
+
+        match = re.fullmatch(r"tile-(\d+)-(\d+)", name)
+        if match is None:
+            return False
+
+        if manifest is None:
+            return True
+
+        layout = json.loads(manifest)
+
+        return int(match[1]) < layout["columns"] and \
+            int(match[2]) < layout["rows"]
+
+    def render(self) -> Generator[Tuple[str, bytes], None, None]:
+        """
+        Yield all variants of the pyramid as (name, content) pairs.
+        """
+        yield "manifest", self.manifest()
+        yield "thumbnail", self.thumbnail()
+        yield "preview", self.preview()
+
+        for y in range(self.rows):
+            for x in range(self.columns):
+                yield f"tile-{x}-{y}", self.tile(x=x, y=y)
+
+    def manifest(self) -> bytes:
+        """
+        Return the pyramid's layout as JSON.
+        """
+        return json.dumps({
+            "width": self.image.width,
+            "height": self.image.height,
+            "tile_size": self.tile_size,
+            "columns": self.columns,
+            "rows": self.rows
+        }).encode()
+
+    def thumbnail(self) -> bytes:
+        """
+        Return a small thumbnail of the page.
+        """
+        size = config.image.thumbnail_size
+
+        image = self.image.copy()
+        image.thumbnail((size, size))
+
+        return self._encode(image=image)
+
+    def preview(self) -> bytes:
+        """
+        Return a screen-sized preview of the page.
+        """
+        width = config.image.preview_width
+
+        if self.image.width <= width:
+            return self._encode(image=self.image)
+
+        height = round(self.image.height * width / self.image.width)
+        image = self.image.resize((width, height), Image.Resampling.LANCZOS)
+
+        return self._encode(image=image)
+
+    def tile(self, x: int, y: int) -> bytes:
+        """
+        Return a full resolution tile of the page.
+        """
+        left = x * self.tile_size
+        top = y * self.tile_size
+
+        image = self.image.crop((
+            left,
+            top,
+            min(left + self.tile_size, self.image.width),
+            min(top + self.tile_size, self.image.height)
+        ))
+
+        return self._encode(image=image)
+
+    def _encode(self, image: Image.Image) -> bytes:
+        """
+        Encode an image as JPEG.
+        """
+        image_bytes = io.BytesIO()
+
+        image.save(image_bytes, format="JPEG", quality=self.quality)
+
+        return image_bytes.getvalue()
+
+# ---------------------------------------------------------------------------- #
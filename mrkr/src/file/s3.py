@@ -0,0 +1,275 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import io
+import re
+import boto3
+import botocore.config
+import pathlib
+import tempfile
+import threading
+import contextlib
+import concurrent.futures
+from typing import Any, BinaryIO, Callable, ClassVar, Generator, List
+from typing import Optional, Tuple
+
+# ---------------------------------------------------------------------------- #
+
+from .base import BaseFileProvider, FileObject
+from .buffer import map_file
+from ..cache import spill_cache
+from ..config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class S3FileProvider(BaseFileProvider):
+    """
+    The S3FileProvider class is used to retrieve data from AWS S3 or an
+    S3-compatible service (e.g. MinIO). The connection is configured using the
+    environment variables S3_ENDPOINT_URL, S3_REGION, S3_ACCESS_KEY_ID and
+    S3_SECRET_ACCESS_KEY. Project uris have the form 'bucket/prefix*', task
+    uris the form 's3://bucket/key'.
+    """
+    _client: ClassVar[Any] = None
+    _client_lock: ClassVar[threading.Lock] = threading.Lock()
+
+    @classmethod
+    def client(cls) -> Any:
+        """
+        Return the client shared by all providers of this process. The client
+        keeps a pool of keep-alive connections.
+        """
+        with cls._client_lock:
+            if cls._client is not None:
+                return cls._client
+
+            cls._client = boto3.session.Session().client(
+                "s3",
+                endpoint_url=os.getenv("S3_ENDPOINT_URL") or None,
+                region_name=os.getenv("S3_REGION") or None,
+                aws_access_key_id=os.getenv("S3_ACCESS_KEY_ID") or None,
+                aws_secret_access_key=os.getenv(
+                    "S3_SECRET_ACCESS_KEY") or None,
+                config=botocore.config.Config(
+                    max_pool_connections=config.s3.max_pool_connections,
+                    tcp_keepalive=True,
+                    retries={
+                        "max_attempts": config.s3.max_attempts,
+                        "mode": "standard"
+                    }
+                )
+            )
+
+            return cls._client
+
+    def list_files(
+        self,
+        uri: str,
+        progress: Optional[Callable[[int, int], None]] = None
+    ) -> List[FileObject]:
+        """
+        List all objects matching a pattern. As with local files, wildcards
+        only match within a path segment, and '**/' matches any number of
+        directories. A pattern without wildcards matches only the object of
+        that name. The objects' etags are taken from the listing, so no
+        object has to be downloaded (and there is no progress to report).
+        """
+        bucket, pattern = self._split_uri(uri=uri)
+
+        prefix = pattern
+        for wildcard in ("*", "?", "["):
+            prefix = prefix.split(wildcard)[0]
+
+        matcher = self._compile_pattern(pattern=pattern)
+
+        paginator = self.client().get_paginator("list_objects_v2")
+
+        result = []
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for item in page.get("Contents", []):
+                key = item["Key"]
+
+                if key.endswith("/"):
+                    continue
+
+                if not matcher.fullmatch(key):
+                    continue
+
+                result.append(
+                    FileObject(
+                        name=pathlib.PurePosixPath(key).name,
+                        uri=f"s3://{bucket}/{key}",
+                        etag=item["ETag"].strip('"')
+                    )
+                )
+
+        return result
+
+    def get_checksum(self, uri: str) -> str:
+        """
+        Get the checksum of an object. The object's etag is used instead of
+        downloading and hashing the object.
+        """
+        bucket, key = self._split_uri(uri=uri)
+
+        head = self.client().head_object(Bucket=bucket, Key=key)
+
+        return head["ETag"].strip('"')
+
+    @contextlib.contextmanager
+    def read_file(
+        self,
+        uri: str
+    ) -> Generator[io.BufferedReader, None, None]:
+        """
+        Yields a binary stream of the object.
+        """
+        bucket, key = self._split_uri(uri=uri)
+
+        response = self.client().get_object(Bucket=bucket, Key=key)
+
+        body = response["Body"]
+        try:
+            yield body
+        finally:
+            body.close()
+
+    def read_range(
+        self,
+        uri: str,
+        start: int,
+        end: int
+    ) -> bytes:
+        """
+        Read the bytes from start to end (inclusive) of an object.
+        """
+        bucket, key = self._split_uri(uri=uri)
+
+        response = self.client().get_object(
+            Bucket=bucket, Key=key, Range=f"bytes={start}-{end}")
+
+        with contextlib.closing(response["Body"]) as body:
+            return body.read()
+
+    @contextlib.contextmanager
+    def read_buffer(
+        self,
+        uri: str
+    ) -> Generator[memoryview, None, None]:
+        """
+        Yields a memory-mapped, read-only view of the object's local copy.
+        """
+        with self.local_file(uri=uri) as path:
+            with map_file(path=path) as buffer:
+                yield buffer
+
+    @contextlib.contextmanager
+    def local_file(
+        self,
+        uri: str
+    ) -> Generator[pathlib.Path, None, None]:
+        """
+        Yields the path of a local copy of the object. Copies are kept in the
+        spill cache, keyed by the object's etag. The yielded path is a hard
+        link, so it stays valid even if the copy is evicted meanwhile.
+        """
+        bucket, key = self._split_uri(uri=uri)
+
+        head = self.client().head_object(Bucket=bucket, Key=key)
+
+        etag = head["ETag"].strip('"')
+        size = head["ContentLength"]
+
+        cache_key = spill_cache.key(uri, etag)
+
+        directory = pathlib.Path(config.cache.directory)
+        directory.mkdir(parents=True, exist_ok=True)
+
+        with tempfile.TemporaryDirectory(dir=directory) as temporary:
+            link = pathlib.Path(temporary) / \
+                f"object{pathlib.PurePosixPath(key).suffix}"
+
+            path = spill_cache.get(key=cache_key)
+
+            try:
+                if path is None:
+                    raise FileNotFoundError
+                os.link(path, link)
+            except FileNotFoundError:
+                path = spill_cache.put_file(
+                    key=cache_key,
+                    writer=lambda file: self._download(
+                        uri=uri, size=size, file=file)
+                )
+                os.link(path, link)
+
+            yield link
+
+    def _download(
+        self,
+        uri: str,
+        size: int,
+        file: BinaryIO
+    ) -> None:
+        """
+        Download an object into a file using concurrent ranged requests.
+        """
+        file.truncate(size)
+
+        def download_range(start: int) -> None:
+            end = min(start + config.s3.range_size, size) - 1
+            content = self.read_range(uri=uri, start=start, end=end)
+            os.pwrite(file.fileno(), content, start)
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max_workers=config.s3.download_workers,
+            thread_name_prefix="download"
+        ) as executor:
+            futures = [
+                executor.submit(download_range, start)
+                for start in range(0, size, config.s3.range_size)
+            ]
+
+            for future in futures:
+                future.result()
+
+        self.logger.debug(f"Object '{uri}' downloaded ({size} bytes).")
+
+    @staticmethod
+    def _compile_pattern(pattern: str) -> re.Pattern:
+        """
+        Translate a glob pattern into a regular expression that matches keys.
+        """
+        expression = ""
+
+        for part in re.split(r"(\*\*/|\*|\?|\[[^\]]+\])", pattern):
+            if part == "**/":
+                expression += "(?:.*/)?"
+            elif part == "*":
+                expression += "[^/]*"
+            elif part == "?":
+                expression += "[^/]"
+            elif part.startswith("["):
+                characters = part[1:-1].replace("\\", "\\\\")
+                if characters.startswith("!"):
+                    characters = "^" + characters[1:]
+                expression += f"[{characters}]"
+            else:
+                expression += re.escape(part)
+
+        return re.compile(expression)
+
+    @staticmethod
+    def _split_uri(uri: str) -> Tuple[str, str]:
+        """
+        Split an uri into bucket and key.
+        """
+        bucket, _, key = uri.removeprefix("s3://").partition("/")
+
+        if not bucket:
+            raise Exception(f"Invalid S3 uri: {uri}")
+
+        return bucket, key
+
+# ---------------------------------------------------------------------------- #
@@ -0,0 +1,438 @@
+# ---------------------------------------------------------------------------- #
+
+import json
+import enum
+import logging
+import datetime
+import pydantic
+import sqlmodel
+import sqlalchemy
+from typing import Any, Callable, Dict, List
+
+# ---------------------------------------------------------------------------- #
+
+from .models import *
+from .database import Database
+
+# ---------------------------------------------------------------------------- #
+
+
+class Migration(pydantic.BaseModel):
+    """
+    A versioned change of the schema. Transactional migrations are applied
+    and recorded in a single transaction. Others (e.g. those that create
+    indexes concurrently) run in autocommit mode and have to be idempotent,
+    since an interrupted run is repeated.
+    """
+    version: int
+    description: str
+    upgrade: Callable[[sqlalchemy.Connection], None]
+    transactional: bool = True
+
+# ---------------------------------------------------------------------------- #
+
+
+def _create_enum(
+    connection: sqlalchemy.Connection,
+    name: str,
+    values: List[str]
+) -> None:
+    """
+    Create an enum type, or add the values that an existing type lacks.
+    """
+    exists = connection.execute(sqlalchemy.text(
+        "SELECT 1 FROM pg_type WHERE typname = :name"), {"name": name}).first()
+
+    if not exists:
+        labels = ", ".join(f"'{value}'" for value in values)
+        connection.execute(sqlalchemy.text(
+            f'CREATE TYPE "{name}" AS ENUM ({labels})'))
+        return
+
+    for value in values:
+        connection.execute(sqlalchemy.text(
+            f"ALTER TYPE \"{name}\" ADD VALUE IF NOT EXISTS '{value}'"))
+
+
+def _add_column(
+    connection: sqlalchemy.Connection,
+    table: str,
+    name: str,
+    definition: str,
+    backfill: str | None = None
+) -> None:
+    """
+    Add a column, if it does not exist yet. Columns with a backfill value
+    are NOT NULL: rows that exist already are set to the value before the
+    constraint is added.
+    """
+    connection.execute(sqlalchemy.text(
+        f'ALTER TABLE "{table}" ADD COLUMN IF NOT EXISTS "{name}" '
+        f'{definition}'))
+
+    if backfill is None:
+        return
+
+    connection.execute(sqlalchemy.text(
+        f'UPDATE "{table}" SET "{name}" = :value WHERE "{name}" IS NULL'),
+        {"value": backfill})
+
+    connection.execute(sqlalchemy.text(
+        f'ALTER TABLE "{table}" ALTER COLUMN "{name}" SET NOT NULL'))
+
+
+def _drop_not_null(
+    connection: sqlalchemy.Connection,
+    table: str,
+    name: str
+) -> None:
+    """
+    Make a column nullable.
+    """
+    connection.execute(sqlalchemy.text(
+        f'ALTER TABLE "{table}" ALTER COLUMN "{name}" DROP NOT NULL'))
+
+
+def _create_index(
+    connection: sqlalchemy.Connection,
+    name: str,
+    table: str,
+    columns: List[str]
+) -> None:
+    """
+    Create an index without locking the table against writes. A failed
+    concurrent build leaves an invalid index behind, which is dropped and
+    built again.
+    """
+    invalid = connection.execute(sqlalchemy.text(
+        "SELECT 1 FROM pg_index JOIN pg_class ON pg_class.oid = "
+        "pg_index.indexrelid WHERE pg_class.relname = :name AND "
+        "NOT pg_index.indisvalid"), {"name": name}).first()
+
+    if invalid:
+        connection.execute(sqlalchemy.text(
+            f'DROP INDEX CONCURRENTLY IF EXISTS "{name}"'))
+
+    definition = ", ".join(f'"{column}"' for column in columns)
+
+    connection.execute(sqlalchemy.text(
+        f'CREATE INDEX CONCURRENTLY IF NOT EXISTS "{name}" '
+        f'ON "{table}" ({definition})'))
+
+# ---------------------------------------------------------------------------- #
+
+# The migrations spell out their DDL instead of deriving it from the models,
+# so that they keep their meaning when the models change later on.
+
+
+def _upgrade_columns(connection: sqlalchemy.Connection) -> None:
+    _create_enum(connection, "ocrprovider", ["tesseract", "tesseract_api"])
+    _create_enum(connection, "ocrstatus", ["complete", "partial"])
+    _create_enum(connection, "pagestatus", ["complete", "partial", "failed"])
+
+    _add_column(connection, "ttask", "etag", "VARCHAR")
+    _add_column(connection, "ttask", "modified",
+                "TIMESTAMP WITH TIME ZONE")
+    _add_column(connection, "ttask", "ocr_deadline",
+                "TIMESTAMP WITH TIME ZONE")
+    _add_column(connection, "tproject", "preprocessing", "JSON")
+    _add_column(connection, "tocr", "status", "ocrstatus",
+                backfill="complete")
+    _add_column(connection, "tocr", "engine_config", "VARCHAR")
+    _add_column(connection, "tpage", "status", "pagestatus",
+                backfill="complete")
+    _add_column(connection, "tpage", "checksum", "VARCHAR")
+
+
+def _upgrade_packed_blocks(connection: sqlalchemy.Connection) -> None:
+    _create_enum(connection, "blockstorage", ["rows", "packed"])
+
+    _add_column(connection, "tpage", "storage", "blockstorage",
+                backfill="rows")
+
+    connection.execute(sqlalchemy.text(
+        'CREATE TABLE IF NOT EXISTS "tpackedblocks" ('
+        '"page_id" INTEGER NOT NULL, '
+        '"data" BYTEA NOT NULL, '
+        'PRIMARY KEY ("page_id"), '
+        'FOREIGN KEY ("page_id") REFERENCES "tpage" ("id"))'))
+
+    _add_column(connection, "tlabellink", "page_id",
+                'INTEGER REFERENCES "tpage" ("id")')
+    _add_column(connection, "tlabellink", "block_index", "INTEGER")
+    _drop_not_null(connection, "tlabellink", "block_id")
+
+
+# the foreign key indexes as (name, table, columns)
+_indexes = [
+    ("ix_ttask_project_id", "ttask", ["project_id"]),
+    ("ix_tlabeltype_project_id", "tlabeltype", ["project_id"]),
+    ("ix_tocr_task_id", "tocr", ["task_id"]),
+    ("ix_tpage_ocr_id", "tpage", ["ocr_id"]),
+    ("ix_tblock_page_id", "tblock", ["page_id"]),
+    ("ix_tlabel_task_id", "tlabel", ["task_id"]),
+    ("ix_tlabellink_label_id", "tlabellink", ["label_id"]),
+    ("ix_tlabellink_block_id", "tlabellink", ["block_id"]),
+    ("ix_tlabellink_page_id", "tlabellink", ["page_id"]),
+]
+
+
+def _upgrade_indexes(connection: sqlalchemy.Connection) -> None:
+    for name, table, columns in _indexes:
+        _create_index(connection, name=name, table=table, columns=columns)
+
+
+def _upgrade_scan_progress(connection: sqlalchemy.Connection) -> None:
+    _add_column(connection, "tproject", "scan_checked", "INTEGER")
+    _add_column(connection, "tproject", "scan_total", "INTEGER")
+
+
+migrations: List[Migration] = [
+    Migration(
+        version=1,
+        description="Add the task, project, OCR and page columns",
+        upgrade=_upgrade_columns
+    ),
+    Migration(
+        version=2,
+        description="Add packed block storage",
+        upgrade=_upgrade_packed_blocks
+    ),
+    Migration(
+        version=3,
+        description="Index the foreign keys",
+        upgrade=_upgrade_indexes,
+        transactional=False
+    ),
+    Migration(
+        version=4,
+        description="Add the scan progress of projects",
+        upgrade=_upgrade_scan_progress
+    ),
+]
+
+# ---------------------------------------------------------------------------- #
+
+
+class PlanCheck(str, enum.Enum):
+    tasks_of_project = "tasks_of_project"
+    labeltypes_of_project = "labeltypes_of_project"
+    ocr_of_task = "ocr_of_task"
+    pages_of_ocr = "pages_of_ocr"
+    blocks_of_page = "blocks_of_page"
+    labels_of_task = "labels_of_task"
+    links_of_label = "links_of_label"
+    links_of_block = "links_of_block"
+    links_of_page = "links_of_page"
+
+
+class MigrationManager():
+    """
+    Applies the versioned migrations to a live database. The applied
+    versions are recorded in tschemaversion; a database that predates it is
+    treated as unversioned, and all migrations are applied (they only add
+    what is missing).
+    """
+    logger: logging.Logger
+    database: Database
+    migrations: List[Migration]
+
+    # the key of the advisory lock that serializes concurrent migrations
+    _lock = 0x6d726b72
+
+    def __init__(
+        self,
+        database: Database,
+        migrations: List[Migration] = migrations
+    ) -> None:
+        """
+        Initialize the manager.
+        """
+        self.logger = logging.getLogger('mrkr.migrations')
+
+        self.database = database
+        self.migrations = sorted(migrations, key=lambda m: m.version)
+
+    @property
+    def engine(self) -> sqlalchemy.Engine:
+        """
+        Return the database's engine, which has to be postgresql.
+        """
+        self.database.connect()
+
+        if self.database.engine is None:
+            raise Exception("Unable to create database engine.")
+
+        if self.database.engine.dialect.name != "postgresql":
+            raise Exception("Migrations require postgresql.")
+
+        return self.database.engine
+
+    def applied(self) -> Dict[int, SchemaVersion]:
+        """
+        Return the applied migrations, keyed by their version.
+        """
+        with self.engine.begin() as connection:
+            SchemaVersion.__table__.create(connection, checkfirst=True)
+
+        with self.database.session() as session:
+            versions = session.exec(sqlmodel.select(SchemaVersion)).all()
+
+        return {version.version: version for version in versions}
+
+    def pending(self, target: int | None = None) -> List[Migration]:
+        """
+        Return the migrations that are not applied yet, up to the target
+        version.
+        """
+        applied = self.applied()
+
+        return [migration for migration in self.migrations
+                if migration.version not in applied and
+                (target is None or migration.version <= target)]
+
+    def status(self) -> List[Dict[str, Any]]:
+        """
+        Return all migrations and when they were applied.
+        """
+        applied = self.applied()
+
+        return [{
+            "version": migration.version,
+            "description": migration.description,
+            "applied": applied[migration.version].applied
+            if migration.version in applied else None
+        } for migration in self.migrations]
+
+    def migrate(self, target: int | None = None) -> List[Migration]:
+        """
+        Apply the pending migrations in order and return them.
+        """
+        engine = self.engine
+
+        with engine.connect() as lock:
+            lock.execute(sqlalchemy.text("SELECT pg_advisory_lock(:key)"),
+                         {"key": self._lock})
+            lock.commit()
+
+            try:
+                pending = self.pending(target=target)
+
+                for migration in pending:
+                    self._apply(engine=engine, migration=migration)
+            finally:
+                lock.execute(
+                    sqlalchemy.text("SELECT pg_advisory_unlock(:key)"),
+                    {"key": self._lock})
+                lock.commit()
+
+        return pending
+
+    def _apply(
+        self,
+        engine: sqlalchemy.Engine,
+        migration: Migration
+    ) -> None:
+        """
+        Apply and record a single migration.
+        """
+        self.logger.info(
+            f"Applying migration {migration.version}: "
+            f"{migration.description}.")
+
+        if migration.transactional:
+            with engine.begin() as connection:
+                migration.upgrade(connection)
+                self._record(connection=connection, migration=migration)
+        else:
+            with engine.connect() as connection:
+                connection = connection.execution_options(
+                    isolation_level="AUTOCOMMIT")
+                migration.upgrade(connection)
+                self._record(connection=connection, migration=migration)
+
+    def _record(
+        self,
+        connection: sqlalchemy.Connection,
+        migration: Migration
+    ) -> None:
+        """
+        Record a migration as applied.
+        """
+        connection.execute(sqlmodel.insert(SchemaVersion).values(
+            version=migration.version,
+            description=migration.description,
+            applied=datetime.datetime.now(datetime.timezone.utc)
+        ))
+
+    def check_plans(self) -> List[Dict[str, Any]]:
+        """
+        Explain the queries that filter on the foreign keys and return the
+        indexes their plans use. Sequential scans are disabled for the check,
+        since small tables are scanned regardless of their indexes.
+        """
+        queries = {
+            PlanCheck.tasks_of_project: (sqlmodel.select(Task).where(
+                Task.project_id == 1), "ix_ttask_project_id"),
+            PlanCheck.labeltypes_of_project: (sqlmodel.select(
+                LabelType).where(LabelType.project_id == 1),
+                "ix_tlabeltype_project_id"),
+            PlanCheck.ocr_of_task: (sqlmodel.select(Ocr).where(
+                Ocr.task_id == 1), "ix_tocr_task_id"),
+            PlanCheck.pages_of_ocr: (sqlmodel.select(Page).where(
+                Page.ocr_id == 1, Page.page == 1), "ix_tpage_ocr_id"),
+            PlanCheck.blocks_of_page: (sqlmodel.select(Block).where(
+                Block.page_id == 1), "ix_tblock_page_id"),
+            PlanCheck.labels_of_task: (sqlmodel.select(Label).where(
+                Label.task_id == 1), "ix_tlabel_task_id"),
+            PlanCheck.links_of_label: (sqlmodel.select(LabelLink).where(
+                LabelLink.label_id == 1), "ix_tlabellink_label_id"),
+            PlanCheck.links_of_block: (sqlmodel.select(LabelLink).where(
+                LabelLink.block_id == 1), "ix_tlabellink_block_id"),
+            PlanCheck.links_of_page: (sqlmodel.select(LabelLink).where(
+                LabelLink.page_id == 1), "ix_tlabellink_page_id"),
+        }
+
+        results = []
+
+        with self.engine.connect() as connection:
+            connection.execute(
+                sqlalchemy.text("SET LOCAL enable_seqscan = off"))
+
+            for check, (query, index) in queries.items():
+                statement = query.compile(
+                    dialect=connection.dialect,
+                    compile_kwargs={"literal_binds": True})
+
+                plan = connection.execute(sqlalchemy.text(
+                    f"EXPLAIN (FORMAT JSON) {statement}")).scalar()
+
+                if isinstance(plan, str):
+                    plan = json.loads(plan)
+
+                used = self._plan_indexes(plan[0]["Plan"])
+
+                results.append({
+                    "check": check.value,
+                    "index": index,
+                    "used": used,
+                    "ok": index in used,
+                    "cost": plan[0]["Plan"]["Total Cost"]
+                })
+
+            connection.rollback()
+
+        return results
+
+    def _plan_indexes(self, plan: Dict[str, Any]) -> List[str]:
+        """
+        Return the names of the indexes a plan node and its children use.
+        """
+        indexes = [plan["Index Name"]] if "Index Name" in plan else []
+
+        for child in plan.get("Plans", []):
+            indexes.extend(self._plan_indexes(child))
+
+        return indexes
+
+# ---------------------------------------------------------------------------- #
@@ -75,6 +75,15 @@ class ProjectStatus(str, enum.Enum):
     ready = "ready"
 
 
+class Preprocessing(pydantic.BaseModel):
+    grayscale: bool = False
+    binarize: bool = False
+    threshold: Optional[int] = None
+    target_dpi: Optional[int] = None
+    deskew: bool = False
+    crop_margins: bool = False
+
+
 class Project(sqlmodel.SQLModel, table=True):
     __tablename__ = "tproject"
     id: int = sqlmodel.Field(primary_key=True)
@@ -85,6 +94,10 @@ class Project(sqlmodel.SQLModel, table=True):
     uri: str = sqlmodel.Field()
     status: ProjectStatus = sqlmodel.Field()
     last_scan: Optional[datetime.datetime] = sqlmodel.Field()
+    preprocessing: Optional[dict] = sqlmodel.Field(
+        sa_column=sqlmodel.Column(sqlmodel.JSON, nullable=True))
+    scan_checked: Optional[int] = sqlmodel.Field(nullable=True)
+    scan_total: Optional[int] = sqlmodel.Field(nullable=True)
 
     creator: User = sqlmodel.Relationship()
     tasks: List["Task"] = sqlmodel.Relationship(back_populates="project")
@@ -99,7 +112,7 @@ class LabelCategory(str, enum.Enum):
 class LabelType(sqlmodel.SQLModel, table=True):
     __tablename__ = "tlabeltype"
     id: int = sqlmodel.Field(primary_key=True)
-    project_id: int = sqlmodel.Field(foreign_key="tproject.id")
+    project_id: int = sqlmodel.Field(foreign_key="tproject.id", index=True)
     name: str = sqlmodel.Field(unique=True)
     category: LabelCategory = sqlmodel.Field()
     color: str = sqlmodel.Field()
@@ -107,6 +120,16 @@ class LabelType(sqlmodel.SQLModel, table=True):
     project: Project = sqlmodel.Relationship()
 
 
+class ImageFormat(str, enum.Enum):
+    jpeg = "JPEG"
+    webp = "WEBP"
+    avif = "AVIF"
+
+    @property
+    def media_type(self) -> str:
+        return f"image/{self.value.lower()}"
+
+
 class FileObject(sqlmodel.SQLModel, table=False):
     name: str = sqlmodel.Field()
     uri: str = sqlmodel.Field()
@@ -124,13 +147,16 @@ class TaskStatus(str, enum.Enum):
 class Task(sqlmodel.SQLModel, table=True):
     __tablename__ = "ttask"
     id: int = sqlmodel.Field(primary_key=True)
-    project_id: int = sqlmodel.Field(foreign_key="tproject.id")
+    project_id: int = sqlmodel.Field(foreign_key="tproject.id", index=True)
     name: str = sqlmodel.Field()
     created: datetime.datetime = sqlmodel.Field()
     status: TaskStatus = sqlmodel.Field()
     abandoned: bool = sqlmodel.Field()
     uri: str = sqlmodel.Field()
+    etag: Optional[str] = sqlmodel.Field(nullable=True)
+    modified: Optional[datetime.datetime] = sqlmodel.Field(nullable=True)
     last_ocr: Optional[datetime.datetime] = sqlmodel.Field()
+    ocr_deadline: Optional[datetime.datetime] = sqlmodel.Field(nullable=True)
 
     project: Project = sqlmodel.Relationship()
     ocr: Optional["Ocr"] = sqlmodel.Relationship(back_populates="task")
@@ -139,36 +165,75 @@ class Task(sqlmodel.SQLModel, table=True):
 
 class OcrProvider(str, enum.Enum):
     tesseract = "tesseract"
+    tesseract_api = "tesseract_api"
+
+
+class OcrStatus(str, enum.Enum):
+    complete = "complete"
+    partial = "partial"
 
 
 class Ocr(sqlmodel.SQLModel, table=True):
     __tablename__ = "tocr"
     id: int = sqlmodel.Field(primary_key=True)
-    task_id: int = sqlmodel.Field(foreign_key="ttask.id")
+    task_id: int = sqlmodel.Field(foreign_key="ttask.id", index=True)
     etag: str = sqlmodel.Field()
     provider: OcrProvider = sqlmodel.Field()
     created: datetime.datetime = sqlmodel.Field()
+    status: OcrStatus = sqlmodel.Field(default=OcrStatus.complete)
+    engine_config: Optional[str] = sqlmodel.Field(nullable=True)
 
     task: Task = sqlmodel.Relationship()
-    pages: List["Page"] = sqlmodel.Relationship(back_populates="ocr")
+    pages: List["Page"] = sqlmodel.Relationship(
+        back_populates="ocr",
+        sa_relationship_kwargs={"order_by": "Page.page"})
+
+
+class PageStatus(str, enum.Enum):
+    complete = "complete"
+    partial = "partial"
+    failed = "failed"
+
+
+class BlockStorage(str, enum.Enum):
+    rows = "rows"
+    packed = "packed"
 
 
 class Page(sqlmodel.SQLModel, table=True):
     __tablename__ = "tpage"
     id: int = sqlmodel.Field(primary_key=True)
-    ocr_id: int = sqlmodel.Field(foreign_key="tocr.id")
+    ocr_id: int = sqlmodel.Field(foreign_key="tocr.id", index=True)
     page: int = sqlmodel.Field()
     width: float = sqlmodel.Field()
     height: float = sqlmodel.Field()
+    status: PageStatus = sqlmodel.Field(default=PageStatus.complete)
+    checksum: Optional[str] = sqlmodel.Field(nullable=True)
+    storage: BlockStorage = sqlmodel.Field(default=BlockStorage.rows)
 
     ocr: Ocr = sqlmodel.Relationship()
     blocks: List["Block"] = sqlmodel.Relationship(back_populates="page")
 
 
+class PackedBlocks(sqlmodel.SQLModel, table=True):
+    __tablename__ = "tpackedblocks"
+    page_id: int = sqlmodel.Field(primary_key=True, foreign_key="tpage.id")
+    data: bytes = sqlmodel.Field(
+        sa_column=sqlmodel.Column(sqlmodel.LargeBinary, nullable=False))
+
+    page: Page = sqlmodel.Relationship()
+
+
 class BlockType(str, enum.Enum):
     word = "word"
 
 
+class BlockInsertMode(str, enum.Enum):
+    orm = "orm"
+    bulk = "bulk"
+    copy = "copy"
+
+
 class BlockObject(sqlmodel.SQLModel, table=False):
     type: BlockType = sqlmodel.Field()
     content: str = sqlmodel.Field()
@@ -179,10 +244,16 @@ class BlockObject(sqlmodel.SQLModel, table=False):
     height: float = sqlmodel.Field()
 
 
+class PageBlock(BlockObject, table=False):
+    # blocks of packed pages are identified by "<page id>:<index>"
+    id: int | str = sqlmodel.Field()
+    page_id: int = sqlmodel.Field()
+
+
 class Block(BlockObject, table=True):
     __tablename__ = "tblock"
     id: int = sqlmodel.Field(primary_key=True)
-    page_id: int = sqlmodel.Field(foreign_key="tpage.id")
+    page_id: int = sqlmodel.Field(foreign_key="tpage.id", index=True)
 
     page: Page = sqlmodel.Relationship()
     link: Optional["LabelLink"] = sqlmodel.Relationship(
@@ -192,7 +263,7 @@ class Block(BlockObject, table=True):
 class Label(sqlmodel.SQLModel, table=True):
     __tablename__ = "tlabel"
     id: int = sqlmodel.Field(primary_key=True)
-    task_id: int = sqlmodel.Field(foreign_key="ttask.id")
+    task_id: int = sqlmodel.Field(foreign_key="ttask.id", index=True)
     labeltype_id: int = sqlmodel.Field(
         foreign_key="tlabeltype.id")
     user_content: str = sqlmodel.Field()
@@ -206,10 +277,52 @@ class Label(sqlmodel.SQLModel, table=True):
 class LabelLink(sqlmodel.SQLModel, table=True):
     __tablename__ = "tlabellink"
     id: int = sqlmodel.Field(primary_key=True)
-    label_id: int = sqlmodel.Field(foreign_key="tlabel.id")
-    block_id: int = sqlmodel.Field(foreign_key="tblock.id")
+    label_id: int = sqlmodel.Field(foreign_key="tlabel.id", index=True)
+    # links either point to a block row or to a block of a packed page
+    block_id: Optional[int] = sqlmodel.Field(
+        foreign_key="tblock.id", nullable=True, index=True)
+    page_id: Optional[int] = sqlmodel.Field(
+        foreign_key="tpage.id", nullable=True, index=True)
+    block_index: Optional[int] = sqlmodel.Field(nullable=True)
 
     label: Label = sqlmodel.Relationship()
-    block: Block = sqlmodel.Relationship()
+    block: Optional[Block] = sqlmodel.Relationship()
+
+    @property
+    def block_key(self) -> int | str:
+        """
+        The id of the linked block, as used by PageBlock.
+        """
+        if self.block_id is not None:
+            return self.block_id
+
+        return f"{self.page_id}:{self.block_index}"
+
+    @classmethod
+    def from_block_key(cls, label: Label, key: str) -> "LabelLink":
+        """
+        Create a link to the block with the given id, as used by PageBlock:
+        blocks of packed pages are identified by "<page id>:<index>", other
+        blocks by their row id. Raises a ValueError for malformed ids.
+        """
+        if ":" in key:
+            page_id, block_index = key.split(":")
+
+            return cls(
+                label=label,
+                page_id=int(page_id),
+                block_index=int(block_index)
+            )
+
+        return cls(label=label, block_id=int(key))
+
+# ---------------------------------------------------------------------------- #
+
+
+class SchemaVersion(sqlmodel.SQLModel, table=True):
+    __tablename__ = "tschemaversion"
+    version: int = sqlmodel.Field(primary_key=True)
+    description: str = sqlmodel.Field()
+    applied: datetime.datetime = sqlmodel.Field()
 
 # ---------------------------------------------------------------------------- #
@@ -1,5 +1,9 @@
 # ---------------------------------------------------------------------------- #
 
+from .blocks import BlockArray
+from .index import BlockIndex
 from .factory import OcrProviderFactory
+from .executor import OcrExecutor, ocr_executor
+from .preprocessing import Preprocessor
 
 # ---------------------------------------------------------------------------- #
@@ -1,12 +1,30 @@
 # ---------------------------------------------------------------------------- #
 
 import logging
-from typing import List
 from PIL import Image
+from typing import Any, Dict, Optional
 
 # ---------------------------------------------------------------------------- #
 
-from ..models import BlockObject
+from .blocks import BlockArray
+
+# ---------------------------------------------------------------------------- #
+
+
+class OcrTimeoutError(Exception):
+    """
+    Raised if the OCR of an image exceeds its time budget. Carries the words
+    recognized until then, if the provider can report them.
+    """
+
+    def __init__(
+        self,
+        message: str,
+        blocks: Optional[BlockArray] = None
+    ) -> None:
+        super().__init__(message, blocks)
+
+        self.blocks = blocks
 
 # ---------------------------------------------------------------------------- #
 
@@ -25,10 +43,20 @@ class BaseOcrProvider():
 
     def run_ocr(
         self,
-        image: Image.Image
-    ) -> List[BlockObject]:
+        image: Image.Image,
+        timeout: Optional[float] = None
+    ) -> BlockArray:
+        """
+        Process an image and return the OCR results. If a timeout (in
+        seconds) is given, the OCR is stopped once it expires and an
+        OcrTimeoutError is raised.
+        """
+        raise NotImplementedError
+
+    def engine_config(self) -> Dict[str, Any]:
         """
-        Process an image and return the OCR results.
+        Return the settings that influence the OCR results (e.g. language and
+        engine version). Results are only reused if these settings match.
         """
         raise NotImplementedError
 
@@ -0,0 +1,301 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import math
+import numpy
+import struct
+from typing import Any, Dict, Generator, List, Sequence, Tuple
+
+# ---------------------------------------------------------------------------- #
+
+from ..models import BlockType
+
+# ---------------------------------------------------------------------------- #
+
+
+class BlockArray():
+    """
+    A compact, column-oriented container for the blocks (words) of a page.
+    Coordinates are percentages of the page's dimensions, unknown confidences
+    are stored as NaN.
+    """
+    content: List[str]
+    confidence: numpy.ndarray
+    left: numpy.ndarray
+    top: numpy.ndarray
+    width: numpy.ndarray
+    height: numpy.ndarray
+
+    _magic: bytes = b"MRB1"
+
+    def __init__(
+        self,
+        content: List[str],
+        confidence: numpy.ndarray,
+        left: numpy.ndarray,
+        top: numpy.ndarray,
+        width: numpy.ndarray,
+        height: numpy.ndarray
+    ) -> None:
+        """
+        Initialize the container from its columns.
+        """
+        self.content = content
+        self.confidence = confidence
+        self.left = left
+        self.top = top
+        self.width = width
+        self.height = height
+
+    @classmethod
+    def from_pixels(
+        cls,
+        content: Sequence[str],
+        confidence: Sequence[float],
+        left: Sequence[int],
+        top: Sequence[int],
+        width: Sequence[int],
+        height: Sequence[int],
+        dimensions: Tuple[int, int]
+    ) -> "BlockArray":
+        """
+        Create the container from pixel boxes and confidences in percent (as
+        reported by Tesseract). Empty words are dropped and negative
+        confidences are treated as unknown.
+        """
+        text = numpy.asarray(content, dtype=str)
+        mask = numpy.char.str_len(text) > 0
+
+        scale_x = 100.0 / dimensions[0]
+        scale_y = 100.0 / dimensions[1]
+
+        def column(values: Sequence[Any], scale: float) -> numpy.ndarray:
+            array = numpy.asarray(values, dtype=numpy.float64)[mask] * scale
+            return numpy.round(array, 5)
+
+        confidences = column(confidence, 0.01)
+        confidences[confidences < 0] = numpy.nan
+
+        return cls(
+            content=text[mask].tolist(),
+            confidence=confidences,
+            left=column(left, scale_x),
+            top=column(top, scale_y),
+            width=column(width, scale_x),
+            height=column(height, scale_y)
+        )
+
+    @classmethod
+    def empty(cls) -> "BlockArray":
+        """
+        Create a container without blocks, e.g. for a page whose OCR failed.
+        """
+        return cls(
+            content=[],
+            confidence=numpy.empty(0, dtype=numpy.float64),
+            left=numpy.empty(0, dtype=numpy.float64),
+            top=numpy.empty(0, dtype=numpy.float64),
+            width=numpy.empty(0, dtype=numpy.float64),
+            height=numpy.empty(0, dtype=numpy.float64)
+        )
+
+    @classmethod
+    def from_bytes(
+        cls,
+        data: bytes
+    ) -> Tuple[int, int, "BlockArray"]:
+        """
+        Deserialize the container and its page's width and height.
+        """
+        with numpy.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            width, height = arrays["dimensions"].tolist()
+
+            blocks = cls(
+                content=arrays["content"].tolist(),
+                confidence=arrays["confidence"],
+                left=arrays["left"],
+                top=arrays["top"],
+                width=arrays["width"],
+                height=arrays["height"]
+            )
+
+        return width, height, blocks
+
+    def to_bytes(
+        self,
+        width: int,
+        height: int
+    ) -> bytes:
+        """
+        Serialize the container together with its page's width and height.
+        """
+        data = io.BytesIO()
+
+        numpy.savez(
+            data,
+            dimensions=numpy.asarray([width, height], dtype=numpy.int64),
+            content=numpy.asarray(self.content, dtype=str),
+            confidence=self.confidence,
+            left=self.left,
+            top=self.top,
+            width=self.width,
+            height=self.height
+        )
+
+        return data.getvalue()
+
+    def pack(self) -> bytes:
+        """
+        Serialize the container into a compact binary form for storage in the
+        database: a header with the number of blocks, the confidences and
+        coordinates as 32-bit floats, the offsets of the words into a text
+        blob and the utf-8 encoded text blob.
+        """
+        text = [word.encode("utf-8") for word in self.content]
+
+        offsets = numpy.zeros(len(text) + 1, dtype="<u4")
+        numpy.cumsum([len(word) for word in text], out=offsets[1:])
+
+        columns = (self.confidence, self.left, self.top, self.width,
+                   self.height)
+
+        return b"".join([
+            struct.pack("<4sI", self._magic, len(text)),
+            *(numpy.asarray(column, dtype="<f4").tobytes()
+              for column in columns),
+            offsets.tobytes(),
+            *text
+        ])
+
+    @classmethod
+    def unpack(
+        cls,
+        data: bytes
+    ) -> "BlockArray":
+        """
+        Deserialize a container created with pack.
+        """
+        magic, count = struct.unpack_from("<4sI", data)
+
+        if magic != cls._magic:
+            raise Exception("Invalid packed blocks.")
+
+        position = struct.calcsize("<4sI")
+
+        columns = []
+        for _ in range(5):
+            column = numpy.frombuffer(
+                data, dtype="<f4", count=count, offset=position)
+            columns.append(numpy.round(column.astype(numpy.float64), 5))
+            position += 4 * count
+
+        offsets = numpy.frombuffer(
+            data, dtype="<u4", count=count + 1, offset=position).tolist()
+        position += 4 * (count + 1)
+
+        text = data[position:]
+
+        return cls(
+            content=[
+                text[start:end].decode("utf-8")
+                for start, end in zip(offsets[:-1], offsets[1:])
+            ],
+            confidence=columns[0],
+            left=columns[1],
+            top=columns[2],
+            width=columns[3],
+            height=columns[4]
+        )
+
+    def reframe(
+        self,
+        region: Tuple[float, float, float, float]
+    ) -> "BlockArray":
+        """
+        Map coordinates relative to a region of the page (left, top, right,
+        bottom in percent, e.g. a cropped image) onto the whole page.
+        """
+        left, top, right, bottom = region
+
+        if region == (0.0, 0.0, 100.0, 100.0):
+            return self
+
+        scale_x = (right - left) / 100.0
+        scale_y = (bottom - top) / 100.0
+
+        return BlockArray(
+            content=self.content,
+            confidence=self.confidence,
+            left=numpy.round(left + self.left * scale_x, 5),
+            top=numpy.round(top + self.top * scale_y, 5),
+            width=numpy.round(self.width * scale_x, 5),
+            height=numpy.round(self.height * scale_y, 5)
+        )
+
+    def unrotate(
+        self,
+        angle: float,
+        size: Tuple[int, int]
+    ) -> "BlockArray":
+        """
+        Map coordinates on an image that was rotated about its centre (by an
+        angle in degrees, counter-clockwise, e.g. when deskewing) back onto
+        the unrotated image of the given size. The boxes are moved along with
+        their centres and keep their size.
+        """
+        if angle == 0.0 or len(self) == 0:
+            return self
+
+        width, height = size
+
+        cos = math.cos(math.radians(angle))
+        sin = math.sin(math.radians(angle))
+
+        # centres in pixels, relative to the image's centre
+        x = (self.left + self.width / 2.0 - 50.0) * width / 100.0
+        y = (self.top + self.height / 2.0 - 50.0) * height / 100.0
+
+        centre_x = (x * cos - y * sin) / width * 100.0 + 50.0
+        centre_y = (x * sin + y * cos) / height * 100.0 + 50.0
+
+        return BlockArray(
+            content=self.content,
+            confidence=self.confidence,
+            left=numpy.round(centre_x - self.width / 2.0, 5),
+            top=numpy.round(centre_y - self.height / 2.0, 5),
+            width=self.width,
+            height=self.height
+        )
+
+    def __len__(self) -> int:
+        return len(self.content)
+
+    def rows(self) -> Generator[Dict[str, Any], None, None]:
+        """
+        Yield the blocks as rows (column name to value), e.g. for inserting
+        them into the database.
+        """
+        confidence = self.confidence.astype(object)
+        confidence[numpy.isnan(self.confidence)] = None
+
+        columns = zip(
+            self.content,
+            confidence.tolist(),
+            self.left.tolist(),
+            self.top.tolist(),
+            self.width.tolist(),
+            self.height.tolist()
+        )
+
+        for content, confidence, left, top, width, height in columns:
+            yield {
+                "type": BlockType.word,
+                "content": content,
+                "confidence": confidence,
+                "left": left,
+                "top": top,
+                "width": width,
+                "height": height
+            }
+
+# ---------------------------------------------------------------------------- #
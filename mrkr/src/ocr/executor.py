@@ -0,0 +1,349 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import time
+import logging
+import threading
+import collections
+import multiprocessing
+import concurrent.futures
+from PIL import Image
+from typing import Any, Deque, Dict, Generator, Iterable, Optional, Tuple
+
+# ---------------------------------------------------------------------------- #
+
+from .base import OcrTimeoutError
+from .blocks import BlockArray
+from .factory import OcrProviderFactory
+from .preprocessing import Preprocessor
+from ..config import config
+from ..models import PageStatus, Preprocessing
+
+# ---------------------------------------------------------------------------- #
+
+
+def _run_ocr(
+    provider: str,
+    mode: str,
+    size: Tuple[int, int],
+    data: bytes,
+    dpi: int,
+    preprocessing: Optional[Dict[str, Any]],
+    timeout: Optional[float]
+) -> Tuple[PageStatus, BlockArray]:
+    """
+    Run OCR on a single page. This function is executed in a worker process.
+    Coordinates always refer to the page as it was rendered, regardless of
+    the preprocessing. Pages that exceed their time budget are reported as
+    partial (with the words found until then) or failed.
+    """
+    image = Image.frombytes(mode=mode, size=size, data=data)
+
+    region = (0.0, 0.0, 100.0, 100.0)
+    angle = 0.0
+
+    def to_page(blocks: BlockArray) -> BlockArray:
+        return blocks.reframe(region=region).unrotate(angle=angle, size=size)
+
+    # exceptions are re-raised as plain exceptions, since not all exception
+    # types survive the way back to the parent process
+    try:
+        if preprocessing:
+            image, region, angle = Preprocessor(
+                settings=Preprocessing(**preprocessing)
+            ).process(image=image, dpi=dpi)
+
+        blocks = OcrProviderFactory.get_provider(provider=provider).run_ocr(
+            image=image, timeout=timeout)
+
+        return PageStatus.complete, to_page(blocks)
+    except OcrTimeoutError as exception:
+        if exception.blocks is None or len(exception.blocks) == 0:
+            return PageStatus.failed, BlockArray.empty()
+
+        return PageStatus.partial, to_page(exception.blocks)
+    except Exception as exception:
+        raise Exception(f"OCR failed: {exception}") from None
+
+# ---------------------------------------------------------------------------- #
+
+
+class OcrJob():
+    """
+    A page submitted to the OCR executor. The job keeps its arguments, so
+    that it can be resubmitted if its pool is discarded.
+    """
+    width: int
+    height: int
+    args: Tuple[Any, ...] | None
+    pool: concurrent.futures.ProcessPoolExecutor | None
+    future: concurrent.futures.Future | None
+    started: float | None
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        args: Tuple[Any, ...] | None = None
+    ) -> None:
+        """
+        Initialize the job. Jobs without arguments are not submitted, since
+        their document ran out of time.
+        """
+        self.width = width
+        self.height = height
+        self.args = args
+        self.pool = None
+        self.future = None
+        self.started = None
+
+    @property
+    def timeout(self) -> float | None:
+        """
+        The page's time budget (in seconds).
+        """
+        return self.args[-1] if self.args else None
+
+# ---------------------------------------------------------------------------- #
+
+
+class OcrExecutor():
+    """
+    Runs OCR on a pool of worker processes. The pool is shared, so the pages
+    of one document and the pages of several documents are spread across all
+    cores.
+    """
+    logger: logging.Logger
+    workers: int
+
+    _lock: threading.Lock
+    _pool: concurrent.futures.ProcessPoolExecutor | None
+
+    def __init__(
+        self,
+        workers: int
+    ) -> None:
+        """
+        Initialize the executor. The process pool is started lazily.
+        """
+        self.logger = logging.getLogger("mrkr.ocr")
+
+        self.workers = workers if workers > 0 else (os.cpu_count() or 1)
+
+        self._lock = threading.Lock()
+        self._pool = None
+
+    def map(
+        self,
+        provider: str,
+        images: Iterable[Image.Image],
+        preprocessing: Optional[Preprocessing] = None,
+        deadline: Optional[float] = None
+    ) -> Generator[Tuple[int, int, PageStatus, BlockArray], None, None]:
+        """
+        Run OCR on a sequence of pages and yield (width, height, status,
+        blocks) for each page in page order. Only a few pages per worker are
+        in flight at any time, so memory stays bounded for long documents.
+        Pages are preprocessed in the worker processes, too.
+
+        Each page gets the configured time budget, but never more than is
+        left until the deadline (a time.monotonic() value) of its document.
+        Pages that could not be started before the deadline are failed.
+        """
+        limit = self.workers * config.ocr.pages_in_flight
+
+        settings = preprocessing.model_dump() if preprocessing else None
+
+        pending: Deque[OcrJob] = collections.deque()
+
+        try:
+            for image in images:
+                timeout = self._get_timeout(deadline=deadline)
+
+                if timeout is not None and timeout <= 0:
+                    job = OcrJob(width=image.width, height=image.height)
+                else:
+                    # the image is serialized here because the caller may
+                    # close it before the pool gets to pickle it
+                    job = OcrJob(
+                        width=image.width,
+                        height=image.height,
+                        args=(provider, image.mode, image.size,
+                              image.tobytes(), self._get_dpi(image=image),
+                              settings, timeout)
+                    )
+                    self._submit(job=job)
+
+                pending.append(job)
+
+                while len(pending) >= limit:
+                    yield self._collect(job=pending.popleft(),
+                                        deadline=deadline)
+
+            while pending:
+                yield self._collect(job=pending.popleft(), deadline=deadline)
+        finally:
+            for job in pending:
+                if job.future is not None:
+                    job.future.cancel()
+
+    def shutdown(self) -> None:
+        """
+        Stop the process pool after its pending pages are done. A new pool
+        is started on the next request.
+        """
+        with self._lock:
+            pool, self._pool = self._pool, None
+
+        if pool is not None:
+            pool.shutdown(wait=True)
+
+            self.logger.debug("OCR process pool stopped.")
+
+    def _submit(self, job: OcrJob) -> None:
+        """
+        Submit a job to the current pool. If the pool is broken (e.g. because
+        a worker died while idle), it is discarded and the job is submitted
+        once more to a new pool.
+        """
+        for attempt in range(2):
+            job.pool = self._get_pool()
+            try:
+                job.future = job.pool.submit(_run_ocr, *job.args)
+                break
+            except concurrent.futures.BrokenExecutor:
+                self._kill_pool(pool=job.pool)
+                if attempt > 0:
+                    raise
+
+        job.started = None
+
+    def _collect(
+        self,
+        job: OcrJob,
+        deadline: Optional[float]
+    ) -> Tuple[int, int, PageStatus, BlockArray]:
+        """
+        Wait for a job's result. Providers stop at the page's time budget on
+        their own; if a worker does not (e.g. because it hangs), its pool is
+        killed once twice the budget has passed.
+        """
+        failed = (job.width, job.height, PageStatus.failed, BlockArray.empty())
+
+        if job.future is None:
+            return failed
+
+        resubmitted = False
+
+        while True:
+            try:
+                status, blocks = job.future.result(timeout=1.0)
+                return job.width, job.height, status, blocks
+
+            except concurrent.futures.TimeoutError:
+                now = time.monotonic()
+
+                if deadline is not None and now > deadline and \
+                        job.future.cancel():
+                    return failed
+
+                if job.started is None and job.future.running():
+                    job.started = now
+
+                if job.timeout is None or job.started is None or \
+                        now - job.started < 2 * job.timeout:
+                    continue
+
+                self.logger.warning(
+                    f"OCR worker exceeded its time budget of "
+                    f"{job.timeout:.0f}s and is killed.")
+
+                self._kill_pool(pool=job.pool)
+
+                return failed
+
+            except concurrent.futures.BrokenExecutor:
+                # the pool was discarded (e.g. because a worker was killed
+                # for another page); pages are retried once on a new pool
+                self._kill_pool(pool=job.pool)
+
+                if resubmitted:
+                    raise
+
+                self._submit(job=job)
+                resubmitted = True
+
+    @staticmethod
+    def _get_timeout(deadline: Optional[float]) -> float | None:
+        """
+        Return the time budget (in seconds) of the next page.
+        """
+        timeout = config.ocr.page_timeout or None
+
+        if deadline is None:
+            return timeout
+
+        remaining = deadline - time.monotonic()
+
+        return remaining if timeout is None else min(timeout, remaining)
+
+    @staticmethod
+    def _get_dpi(image: Image.Image) -> int:
+        """
+        Return the resolution an image was scanned or rendered at.
+        """
+        dpi = image.info.get("dpi")
+
+        if not dpi or not dpi[0]:
+            return config.ocr.default_dpi
+
+        return round(dpi[0])
+
+    def _get_pool(self) -> concurrent.futures.ProcessPoolExecutor:
+        """
+        Return the process pool, starting it if necessary.
+        """
+        with self._lock:
+            if self._pool is None:
+                # workers are spawned (not forked) since the application runs
+                # several threads
+                self._pool = concurrent.futures.ProcessPoolExecutor(
+                    max_workers=self.workers,
+                    mp_context=multiprocessing.get_context("spawn")
+                )
+
+                self.logger.debug(
+                    f"OCR process pool with {self.workers} workers started.")
+
+            return self._pool
+
+    def _kill_pool(
+        self,
+        pool: concurrent.futures.ProcessPoolExecutor
+    ) -> None:
+        """
+        Discard a pool and terminate its workers (e.g. after a worker died or
+        hung), so that a new one is started on the next request. Pages still
+        running on the pool fail with a BrokenExecutor exception.
+        """
+        with self._lock:
+            if self._pool is not pool:
+                return
+            self._pool = None
+
+        # the executor offers no public way to stop a running task
+        processes = getattr(pool, "_processes", None) or {}
+
+        for process in list(processes.values()):
+            process.terminate()
+
+        pool.shutdown(wait=False, cancel_futures=True)
+
+        self.logger.warning("OCR process pool discarded.")
+
+# ---------------------------------------------------------------------------- #
+
+
+ocr_executor = OcrExecutor(workers=config.ocr.workers)
+
+# ---------------------------------------------------------------------------- #
@@ -22,6 +22,10 @@ class OcrProviderFactory():
         match provider:
             case "tesseract":
                 return TesseractOcrProvider()
+            case "tesseract_api":
+                # tesserocr is optional, as it requires the tesseract library
+                from .tesseract_api import TesseractApiOcrProvider
+                return TesseractApiOcrProvider()
             case _:
                 raise Exception(f"Unknown OCR provider: {provider}")
 
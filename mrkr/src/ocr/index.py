@@ -0,0 +1,302 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import numpy
+from typing import List, Optional, Sequence, Tuple
+
+# ---------------------------------------------------------------------------- #
+
+
+class BlockIndex():
+    """
+    A uniform grid over a page that maps each cell to the blocks overlapping
+    it. Region and nearest-block queries only look at the blocks of the
+    cells involved instead of all blocks of the page. Coordinates are
+    percentages of the page's dimensions, like the blocks' coordinates.
+    """
+    cells: int
+    dimensions: Tuple[int, int]
+    ids: numpy.ndarray
+    boxes: numpy.ndarray
+    offsets: numpy.ndarray
+    members: numpy.ndarray
+
+    def __init__(
+        self,
+        cells: int,
+        dimensions: Tuple[int, int],
+        ids: numpy.ndarray,
+        boxes: numpy.ndarray,
+        offsets: numpy.ndarray,
+        members: numpy.ndarray
+    ) -> None:
+        """
+        Initialize the index from its arrays. The blocks of cell i are
+        members[offsets[i]:offsets[i + 1]] (positions in ids and boxes).
+        """
+        self.cells = cells
+        self.dimensions = dimensions
+        self.ids = ids
+        self.boxes = boxes
+        self.offsets = offsets
+        self.members = members
+
+    @classmethod
+    def build(
+        cls,
+        ids: Sequence[int],
+        left: Sequence[float],
+        top: Sequence[float],
+        width: Sequence[float],
+        height: Sequence[float],
+        dimensions: Tuple[int, int],
+        cells: int
+    ) -> "BlockIndex":
+        """
+        Build the index for a page's blocks. Boxes are stored as left, top,
+        right and bottom.
+        """
+        left = numpy.asarray(left, dtype=numpy.float64)
+        top = numpy.asarray(top, dtype=numpy.float64)
+
+        boxes = numpy.column_stack((
+            left,
+            top,
+            left + numpy.asarray(width, dtype=numpy.float64),
+            top + numpy.asarray(height, dtype=numpy.float64)
+        )).reshape(-1, 4)
+
+        first_x, last_x = cls._cell_range(boxes[:, 0], boxes[:, 2], cells)
+        first_y, last_y = cls._cell_range(boxes[:, 1], boxes[:, 3], cells)
+
+        cell_ids, positions = [], []
+        for position in range(len(boxes)):
+            x = numpy.arange(first_x[position], last_x[position] + 1)
+            y = numpy.arange(first_y[position], last_y[position] + 1)
+
+            covered = (y[:, None] * cells + x[None, :]).ravel()
+
+            cell_ids.append(covered)
+            positions.append(numpy.full(len(covered), position))
+
+        if cell_ids:
+            cell_ids = numpy.concatenate(cell_ids)
+            positions = numpy.concatenate(positions)
+        else:
+            cell_ids = numpy.empty(0, dtype=numpy.int64)
+            positions = numpy.empty(0, dtype=numpy.int64)
+
+        # sorting by cell (stable, so blocks keep their reading order within
+        # each cell) yields one contiguous run of members per cell
+        order = numpy.argsort(cell_ids, kind="stable")
+
+        offsets = numpy.zeros(cells * cells + 1, dtype=numpy.int64)
+        numpy.cumsum(
+            numpy.bincount(cell_ids, minlength=cells * cells),
+            out=offsets[1:]
+        )
+
+        return cls(
+            cells=cells,
+            dimensions=dimensions,
+            ids=numpy.asarray(ids, dtype=numpy.int64),
+            boxes=boxes,
+            offsets=offsets,
+            members=positions[order].astype(numpy.int64)
+        )
+
+    @classmethod
+    def from_bytes(cls, data: bytes) -> "BlockIndex":
+        """
+        Deserialize the index.
+        """
+        with numpy.load(io.BytesIO(data), allow_pickle=False) as arrays:
+            cells, width, height = arrays["header"].tolist()
+
+            return cls(
+                cells=cells,
+                dimensions=(width, height),
+                ids=arrays["ids"],
+                boxes=arrays["boxes"],
+                offsets=arrays["offsets"],
+                members=arrays["members"]
+            )
+
+    def to_bytes(self) -> bytes:
+        """
+        Serialize the index.
+        """
+        data = io.BytesIO()
+
+        numpy.savez(
+            data,
+            header=numpy.asarray(
+                [self.cells, *self.dimensions], dtype=numpy.int64),
+            ids=self.ids,
+            boxes=self.boxes,
+            offsets=self.offsets,
+            members=self.members
+        )
+
+        return data.getvalue()
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def intersecting(
+        self,
+        left: float,
+        top: float,
+        right: float,
+        bottom: float
+    ) -> List[int]:
+        """
+        Return the ids of all blocks intersecting a rectangle, in the order
+        the blocks were indexed (i.e. reading order).
+        """
+        first_x, last_x = self._cell_range(left, right, self.cells)
+        first_y, last_y = self._cell_range(top, bottom, self.cells)
+
+        candidates = self._candidates(
+            int(first_x), int(last_x), int(first_y), int(last_y))
+
+        boxes = self.boxes[candidates]
+
+        mask = (boxes[:, 0] <= right) & (boxes[:, 2] >= left) & \
+            (boxes[:, 1] <= bottom) & (boxes[:, 3] >= top)
+
+        return self.ids[candidates[mask]].tolist()
+
+    def nearest(
+        self,
+        x: float,
+        y: float,
+        max_distance: Optional[float] = None
+    ) -> Optional[int]:
+        """
+        Return the id of the block closest to a point (zero for all blocks
+        containing it), or None if there is no block within max_distance
+        (in percent of the page's width). Distances are measured in pixels,
+        so that pages that are not square are handled correctly.
+        """
+        if len(self.ids) == 0:
+            return None
+
+        scale_x = self.dimensions[0] / 100.0
+        scale_y = self.dimensions[1] / 100.0
+
+        column = min(max(int(x / 100.0 * self.cells), 0), self.cells - 1)
+        row = min(max(int(y / 100.0 * self.cells), 0), self.cells - 1)
+
+        cell_width = min(scale_x, scale_y) * 100.0 / self.cells
+
+        best_id, best_distance = None, numpy.inf
+
+        # search rings of cells around the point's cell; blocks in ring r
+        # (and beyond) are more than r - 1 cells away, so once the best
+        # distance found so far is below that, no other block can be closer
+        for ring in range(self.cells):
+            if best_distance <= (ring - 1) * cell_width:
+                break
+
+            candidates = self._ring(column=column, row=row, ring=ring)
+
+            if len(candidates) == 0:
+                continue
+
+            boxes = self.boxes[candidates]
+
+            dx = numpy.maximum(numpy.maximum(boxes[:, 0] - x, x - boxes[:, 2]),
+                               0) * scale_x
+            dy = numpy.maximum(numpy.maximum(boxes[:, 1] - y, y - boxes[:, 3]),
+                               0) * scale_y
+
+            distances = numpy.hypot(dx, dy)
+            position = int(numpy.argmin(distances))
+
+            if distances[position] < best_distance:
+                best_distance = float(distances[position])
+                best_id = int(self.ids[candidates[position]])
+
+        if max_distance is not None and \
+                best_distance > max_distance * scale_x:
+            return None
+
+        return best_id
+
+    def _candidates(
+        self,
+        first_x: int,
+        last_x: int,
+        first_y: int,
+        last_y: int
+    ) -> numpy.ndarray:
+        """
+        Return the positions of the blocks in a range of cells (sorted and
+        without duplicates).
+        """
+        runs = [
+            self.members[self.offsets[cell]:self.offsets[cell + 1]]
+            for row in range(first_y, last_y + 1)
+            for cell in range(row * self.cells + first_x,
+                              row * self.cells + last_x + 1)
+        ]
+
+        if not runs:
+            return numpy.empty(0, dtype=numpy.int64)
+
+        return numpy.unique(numpy.concatenate(runs))
+
+    def _ring(
+        self,
+        column: int,
+        row: int,
+        ring: int
+    ) -> numpy.ndarray:
+        """
+        Return the positions of the blocks in the cells at exactly ring
+        cells distance (in either direction) from a cell.
+        """
+        first_x, last_x = column - ring, column + ring
+        first_y, last_y = row - ring, row + ring
+
+        ranges = [
+            (first_x, last_x, first_y, first_y),
+            (first_x, last_x, last_y, last_y),
+            (first_x, first_x, first_y + 1, last_y - 1),
+            (last_x, last_x, first_y + 1, last_y - 1)
+        ]
+
+        runs = []
+        for x0, x1, y0, y1 in ranges:
+            x0, x1 = max(x0, 0), min(x1, self.cells - 1)
+            y0, y1 = max(y0, 0), min(y1, self.cells - 1)
+
+            if x0 > x1 or y0 > y1:
+                continue
+
+            runs.append(self._candidates(x0, x1, y0, y1))
+
+        if not runs:
+            return numpy.empty(0, dtype=numpy.int64)
+
+        return numpy.unique(numpy.concatenate(runs))
+
+    @staticmethod
+    def _cell_range(
+        start: numpy.ndarray | float,
+        end: numpy.ndarray | float,
+        cells: int
+    ) -> Tuple[numpy.ndarray, numpy.ndarray]:
+        """
+        Return the first and last cell (per axis) covered by an interval.
+        """
+        first = numpy.clip(
+            numpy.floor(numpy.asarray(start) / 100.0 * cells), 0, cells - 1)
+        last = numpy.clip(
+            numpy.floor(numpy.asarray(end) / 100.0 * cells), 0, cells - 1)
+
+        return first.astype(numpy.int64), numpy.maximum(first, last).astype(
+            numpy.int64)
+
+# ---------------------------------------------------------------------------- #
@@ -0,0 +1,168 @@
+# ---------------------------------------------------------------------------- #
+
+import numpy
+import logging
+from PIL import Image, ImageOps
+from typing import Tuple
+
+# ---------------------------------------------------------------------------- #
+
+from ..models import Preprocessing
+
+# ---------------------------------------------------------------------------- #
+
+
+class Preprocessor():
+    """
+    Prepares a rendered page for OCR, e.g. by reducing it to a binary image
+    at a lower resolution. Less data makes the OCR faster, but may cost
+    accuracy; use the preprocessing benchmark to find a good tradeoff.
+    """
+    logger: logging.Logger
+    settings: Preprocessing
+
+    def __init__(
+        self,
+        settings: Preprocessing
+    ) -> None:
+        """
+        Initialize the preprocessor.
+        """
+        self.logger = logging.getLogger("mrkr.ocr")
+
+        self.settings = settings
+
+    def process(
+        self,
+        image: Image.Image,
+        dpi: int
+    ) -> Tuple[Image.Image, Tuple[float, float, float, float], float]:
+        """
+        Process an image rendered at the given resolution. Returns the
+        processed image, the region of the (deskewed) image (left, top,
+        right, bottom in percent) it covers and the angle by which the image
+        was rotated, so that OCR results can be mapped back onto the
+        original page.
+        """
+        region = (0.0, 0.0, 100.0, 100.0)
+        angle = 0.0
+
+        if self.settings.grayscale or self.settings.binarize or \
+                self.settings.deskew or self.settings.crop_margins:
+            image = image.convert("L")
+
+        if self.settings.target_dpi and self.settings.target_dpi < dpi:
+            factor = self.settings.target_dpi / dpi
+            image = image.resize(
+                (max(1, round(image.width * factor)),
+                 max(1, round(image.height * factor))),
+                Image.Resampling.LANCZOS
+            )
+
+        if self.settings.deskew:
+            image, angle = self._deskew(image=image)
+
+        if self.settings.crop_margins:
+            image, region = self._crop_margins(image=image)
+
+        if self.settings.binarize:
+            image = self._binarize(image=image)
+
+        return image, region, angle
+
+    def _threshold(self, pixels: numpy.ndarray) -> int:
+        """
+        Return the configured threshold or compute one using Otsu's method.
+        """
+        if self.settings.threshold is not None:
+            return self.settings.threshold
+
+        histogram = numpy.bincount(pixels.ravel(), minlength=256)
+        histogram = histogram.astype(numpy.float64)
+
+        levels = numpy.arange(256)
+        weight = numpy.cumsum(histogram)
+        mean = numpy.cumsum(histogram * levels)
+
+        total_weight = weight[-1]
+        total_mean = mean[-1]
+
+        with numpy.errstate(divide="ignore", invalid="ignore"):
+            variance = (total_mean * weight - mean * total_weight) ** 2 / \
+                (weight * (total_weight - weight))
+
+        return int(numpy.nanargmax(variance))
+
+    def _binarize(self, image: Image.Image) -> Image.Image:
+        """
+        Reduce a grayscale image to black and white.
+        """
+        pixels = numpy.asarray(image)
+        threshold = self._threshold(pixels=pixels)
+
+        return Image.fromarray(
+            numpy.where(pixels > threshold, 255, 0).astype(numpy.uint8))
+
+    def _deskew(self, image: Image.Image) -> Tuple[Image.Image, float]:
+        """
+        Straighten a slightly rotated scan and return the angle (in degrees,
+        counter-clockwise) it was rotated by. The angle is the one at which
+        the rows of a downsampled, inverted copy have the sharpest profile.
+        """
+        sample = ImageOps.invert(image)
+        sample.thumbnail((800, 800))
+
+        best_angle = 0.0
+        best_score = -1.0
+
+        for angle in numpy.arange(-5.0, 5.25, 0.25):
+            rotated = numpy.asarray(sample.rotate(float(angle)),
+                                    dtype=numpy.float64)
+            score = float(numpy.var(rotated.sum(axis=1)))
+
+            if score > best_score:
+                best_angle, best_score = float(angle), score
+
+        if best_angle == 0.0:
+            return image, 0.0
+
+        self.logger.debug(f"Page deskewed by {best_angle} degrees.")
+
+        return image.rotate(
+            best_angle, resample=Image.Resampling.BICUBIC, fillcolor=255
+        ), best_angle
+
+    def _crop_margins(
+        self,
+        image: Image.Image
+    ) -> Tuple[Image.Image, Tuple[float, float, float, float]]:
+        """
+        Remove empty margins around the page's content.
+        """
+        pixels = numpy.asarray(image)
+        threshold = self._threshold(pixels=pixels)
+
+        box = Image.fromarray(
+            numpy.where(pixels > threshold, 0, 255).astype(numpy.uint8)
+        ).getbbox()
+
+        if box is None:
+            return image, (0.0, 0.0, 100.0, 100.0)
+
+        padding = round(min(image.width, image.height) * 0.01)
+
+        left = max(0, box[0] - padding)
+        top = max(0, box[1] - padding)
+        right = min(image.width, box[2] + padding)
+        bottom = min(image.height, box[3] + padding)
+
+        region = (
+            left / image.width * 100.0,
+            top / image.height * 100.0,
+            right / image.width * 100.0,
+            bottom / image.height * 100.0
+        )
+
+        return image.crop((left, top, right, bottom)), region
+
+# ---------------------------------------------------------------------------- #
@@ -1,31 +1,14 @@
 # ---------------------------------------------------------------------------- #
 
-import pydantic
 import pytesseract
 from PIL import Image
-from typing import List, Tuple
+from typing import Any, Dict, Optional
 
 # ---------------------------------------------------------------------------- #
 
-from .base import BaseOcrProvider
-from ..models import BlockObject, BlockType
-
-# ---------------------------------------------------------------------------- #
-
-
-class TesseractResult(pydantic.BaseModel):
-    level: List[int]
-    page_num: List[int]
-    block_num: List[int]
-    par_num: List[int]
-    line_num: List[int]
-    word_num: List[int]
-    left: List[int]
-    top: List[int]
-    width: List[int]
-    height: List[int]
-    conf: List[int]
-    text: List[str]
+from .base import BaseOcrProvider, OcrTimeoutError
+from .blocks import BlockArray
+from ..config import config
 
 # ---------------------------------------------------------------------------- #
 
@@ -38,22 +21,35 @@ class TesseractOcrProvider(BaseOcrProvider):
 
     def run_ocr(
         self,
-        image: Image.Image
-    ) -> List[BlockObject]:
+        image: Image.Image,
+        timeout: Optional[float] = None
+    ) -> BlockArray:
         """
-        Use Google's Tesseract to apply OCR to an image.
+        Use Google's Tesseract to apply OCR to an image. On timeout, the
+        Tesseract process is killed.
         """
         self.logger.debug("Processing image with Tesseract.")
 
-        boxes = pytesseract.image_to_data(
-            image=image,
-            output_type=pytesseract.Output.DICT,
-            lang="eng",  # todo
-        )
-        tesseract = TesseractResult(**boxes)
-
-        blocks = self._convert_to_blocks(
-            tesseract=tesseract,
+        try:
+            boxes = pytesseract.image_to_data(
+                image=image,
+                output_type=pytesseract.Output.DICT,
+                lang=config.ocr.language,
+                timeout=timeout or 0
+            )
+        except RuntimeError as exception:
+            if "timeout" not in str(exception).lower():
+                raise
+            raise OcrTimeoutError(
+                f"Tesseract exceeded its time budget of {timeout}s.")
+
+        blocks = BlockArray.from_pixels(
+            content=boxes["text"],
+            confidence=boxes["conf"],
+            left=boxes["left"],
+            top=boxes["top"],
+            width=boxes["width"],
+            height=boxes["height"],
             dimensions=(image.width, image.height)
         )
 
@@ -61,36 +57,14 @@ class TesseractOcrProvider(BaseOcrProvider):
 
         return blocks
 
-    def _convert_to_blocks(
-        self,
-        tesseract: TesseractResult,
-        dimensions: Tuple[int, int]
-    ) -> List[BlockObject]:
-        blocks = []
-        for index, text in enumerate(tesseract.text):
-            if len(text) == 0:
-                continue
-
-            confidence: float | None = tesseract.conf[index]/100
-
-            if confidence and confidence < 0:
-                confidence = None
-
-            block = BlockObject(
-                id=index,
-                type=BlockType.word,
-                content=text,
-                confidence=confidence,
-                left=round(tesseract.left[index] / dimensions[0] * 100.0, 5),
-                top=round(tesseract.top[index] / dimensions[1] * 100.0, 5),
-                width=round(tesseract.width[index] / dimensions[0] * 100.0, 5),
-                height=round(
-                    tesseract.height[index] / dimensions[1] * 100.0, 5)
-            )
-
-            blocks.append(block)
-
-        return blocks
+    def engine_config(self) -> Dict[str, Any]:
+        """
+        Return the Tesseract language and version.
+        """
+        return {
+            "language": config.ocr.language,
+            "version": str(pytesseract.get_tesseract_version())
+        }
 
 
 # ---------------------------------------------------------------------------- #
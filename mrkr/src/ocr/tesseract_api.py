@@ -0,0 +1,148 @@
+# ---------------------------------------------------------------------------- #
+
+import time
+import threading
+import tesserocr
+from PIL import Image
+from typing import Any, Dict, Optional
+
+# ---------------------------------------------------------------------------- #
+
+from .base import BaseOcrProvider, OcrTimeoutError
+from .blocks import BlockArray
+from ..config import config
+
+# ---------------------------------------------------------------------------- #
+
+
+class TesseractApiOcrProvider(BaseOcrProvider):
+    """
+    This OCR provider uses Google's Tesseract through its C API (tesserocr).
+    Unlike the TesseractOcrProvider, it keeps a warm Tesseract instance per
+    thread and passes the pixel buffer directly, instead of starting a new
+    process and writing a temporary file for every page. Make sure tesserocr
+    is installed.
+    """
+    _local: threading.local = threading.local()
+
+    def run_ocr(
+        self,
+        image: Image.Image,
+        timeout: Optional[float] = None
+    ) -> BlockArray:
+        """
+        Use Google's Tesseract to apply OCR to an image. On timeout, the
+        recognition is cancelled and the words found until then are reported
+        with the OcrTimeoutError.
+        """
+        self.logger.debug("Processing image with the Tesseract API.")
+
+        if image.mode not in ("L", "RGB"):
+            image = image.convert("RGB")
+
+        bytes_per_pixel = 1 if image.mode == "L" else 3
+
+        api = self._get_api()
+
+        try:
+            api.SetImageBytes(
+                image.tobytes(),
+                image.width,
+                image.height,
+                bytes_per_pixel,
+                image.width * bytes_per_pixel
+            )
+
+            started = time.monotonic()
+
+            if not api.Recognize(timeout=int((timeout or 0) * 1000)):
+                if not timeout or time.monotonic() - started < timeout:
+                    raise Exception(
+                        "Tesseract could not recognize the image.")
+
+                raise OcrTimeoutError(
+                    f"Tesseract exceeded its time budget of {timeout}s.",
+                    blocks=self._convert_to_blocks(
+                        api=api,
+                        dimensions=(image.width, image.height)
+                    )
+                )
+
+            blocks = self._convert_to_blocks(
+                api=api,
+                dimensions=(image.width, image.height)
+            )
+        finally:
+            api.Clear()
+
+        self.logger.debug(f"Tesseract API successful.")
+
+        return blocks
+
+    def engine_config(self) -> Dict[str, Any]:
+        """
+        Return the Tesseract language and version.
+        """
+        return {
+            "language": config.ocr.language,
+            "version": tesserocr.tesseract_version()
+        }
+
+    def _get_api(self) -> tesserocr.PyTessBaseAPI:
+        """
+        Return the thread's Tesseract instance. The instance (and its language
+        model) is loaded once and then reused for all pages.
+        """
+        api = getattr(self._local, "api", None)
+        language = getattr(self._local, "language", None)
+
+        if api is not None and language == config.ocr.language:
+            return api
+
+        if api is not None:
+            api.End()
+
+        api = tesserocr.PyTessBaseAPI(lang=config.ocr.language)
+
+        self._local.api = api
+        self._local.language = config.ocr.language
+
+        self.logger.debug(
+            f"Tesseract API initialized for '{config.ocr.language}'.")
+
+        return api
+
+    def _convert_to_blocks(
+        self,
+        api: tesserocr.PyTessBaseAPI,
+        dimensions: tuple[int, int]
+    ) -> BlockArray:
+        level = tesserocr.RIL.WORD
+
+        content, confidence = [], []
+        left, top, width, height = [], [], [], []
+
+        for word in tesserocr.iterate_level(api.GetIterator(), level):
+            box = word.BoundingBox(level)
+
+            if box is None:
+                continue
+
+            content.append(word.GetUTF8Text(level) or "")
+            confidence.append(word.Confidence(level))
+            left.append(box[0])
+            top.append(box[1])
+            width.append(box[2] - box[0])
+            height.append(box[3] - box[1])
+
+        return BlockArray.from_pixels(
+            content=content,
+            confidence=confidence,
+            left=left,
+            top=top,
+            width=width,
+            height=height,
+            dimensions=dimensions
+        )
+
+# ---------------------------------------------------------------------------- #
@@ -1,17 +1,65 @@
 
 # ---------------------------------------------------------------------------- #
 
+import io
+import asyncio
 import logging
 import sqlmodel
 import re
-from typing import List, Sequence
+import json
+import time
+import hashlib
+import collections
+import numpy
+from PIL import Image
+from typing import Any, BinaryIO, Callable, Deque, Dict, Generator, List
+from typing import Sequence, Tuple
+from sqlalchemy.orm import selectinload
 
 # ---------------------------------------------------------------------------- #
 
 from .models import *
-from .database import DatabaseSession
-from .file import FileProviderFactory, FileObject
-from .ocr import OcrProviderFactory
+from .config import config
+from .database import AsyncDatabaseSession, DatabaseSession
+from .timer import StageTimer
+from .blockwriter import BlockWriter
+from .cache import page_cache, ocr_cache, index_cache
+from .file import BaseFileProvider, FileProviderFactory, FileObject
+from .file import PagePyramid
+from .ocr import BlockArray, BlockIndex, OcrProviderFactory, ocr_executor
+
+# ---------------------------------------------------------------------------- #
+
+
+class PageResult():
+    """
+    The outcome of a page's OCR: either new blocks or a page that is carried
+    over from a previous OCR run.
+    """
+    width: int
+    height: int
+    checksum: str
+    status: PageStatus
+    blocks: BlockArray | None
+    page: Page | None
+    pending: bool
+
+    def __init__(
+        self,
+        width: int,
+        height: int,
+        checksum: str
+    ) -> None:
+        """
+        Initialize the result of a rendered page.
+        """
+        self.width = width
+        self.height = height
+        self.checksum = checksum
+        self.status = PageStatus.complete
+        self.blocks = None
+        self.page = None
+        self.pending = False
 
 # ---------------------------------------------------------------------------- #
 
@@ -22,6 +70,7 @@ class ProjectManager():
     """
     logger: logging.Logger
     session: DatabaseSession
+    timer: StageTimer
 
     def __init__(self, session: DatabaseSession) -> None:
         """
@@ -30,6 +79,7 @@ class ProjectManager():
         self.logger = logging.getLogger('mrkr.project')
 
         self.session = session
+        self.timer = StageTimer()
 
     async def list_projects(
         self
@@ -37,28 +87,38 @@ class ProjectManager():
         """
         List all projects.
         """
-        query = sqlmodel.select(Project).order_by(Project.name)
-        return self.session.exec(query).all()
+        query = sqlmodel.select(Project).order_by(Project.name).options(
+            selectinload(Project.creator))
+        return await self._all(query)
 
     async def get_project(
         self,
         id: int
     ) -> Project | None:
         """
-        Get a project by its ID.
+        Get a project by its ID, with its tasks.
         """
-        query = sqlmodel.select(Project).where(Project.id == id)
-        return self.session.exec(query).first()
+        query = sqlmodel.select(Project).where(Project.id == id).options(
+            selectinload(Project.creator),
+            selectinload(Project.tasks)
+        )
+        return await self._first(query)
 
     async def get_task(
         self,
         id: int
     ) -> Task | None:
         """
-        Get a task by its ID.
+        Get a task by its ID, with everything its page shows: the project's
+        label types, the pages of the current OCR run and the labels.
         """
-        query = sqlmodel.select(Task).where(Task.id == id)
-        return self.session.exec(query).first()
+        query = sqlmodel.select(Task).where(Task.id == id).options(
+            selectinload(Task.project).selectinload(Project.labeltypes),
+            selectinload(Task.ocr).selectinload(Ocr.pages),
+            selectinload(Task.labels).selectinload(Label.labeltype),
+            selectinload(Task.labels).selectinload(Label.links)
+        )
+        return await self._first(query)
 
     async def project_is_scannable(
         self,
@@ -116,6 +176,8 @@ class ProjectManager():
                 return
 
             project.status = ProjectStatus.scan_running
+            project.scan_checked = None
+            project.scan_total = None
             self.session.add(project)
             self.session.commit()
 
@@ -123,7 +185,10 @@ class ProjectManager():
 
             connector = FileProviderFactory.get_provider(
                 provider=project.provider)
-            origin = connector.list_files(uri=project.uri)
+            origin = connector.list_files(
+                uri=project.uri,
+                progress=self._scan_progress(project=project)
+            )
 
             await self._update_existing_tasks(
                 project=project, origin=origin
@@ -145,6 +210,34 @@ class ProjectManager():
             self.session.add(project)
             self.session.commit()
 
+    def _scan_progress(
+        self,
+        project: Project
+    ) -> Callable[[int, int], None]:
+        """
+        Create a callback that records a project scan's progress in steps of
+        ten percent, so that it can be shown while the scan is running.
+        """
+        reported = -1
+
+        def progress(done: int, total: int) -> None:
+            nonlocal reported
+
+            percent = done * 100 // total
+            if percent // 10 == reported // 10 and done != total:
+                return
+            reported = percent
+
+            project.scan_checked = done
+            project.scan_total = total
+            self.session.add(project)
+            self.session.commit()
+
+            self.logger.debug(f"Scan of project {project.id}: {done} of "
+                              f"{total} files checked ({percent}%).")
+
+        return progress
+
     async def _update_existing_tasks(
         self,
         project: Project,
@@ -166,6 +259,10 @@ class ProjectManager():
             if task.name != file.name:
                 task.name = file.name
 
+            if task.etag != file.etag:
+                task.etag = file.etag
+                task.modified = datetime.datetime.now()
+
             self.logger.debug(
                 f"Task {task.id} for file '{file.name}' updated.")
 
@@ -192,21 +289,436 @@ class ProjectManager():
                 created=datetime.datetime.now(),
                 status=TaskStatus.ready,
                 abandoned=False,
-                uri=file.uri
+                uri=file.uri,
+                etag=file.etag,
+                modified=datetime.datetime.now()
             )
 
             self.logger.debug(f"Task for file '{file.name}' added.")
 
             self.session.add(task)
 
+    async def get_page_image(
+        self,
+        task: Task,
+        page: int = 0,
+        format: ImageFormat = ImageFormat.jpeg,
+        width: int | None = None
+    ) -> BinaryIO:
+        """
+        Return a task's page rendered as an image (as a file to be streamed
+        and closed by the caller), optionally downscaled to a width. Rendered
+        pages are kept in the page cache, keyed by the file's etag. The file
+        is read and rendered in a worker thread, so that the event loop is
+        not blocked.
+        """
+        return await asyncio.to_thread(
+            self._open_page_image,
+            provider=task.project.provider,
+            uri=task.uri,
+            etag=task.etag,
+            page=page,
+            format=format,
+            width=width
+        )
+
+    def _open_page_image(
+        self,
+        provider: SourceProvider,
+        uri: str,
+        etag: str | None,
+        page: int,
+        format: ImageFormat,
+        width: int | None
+    ) -> BinaryIO:
+        """
+        Open a page image in the page cache or render it (blocking). Freshly
+        rendered images are returned from memory.
+        """
+        file_provider = FileProviderFactory.get_provider(provider=provider)
+
+        if etag is None:
+            etag = file_provider.get_checksum(uri=uri)
+
+        quality = config.image.quality[format]
+
+        key = page_cache.key(etag, page, format.value, quality, width)
+
+        file = page_cache.open(key=key)
+        if file is not None:
+            return file
+
+        content = file_provider.file_to_image_bytes(
+            uri=uri, page=page, format=format, quality=quality, width=width)
+
+        page_cache.put(key=key, content=content)
+
+        return io.BytesIO(content)
+
+    async def get_pyramid_image(
+        self,
+        task: Task,
+        page: int,
+        variant: str
+    ) -> BinaryIO | None:
+        """
+        Return a variant (e.g. thumbnail, preview, manifest or a tile) of a
+        task's page pyramid. All variants of a page are rendered at once (in
+        a worker thread) and kept in the page cache. Returns None for unknown
+        variants; tiles outside of a cached manifest's grid are rejected
+        without rendering.
+        """
+        if not PagePyramid.is_variant(name=variant):
+            return None
+
+        return await asyncio.to_thread(
+            self._open_pyramid_image,
+            provider=task.project.provider,
+            uri=task.uri,
+            etag=task.etag,
+            page=page,
+            variant=variant
+        )
+
+    def _open_pyramid_image(
+        self,
+        provider: SourceProvider,
+        uri: str,
+        etag: str | None,
+        page: int,
+        variant: str
+    ) -> BinaryIO | None:
+        """
+        Open a pyramid variant in the page cache or render the page's pyramid
+        (blocking).
+        """
+        file_provider = FileProviderFactory.get_provider(provider=provider)
+
+        if etag is None:
+            etag = file_provider.get_checksum(uri=uri)
+
+        quality = config.image.pyramid_quality
+
+        def key(name: str) -> str:
+            return page_cache.key(etag, page, "pyramid", name, quality)
+
+        file = page_cache.open(key=key(variant))
+        if file is not None:
+            return file
+
+        manifest = page_cache.read(key=key("manifest"))
+        if manifest is not None and \
+                not PagePyramid.is_variant(name=variant, manifest=manifest):
+            return None
+
+        images = file_provider.file_to_image(
+            uri=uri, first_page=page, last_page=page)
+
+        if len(images) == 0:
+            return None
+
+        variants = dict(PagePyramid(image=images[0]).render())
+
+        page_cache.put_many(
+            entries={key(name): content for name, content in variants.items()})
+
+        self.logger.debug(f"Pyramid for page {page} of '{uri}' rendered.")
+
+        if variant not in variants:
+            return None
+
+        return io.BytesIO(variants[variant])
+
+    async def get_page_count(
+        self,
+        task: Task
+    ) -> int:
+        """
+        Return the number of pages of a task: those of its OCR run or, if it
+        has not been processed yet, the number of pages of its file (read
+        from the file's metadata in a worker thread, without rendering).
+        """
+        if task.ocr:
+            return len(task.ocr.pages)
+
+        file_provider = FileProviderFactory.get_provider(
+            provider=task.project.provider)
+
+        return await asyncio.to_thread(file_provider.page_count, uri=task.uri)
+
+    async def get_page(
+        self,
+        task: Task,
+        page: int
+    ) -> Page | None:
+        """
+        Get a page of a task's current OCR run.
+        """
+        if not task.ocr:
+            return None
+
+        query = sqlmodel.select(Page).where(
+            Page.ocr_id == task.ocr.id, Page.page == page)
+        return await self._first(query)
+
+    async def get_block_index(
+        self,
+        page: Page
+    ) -> BlockIndex:
+        """
+        Return the spatial index of a page's blocks. Indexes are built when
+        the OCR runs and kept in the index cache; evicted indexes are rebuilt
+        from the database. The cache is read in a worker thread.
+        """
+        index = await asyncio.to_thread(self._cached_block_index, page=page)
+        if index is not None:
+            return index
+
+        return await self._build_block_index(page=page)
+
+    @staticmethod
+    def _block_index_key(page: Page) -> str:
+        """
+        Return the index cache key of a page. Page ids are reused once the
+        tables are recreated, so the key includes the page's content.
+        """
+        return index_cache.key(page.id, page.checksum, page.storage.value,
+                               config.ocr.index_cells)
+
+    def _cached_block_index(
+        self,
+        page: Page
+    ) -> BlockIndex | None:
+        """
+        Return a page's index from the index cache, if present (blocking).
+        """
+        data = index_cache.read(key=self._block_index_key(page=page))
+
+        if data is None:
+            return None
+
+        return BlockIndex.from_bytes(data=data)
+
+    async def get_page_blocks(
+        self,
+        page: Page
+    ) -> List[PageBlock]:
+        """
+        Get all blocks of a page in reading order, regardless of how they
+        are stored.
+        """
+        if page.storage == BlockStorage.packed:
+            return await self._packed_page_blocks(page=page)
+
+        query = sqlmodel.select(Block).where(
+            Block.page_id == page.id).order_by(Block.id)
+
+        return [PageBlock(**block.model_dump())
+                for block in await self._all(query)]
+
+    async def get_page_links(
+        self,
+        page: Page
+    ) -> Dict[int | str, LabelLink]:
+        """
+        Get the label links of a page's blocks, keyed by the blocks' ids.
+        """
+        if page.storage == BlockStorage.packed:
+            query = sqlmodel.select(LabelLink).where(
+                LabelLink.page_id == page.id)
+        else:
+            query = sqlmodel.select(LabelLink).join(
+                Block, LabelLink.block_id == Block.id
+            ).where(Block.page_id == page.id)
+
+        query = query.options(
+            selectinload(LabelLink.label).selectinload(Label.labeltype))
+
+        return {link.block_key: link for link in await self._all(query)}
+
+    async def find_blocks(
+        self,
+        page: Page,
+        left: float,
+        top: float,
+        right: float,
+        bottom: float
+    ) -> Sequence[PageBlock]:
+        """
+        Find all blocks of a page that intersect a rectangle, in reading
+        order.
+        """
+        index = await self.get_block_index(page=page)
+
+        ids = index.intersecting(left=left, top=top, right=right,
+                                 bottom=bottom)
+
+        if not ids:
+            return []
+
+        if page.storage == BlockStorage.packed:
+            return await self._packed_page_blocks(page=page, positions=ids)
+
+        query = sqlmodel.select(Block).where(
+            Block.id.in_(ids), Block.page_id == page.id)
+        blocks = {block.id: block for block in await self._all(query)}
+
+        return [PageBlock(**blocks[id].model_dump())
+                for id in ids if id in blocks]
+
+    async def find_nearest_block(
+        self,
+        page: Page,
+        x: float,
+        y: float,
+        max_distance: float | None = None
+    ) -> PageBlock | None:
+        """
+        Find the block of a page that is closest to a point.
+        """
+        index = await self.get_block_index(page=page)
+
+        id = index.nearest(x=x, y=y, max_distance=max_distance)
+
+        if id is None:
+            return None
+
+        if page.storage == BlockStorage.packed:
+            return (await self._packed_page_blocks(
+                page=page, positions=[id]))[0]
+
+        block = await self._get(Block, id)
+
+        if block is None or block.page_id != page.id:
+            return None
+
+        return PageBlock(**block.model_dump())
+
+    async def _packed_blocks(
+        self,
+        page: Page
+    ) -> BlockArray:
+        """
+        Read the blocks of a packed page (a single row). The row is unpacked
+        in a worker thread.
+        """
+        packed = await self._get(PackedBlocks, page.id)
+
+        if packed is None:
+            return BlockArray.empty()
+
+        return await asyncio.to_thread(BlockArray.unpack, data=packed.data)
+
+    async def _packed_page_blocks(
+        self,
+        page: Page,
+        positions: Sequence[int] | None = None
+    ) -> List[PageBlock]:
+        """
+        Return the blocks of a packed page (or those at the given positions)
+        as PageBlock objects.
+        """
+        packed = await self._get(PackedBlocks, page.id)
+
+        if packed is None:
+            return []
+
+        return await asyncio.to_thread(
+            self._unpack_page_blocks,
+            page_id=page.id,
+            data=packed.data,
+            positions=positions
+        )
+
+    @staticmethod
+    def _unpack_page_blocks(
+        page_id: int,
+        data: bytes,
+        positions: Sequence[int] | None
+    ) -> List[PageBlock]:
+        """
+        Unpack the blocks of a packed page into PageBlock objects (blocking).
+        """
+        rows = list(BlockArray.unpack(data=data).rows())
+
+        if positions is None:
+            positions = range(len(rows))
+
+        return [
+            PageBlock(id=f"{page_id}:{position}", page_id=page_id,
+                      **rows[position])
+            for position in positions
+        ]
+
+    async def _build_block_index(
+        self,
+        page: Page,
+        ids: numpy.ndarray | None = None,
+        blocks: BlockArray | None = None
+    ) -> BlockIndex:
+        """
+        Build the spatial index of a page's blocks and put it into the index
+        cache. Blocks that were just written can be passed along with their
+        ids, so that they need not be read back from the database. The index
+        is built in a worker thread.
+        """
+        if ids is None and page.storage == BlockStorage.packed:
+            blocks = await self._packed_blocks(page=page)
+            ids = numpy.arange(len(blocks))
+
+        if ids is not None and blocks is not None:
+            columns = [ids, blocks.left, blocks.top, blocks.width,
+                       blocks.height]
+        else:
+            query = sqlmodel.select(
+                Block.id, Block.left, Block.top, Block.width, Block.height
+            ).where(Block.page_id == page.id).order_by(Block.id)
+
+            rows = await self._all(query)
+
+            columns = list(zip(*rows)) if rows else [[]] * 5
+
+        return await asyncio.to_thread(
+            self._store_block_index, page=page, columns=columns)
+
+    def _store_block_index(
+        self,
+        page: Page,
+        columns: Sequence[Sequence[Any]]
+    ) -> BlockIndex:
+        """
+        Build a page's index from the ids and boxes of its blocks and put it
+        into the index cache (blocking).
+        """
+        index = BlockIndex.build(
+            ids=columns[0],
+            left=columns[1],
+            top=columns[2],
+            width=columns[3],
+            height=columns[4],
+            dimensions=(int(page.width), int(page.height)),
+            cells=config.ocr.index_cells
+        )
+
+        index_cache.put(
+            key=self._block_index_key(page=page),
+            content=index.to_bytes()
+        )
+
+        return index
+
     async def run_ocr(
         self,
         task: Task,
         provider: OcrProvider = OcrProvider.tesseract,
-        force_ocr: bool = False
+        force_ocr: bool = False,
+        use_cache: bool = True
     ) -> None:
         """
-        Run OCR for a task.
+        Run OCR for a task. Pages that did not change since the previous OCR
+        run are carried over (with their blocks and labels), all other pages
+        of the previous run are removed. The time spent in each stage is
+        recorded in the manager's timer.
         """
         try:
             self.logger.debug(f"OCR for task {task.id} started.")
@@ -214,7 +726,8 @@ class ProjectManager():
             file_provider = FileProviderFactory.get_provider(
                 provider=task.project.provider)
 
-            etag = file_provider.get_checksum(uri=task.uri)
+            with self.timer.stage("checksum"):
+                etag = file_provider.get_checksum(uri=task.uri)
 
             if task.ocr and etag == task.ocr.etag and not force_ocr:
                 self.logger.debug(
@@ -224,49 +737,109 @@ class ProjectManager():
                 self.session.commit()
                 return
 
-            ocr_provider = OcrProviderFactory.get_provider(
-                provider=provider
-            )
+            if task.etag != etag:
+                task.etag = etag
+                task.modified = datetime.datetime.now()
+
+            # the document's time budget is shown with the task's status
+            deadline = None
+            task.ocr_deadline = None
+
+            if config.ocr.document_timeout:
+                deadline = time.monotonic() + config.ocr.document_timeout
+                task.ocr_deadline = datetime.datetime.now() + \
+                    datetime.timedelta(seconds=config.ocr.document_timeout)
+
+            task.status = TaskStatus.ocr_running
+            self.session.add(task)
+            self.session.commit()
+
+            preprocessing = Preprocessing(
+                **(task.project.preprocessing or {}))
 
-            images = file_provider.file_to_image(uri=task.uri)
+            engine_config = self._engine_config(
+                provider=provider, preprocessing=preprocessing)
 
             ocr = Ocr(
                 task=task,
                 etag=etag,
                 provider=provider,
-                created=datetime.datetime.now()
+                created=datetime.datetime.now(),
+                engine_config=engine_config
             )
             self.session.add(ocr)
 
-            for index, image in enumerate(images):
+            results = self._ocr_pages(
+                file_provider=file_provider,
+                uri=task.uri,
+                provider=provider,
+                engine_config=engine_config,
+                preprocessing=preprocessing,
+                previous=self._reusable_pages(
+                    task=task, engine_config=engine_config),
+                deadline=deadline,
+                use_cache=use_cache
+            )
+
+            writer = BlockWriter(
+                session=self.session,
+                mode=config.database.block_insert,
+                storage=config.database.block_storage,
+                timer=self.timer
+            )
+
+            new_pages, carried, count = [], 0, 0
+            for index, result in enumerate(results):
+                count += 1
+
+                if result.page is not None:
+                    result.page.ocr = ocr
+                    result.page.page = index
+                    self.session.add(result.page)
+
+                    carried += 1
+                    continue
+
                 page = Page(
                     ocr=ocr,
                     page=index,
-                    width=image.width,
-                    height=image.height
+                    width=result.width,
+                    height=result.height,
+                    status=result.status,
+                    checksum=result.checksum
                 )
 
                 self.session.add(page)
 
-                blocks = ocr_provider.run_ocr(image=image)
-
-                for block in blocks:
-                    block = Block(
-                        page=page,
-                        type=block.type,
-                        content=block.content,
-                        confidence=block.confidence,
-                        left=block.left,
-                        top=block.top,
-                        width=block.width,
-                        height=block.height
-                    )
+                with self.timer.stage("insert"):
+                    ids = writer.insert(page=page, blocks=result.blocks)
+
+                new_pages.append((page, ids, result.blocks))
+
+                if result.status != PageStatus.complete:
+                    ocr.status = OcrStatus.partial
 
-                    self.session.add(block)
+                    self.logger.warning(
+                        f"OCR for page {index} of task {task.id} ran out of "
+                        f"time ({result.status.value}).")
+
+            self.logger.debug(
+                f"OCR for task {task.id}: {carried} of {count} pages "
+                f"carried over.")
 
             task.status = TaskStatus.ready
+            task.ocr_deadline = None
             self.session.add(task)
-            self.session.commit()
+
+            with self.timer.stage("insert"):
+                self.session.flush()
+                self._remove_previous_ocr(task=task, ocr=ocr)
+                self.session.commit()
+
+            with self.timer.stage("index"):
+                for page, ids, blocks in new_pages:
+                    await self._build_block_index(
+                        page=page, ids=ids, blocks=blocks)
 
             self.logger.debug(f"OCR for task {task.id} successful.")
 
@@ -274,8 +847,253 @@ class ProjectManager():
             self.logger.exception(exception)
             self.logger.debug(f"OCR for task {task.id} failed.")
 
+            self.session.rollback()
+
             task.status = TaskStatus.error
+            task.ocr_deadline = None
             self.session.add(task)
             self.session.commit()
 
+    async def _all(self, query: Any) -> Sequence[Any]:
+        """
+        Run a query and return all results.
+        """
+        return self.session.exec(query).all()
+
+    async def _first(self, query: Any) -> Any:
+        """
+        Run a query and return the first result.
+        """
+        return self.session.exec(query).first()
+
+    async def _get(self, model: Any, id: Any) -> Any:
+        """
+        Get an object by its primary key.
+        """
+        return self.session.get(model, id)
+
+    def _engine_config(
+        self,
+        provider: OcrProvider,
+        preprocessing: Preprocessing
+    ) -> str:
+        """
+        Return the settings that influence a page's OCR results as JSON.
+        """
+        return json.dumps(
+            {
+                **OcrProviderFactory.get_provider(
+                    provider=provider).engine_config(),
+                "provider": provider.value,
+                "preprocessing": preprocessing.model_dump(),
+                "dpi": config.ocr.default_dpi
+            },
+            sort_keys=True
+        )
+
+    def _reusable_pages(
+        self,
+        task: Task,
+        engine_config: str
+    ) -> Dict[str, List[Page]]:
+        """
+        Return the complete pages of the task's previous OCR runs that were
+        processed with the same settings, keyed by their checksum.
+        """
+        query = sqlmodel.select(Page).join(Ocr).where(
+            Ocr.task_id == task.id,
+            Ocr.engine_config == engine_config,
+            Page.status == PageStatus.complete,
+            Page.checksum != None  # noqa: E711
+        )
+
+        pages: Dict[str, List[Page]] = {}
+        for page in self.session.exec(query):
+            pages.setdefault(page.checksum, []).append(page)
+
+        return pages
+
+    def _remove_previous_ocr(
+        self,
+        task: Task,
+        ocr: Ocr
+    ) -> None:
+        """
+        Delete a task's OCR runs other than the given one, including their
+        remaining pages, blocks and label links. Labels that no longer link
+        to any block are deleted as well. Does NOT commit.
+        """
+        previous = sqlmodel.select(Ocr.id).where(
+            Ocr.task_id == task.id, Ocr.id != ocr.id)
+        pages = sqlmodel.select(Page.id).where(Page.ocr_id.in_(previous))
+        blocks = sqlmodel.select(Block.id).where(Block.page_id.in_(pages))
+
+        self.session.exec(sqlmodel.delete(LabelLink).where(
+            LabelLink.block_id.in_(blocks)))
+        self.session.exec(sqlmodel.delete(LabelLink).where(
+            LabelLink.page_id.in_(pages)))
+        self.session.exec(sqlmodel.delete(Block).where(
+            Block.page_id.in_(pages)))
+        self.session.exec(sqlmodel.delete(PackedBlocks).where(
+            PackedBlocks.page_id.in_(pages)))
+        self.session.exec(sqlmodel.delete(Page).where(
+            Page.ocr_id.in_(previous)))
+        self.session.exec(sqlmodel.delete(Ocr).where(
+            Ocr.task_id == task.id, Ocr.id != ocr.id))
+
+        linked = sqlmodel.select(LabelLink.id).where(
+            LabelLink.label_id == Label.id)
+
+        self.session.exec(sqlmodel.delete(Label).where(
+            Label.task_id == task.id, ~sqlmodel.exists(linked)))
+
+    def _ocr_pages(
+        self,
+        file_provider: BaseFileProvider,
+        uri: str,
+        provider: OcrProvider,
+        engine_config: str,
+        preprocessing: Preprocessing,
+        previous: Dict[str, List[Page]],
+        deadline: float | None = None,
+        use_cache: bool = True
+    ) -> Generator["PageResult", None, None]:
+        """
+        Yield the result of every page of a file in page order. Each page is
+        rasterized and hashed. Pages matching a page of the previous OCR run
+        are carried over, pages found in the OCR cache (which is shared by
+        all tasks and projects and keyed by the page's content and the
+        settings) are taken from there, and only the remaining pages are
+        sent to the OCR executor. Only complete pages are cached, so pages
+        that ran out of time are retried on the next run. Without use_cache,
+        the OCR cache is bypassed (e.g. for benchmarks).
+        """
+        def key(checksum: str) -> str:
+            return ocr_cache.key(checksum, engine_config)
+
+        # pages in page order; pending pages wait for the OCR executor
+        decisions: Deque[PageResult] = collections.deque()
+
+        def select() -> Generator[Image.Image, None, None]:
+            images = file_provider.iter_images(uri=uri)
+
+            for image in self.timer.iterate("rasterize", images):
+                with self.timer.stage("checksum"):
+                    checksum = self._page_checksum(image=image)
+
+                result = PageResult(
+                    width=image.width,
+                    height=image.height,
+                    checksum=checksum
+                )
+                decisions.append(result)
+
+                if previous.get(checksum):
+                    result.page = previous[checksum].pop()
+                    continue
+
+                if use_cache:
+                    with self.timer.stage("cache"):
+                        result.blocks = self._cached_blocks(
+                            key=key(checksum))
+
+                    if result.blocks is not None:
+                        continue
+
+                result.pending = True
+                yield image
+
+        # pages are processed in parallel, but returned in page order
+        results = ocr_executor.map(
+            provider=provider,
+            images=select(),
+            preprocessing=preprocessing,
+            deadline=deadline
+        )
+
+        finished: Deque[Tuple[PageStatus, BlockArray]] = collections.deque()
+
+        while True:
+            if not decisions or (decisions[0].pending and not finished):
+                try:
+                    with self.timer.stage("ocr"):
+                        _, _, status, blocks = next(results)
+                    finished.append((status, blocks))
+                except StopIteration:
+                    if not decisions:
+                        return
+                    if decisions[0].pending:
+                        raise Exception("OCR results are missing.")
+                continue
+
+            result = decisions.popleft()
+
+            if result.pending:
+                result.status, result.blocks = finished.popleft()
+
+                if result.status == PageStatus.complete and use_cache:
+                    ocr_cache.put(
+                        key=key(result.checksum),
+                        content=result.blocks.to_bytes(
+                            width=result.width, height=result.height)
+                    )
+
+            yield result
+
+    def _cached_blocks(
+        self,
+        key: str
+    ) -> BlockArray | None:
+        """
+        Return a page's blocks from the OCR cache, if present.
+        """
+        data = ocr_cache.read(key=key)
+
+        if data is None:
+            return None
+
+        _, _, blocks = BlockArray.from_bytes(data=data)
+
+        return blocks
+
+    @staticmethod
+    def _page_checksum(image: Image.Image) -> str:
+        """
+        Return a checksum of a rendered page's pixels.
+        """
+        digest = hashlib.new(config.file.checksum_algorithm)
+
+        digest.update(f"{image.mode}:{image.width}x{image.height}".encode())
+        digest.update(image.tobytes())
+
+        return digest.hexdigest()
+
+# ---------------------------------------------------------------------------- #
+
+
+class AsyncProjectManager(ProjectManager):
+    """
+    The ProjectManager for request handlers. Its queries run on an async
+    database session and are awaited, so that they do not block the event
+    loop. Relationships are not loaded lazily in async sessions, so the
+    queries load what the pages show up front. OCR runs and scans are
+    performed by background workers with a ProjectManager.
+    """
+    session: AsyncDatabaseSession  # type: ignore
+
+    def __init__(self, session: AsyncDatabaseSession) -> None:
+        """
+        Initialize the AsyncProjectManager class.
+        """
+        super().__init__(session=session)  # type: ignore
+
+    async def _all(self, query: Any) -> Sequence[Any]:
+        return (await self.session.exec(query)).all()
+
+    async def _first(self, query: Any) -> Any:
+        return (await self.session.exec(query)).first()
+
+    async def _get(self, model: Any, id: Any) -> Any:
+        return await self.session.get(model, id)
+
 # ---------------------------------------------------------------------------- #
@@ -6,7 +6,8 @@ import sqlmodel
 import bcrypt
 import logging
 import datetime
-from typing import Callable
+from typing import AsyncGenerator, Callable
+from sqlalchemy.orm import selectinload
 
 # ---------------------------------------------------------------------------- #
 
@@ -24,18 +25,19 @@ class SessionManager():
     request: Request
     session: Session | None
 
-    _database: Database
-    _database_session: DatabaseSession
+    _database: AsyncDatabase
+    _database_session: AsyncDatabaseSession
     _force_authentication: bool
 
     def __init__(
         self,
-        database: Database,
+        database: AsyncDatabase,
         request: Request,
         force_authentication: bool = False
     ) -> None:
         """
-        Initialize the HTTP session.
+        Initialize the HTTP session. The database session has to be closed
+        with close.
         """
         self.logger = logging.getLogger('mrkr.session')
 
@@ -90,9 +92,9 @@ class SessionManager():
 
         query = sqlmodel.select(Session).where(
             Session.session_token == session_token
-        )
+        ).options(selectinload(Session.user))
 
-        session = self._database_session.exec(query).first()
+        session = (await self._database_session.exec(query)).first()
 
         if not session:
             self.logger.warning("Invalid session token.")
@@ -126,7 +128,7 @@ class SessionManager():
         )
 
         self._database_session.add(session)
-        self._database_session.commit()
+        await self._database_session.commit()
 
         self.session = session
 
@@ -146,7 +148,7 @@ class SessionManager():
             datetime.timezone.utc
         )
         self._database_session.add(self.session)
-        self._database_session.commit()
+        await self._database_session.commit()
 
         self.logger.debug("Session refreshed.")
 
@@ -158,8 +160,8 @@ class SessionManager():
         """
         query = sqlmodel.select(Authentication).where(
             Authentication.email == email
-        )
-        authentication = self._database_session.exec(query).first()
+        ).options(selectinload(Authentication.user))
+        authentication = (await self._database_session.exec(query)).first()
 
         if not isinstance(authentication, Authentication):
             self.logger.warning(f"Login attempt with unknown email.")
@@ -186,8 +188,8 @@ class SessionManager():
         """
         session = self.session
         if session:
-            self._database_session.delete(session)
-            self._database_session.commit()
+            await self._database_session.delete(session)
+            await self._database_session.commit()
         self.session = None
 
         self.logger.debug("Logout successful.")
@@ -204,7 +206,7 @@ class SessionManager():
         query_authentication = sqlmodel.select(Authentication).where(
             Authentication.email == email
         )
-        if self._database_session.exec(query_authentication).first():
+        if (await self._database_session.exec(query_authentication)).first():
             self.logger.error(f"Signup credentials already exist.")
             await self.add_flash_message(FlashMessage.credentials_exist)
             raise HTTPException(status_code=409, detail="Conflict")
@@ -212,7 +214,7 @@ class SessionManager():
         query_user = sqlmodel.select(User).where(
             User.name == username
         )
-        if self._database_session.exec(query_user).first():
+        if (await self._database_session.exec(query_user)).first():
             self.logger.error(f"Signup credentials already exist.")
             await self.add_flash_message(FlashMessage.credentials_exist)
             raise HTTPException(status_code=409, detail="Conflict")
@@ -227,14 +229,21 @@ class SessionManager():
 
         self._database_session.add(user)
         self._database_session.add(authentication)
-        self._database_session.commit()
+        await self._database_session.commit()
 
         await self.add_flash_message(FlashMessage.signup_successful)
 
         self.logger.error(f"Signup successful.")
 
+    async def close(self) -> None:
+        """
+        Close the database session and return its connection to the pool.
+        """
+        await self._database_session.close()
+        self.logger.debug("Database session closed.")
+
     @property
-    def database(self) -> DatabaseSession:
+    def database(self) -> AsyncDatabaseSession:
         """
         Return the underlying database session.
         """
@@ -293,7 +302,7 @@ class SessionManager():
             return
         self.session.flash = message
         self._database_session.add(self.session)
-        self._database_session.commit()
+        await self._database_session.commit()
 
         self.logger.debug(f"Flash message set: {message}")
 
@@ -310,7 +319,7 @@ class SessionManager():
 
         self.session.flash = None
         self._database_session.add(self.session)
-        self._database_session.commit()
+        await self._database_session.commit()
 
         if flash in config.flash_messages:
             return config.flash_messages[flash]
@@ -351,27 +360,37 @@ class SessionManager():
         return False
 
     @staticmethod
-    def get_session(database: Database) -> Callable:
+    def get_session(database: AsyncDatabase) -> Callable:
         """
         A getter for the FastAPI dependency injection.
         """
-        async def getter(request: Request) -> SessionManager:
+        async def getter(
+            request: Request
+        ) -> AsyncGenerator[SessionManager, None]:
             manager = SessionManager(
                 database, request)
-            await manager.establish_session()
-            return manager
+            try:
+                await manager.establish_session()
+                yield manager
+            finally:
+                await manager.close()
         return getter
 
     @staticmethod
-    def get_authenticated_session(database: Database) -> Callable:
+    def get_authenticated_session(database: AsyncDatabase) -> Callable:
         """
         A getter for the FastAPI dependency injection. Requires authentication.
         """
-        async def getter(request: Request) -> SessionManager:
+        async def getter(
+            request: Request
+        ) -> AsyncGenerator[SessionManager, None]:
             manager = SessionManager(
                 database, request, force_authentication=True)
-            await manager.establish_session()
-            return manager
+            try:
+                await manager.establish_session()
+                yield manager
+            finally:
+                await manager.close()
         return getter
 
     async def _check_password(
@@ -432,12 +451,4 @@ class SessionManager():
 
         self.logger.debug("CSRF token valid.")
 
-    def __del__(self) -> None:
-        """
-        Close the database session.
-        """
-        if hasattr(self, "_database_session") and self._database_session:
-            self._database_session.close()
-        self.logger.debug("Database session closed.")
-
 # ---------------------------------------------------------------------------- #
@@ -0,0 +1,97 @@
+# ---------------------------------------------------------------------------- #
+
+import time
+import threading
+import contextlib
+from typing import Dict, Generator, Iterable, Iterator, List, TypeVar
+
+# ---------------------------------------------------------------------------- #
+
+T = TypeVar("T")
+
+# ---------------------------------------------------------------------------- #
+
+
+class StageTimer():
+    """
+    Accumulates the wall-clock time spent in the stages of a pipeline (e.g.
+    rasterization and OCR). Stages may be nested; the time of a nested stage
+    is only counted for the nested stage, not for the enclosing one.
+    """
+    totals: Dict[str, float]
+    counts: Dict[str, int]
+
+    _local: threading.local
+    _lock: threading.Lock
+
+    def __init__(self) -> None:
+        """
+        Initialize the timer.
+        """
+        self.totals = {}
+        self.counts = {}
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def stage(self, name: str) -> Generator[None, None, None]:
+        """
+        Measure the time spent in a block of code.
+        """
+        stack: List[List[float]] = self._stack()
+
+        # each entry holds the stage's start and the time of nested stages
+        stack.append([time.perf_counter(), 0.0])
+        try:
+            yield
+        finally:
+            start, nested = stack.pop()
+            elapsed = time.perf_counter() - start
+
+            if stack:
+                stack[-1][1] += elapsed
+
+            with self._lock:
+                self.totals[name] = self.totals.get(name, 0.0) + \
+                    elapsed - nested
+                self.counts[name] = self.counts.get(name, 0) + 1
+
+    def iterate(self, name: str, items: Iterable[T]) -> Iterator[T]:
+        """
+        Measure the time spent producing the items of an iterator (e.g. a
+        generator that renders pages).
+        """
+        iterator = iter(items)
+
+        while True:
+            with self.stage(name):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+
+            yield item
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """
+        Return the total seconds and the number of calls per stage.
+        """
+        with self._lock:
+            return {
+                name: {
+                    "seconds": round(self.totals[name], 6),
+                    "calls": self.counts[name]
+                }
+                for name in self.totals
+            }
+
+    def _stack(self) -> List[List[float]]:
+        stack = getattr(self._local, "stack", None)
+
+        if stack is None:
+            stack = self._local.stack = []
+
+        return stack
+
+# ---------------------------------------------------------------------------- #
@@ -73,12 +73,15 @@ document.addEventListener('keypress', function (evt) {
         width = labelimage.clientWidth
         labelimage.style.width = Math.round(width * 0.97, 0) + "px";
     }
+    load_page_tiles();
 });
 
 /* Renewable Event Listeners */
 
 function register_event_listeners() {
 
+    load_page_preview();
+
     add_event_listener(document.getElementById('toggle-nav-button'), 'click', function (evt) {
         toggle_navigation();
     });
@@ -169,6 +172,76 @@ function register_event_listeners() {
 
 }
 
+/* Page Images */
+
+function load_page_preview() {
+    /* replace the thumbnail with the preview once the latter has loaded */
+    const labelimage = document.getElementById("label-image");
+    if (labelimage === null || labelimage.dataset.preview === undefined) {
+        return;
+    }
+
+    if (labelimage.dataset.previewLoaded === 'true') {
+        return;
+    }
+    labelimage.dataset.previewLoaded = 'true';
+
+    const preview = new Image();
+    preview.onload = function () {
+        labelimage.src = preview.src;
+    };
+    preview.src = labelimage.dataset.preview;
+}
+
+function load_page_tiles() {
+    /* overlay full resolution tiles once the image is zoomed beyond the
+       preview's resolution; lazy loading only fetches the visible tiles */
+    const labelimage = document.getElementById("label-image");
+    if (labelimage === null || labelimage.dataset.tiles === undefined) {
+        return;
+    }
+
+    if (labelimage.dataset.tilesLoaded === 'true') {
+        return;
+    }
+
+    if (labelimage.naturalWidth === 0 || labelimage.clientWidth <= labelimage.naturalWidth) {
+        return;
+    }
+    labelimage.dataset.tilesLoaded = 'true';
+
+    fetch(labelimage.dataset.tiles).then(function (response) {
+        return response.json();
+    }).then(function (manifest) {
+        const layer = document.createElement("div");
+        layer.classList.add("tile-layer");
+
+        for (let y = 0; y < manifest.rows; y++) {
+            for (let x = 0; x < manifest.columns; x++) {
+                const left = x * manifest.tile_size;
+                const top = y * manifest.tile_size;
+                const width = Math.min(manifest.tile_size, manifest.width - left);
+                const height = Math.min(manifest.tile_size, manifest.height - top);
+
+                const tile = document.createElement("img");
+                tile.loading = "lazy";
+                tile.draggable = false;
+                tile.style.left = (left / manifest.width * 100) + "%";
+                tile.style.top = (top / manifest.height * 100) + "%";
+                tile.style.width = (width / manifest.width * 100) + "%";
+                tile.style.height = (height / manifest.height * 100) + "%";
+                tile.src = labelimage.dataset.tile + "&x=" + x + "&y=" + y;
+
+                layer.appendChild(tile);
+            }
+        }
+
+        labelimage.parentElement.insertBefore(layer, labelimage.nextSibling);
+    }).catch(function () {
+        labelimage.dataset.tilesLoaded = 'false';
+    });
+}
+
 function add_event_listener(element, event_name, callback) {
     if (!element) {
         return
@@ -0,0 +1,38 @@
+# ---------------------------------------------------------------------------- #
+
+import pathlib
+import pytest
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.config import config
+from mrkr.src.cache import page_cache, ocr_cache, index_cache, spill_cache
+from mrkr.src.file.fingerprint import fingerprint_cache
+
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture(autouse=True)
+def cache_directory(
+    tmp_path: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> pathlib.Path:
+    """
+    Keep the caches of each test in a temporary directory.
+    """
+    directory = tmp_path / "cache"
+
+    monkeypatch.setattr(config.cache, "directory", str(directory))
+
+    for cache in (page_cache, ocr_cache, index_cache, spill_cache):
+        monkeypatch.setattr(cache, "directory", directory / cache.name)
+        monkeypatch.setattr(cache, "_entries", None)
+        monkeypatch.setattr(cache, "_size", 0)
+
+    monkeypatch.setattr(
+        fingerprint_cache, "path", directory / "fingerprints.sqlite")
+    monkeypatch.setattr(fingerprint_cache, "_connection", None)
+
+    return directory
+
+# ---------------------------------------------------------------------------- #
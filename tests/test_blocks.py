@@ -0,0 +1,66 @@
+# ---------------------------------------------------------------------------- #
+
+import numpy
+import pytest
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.ocr import BlockArray
+
+# ---------------------------------------------------------------------------- #
+
+
+def assert_equal(blocks: BlockArray, expected: BlockArray) -> None:
+    """
+    Compare two containers; coordinates and confidences are stored as
+    32-bit floats, so they only agree up to float precision.
+    """
+    assert blocks.content == expected.content
+
+    for name in ("confidence", "left", "top", "width", "height"):
+        numpy.testing.assert_allclose(
+            getattr(blocks, name), getattr(expected, name), rtol=1e-6,
+            equal_nan=True)
+
+
+def test_pack_round_trip() -> None:
+    """
+    Packed blocks are unpacked unchanged, including words with multi-byte
+    characters, empty words and unknown (NaN) confidences.
+    """
+    blocks = BlockArray(
+        content=["Grüße", "", "日本語", "naïve", "🙂", "end"],
+        confidence=numpy.asarray([0.96, numpy.nan, 0.5, 0.0, numpy.nan, 1.0]),
+        left=numpy.asarray([0.0, 10.5, 20.25, 30.125, 99.99, 50.0]),
+        top=numpy.asarray([1.0, 2.0, 3.0, 4.0, 5.0, 6.0]),
+        width=numpy.asarray([5.5, 0.0, 2.12345, 3.0, 0.01, 100.0]),
+        height=numpy.asarray([1.5, 1.5, 1.5, 1.5, 1.5, 1.5])
+    )
+
+    unpacked = BlockArray.unpack(data=blocks.pack())
+
+    assert_equal(unpacked, blocks)
+    assert numpy.isnan(unpacked.confidence[[1, 4]]).all()
+    assert [row["confidence"] for row in unpacked.rows()][1] is None
+
+
+def test_pack_empty_page() -> None:
+    """
+    A page without words is packed into a header only and unpacked into an
+    empty container.
+    """
+    data = BlockArray.empty().pack()
+
+    unpacked = BlockArray.unpack(data=data)
+
+    assert len(unpacked) == 0
+    assert unpacked.content == []
+    assert list(unpacked.rows()) == []
+
+
+def test_unpack_rejects_other_data() -> None:
+    """
+    Data that was not created by pack is rejected.
+    """
+    with pytest.raises(Exception, match="Invalid packed blocks"):
+        BlockArray.unpack(data=b"\x00" * 16)
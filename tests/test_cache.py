@@ -0,0 +1,72 @@
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.cache import DiskCache
+
+# ---------------------------------------------------------------------------- #
+
+
+def test_evicts_least_recently_used() -> None:
+    """
+    Once the cache exceeds its size, the entries used longest ago are
+    deleted first; reading an entry counts as using it.
+    """
+    cache = DiskCache(name="test", max_size=100)
+
+    cache.put(key="a" * 64, content=b"a" * 40)
+    cache.put(key="b" * 64, content=b"b" * 40)
+
+    assert cache.read(key="a" * 64) == b"a" * 40
+
+    cache.put(key="c" * 64, content=b"c" * 40)
+
+    assert cache.read(key="a" * 64) == b"a" * 40
+    assert cache.read(key="b" * 64) is None
+    assert cache.read(key="c" * 64) == b"c" * 40
+    assert not (cache.directory / "bb" / ("b" * 64)).exists()
+
+
+def test_put_many_keeps_new_entries() -> None:
+    """
+    Entries stored together are not evicted in favour of each other, even
+    if they exceed the cache's size together.
+    """
+    cache = DiskCache(name="test", max_size=100)
+
+    cache.put(key="a" * 64, content=b"a" * 40)
+    cache.put_many(entries={"b" * 64: b"b" * 80, "c" * 64: b"c" * 80})
+
+    assert cache.read(key="a" * 64) is None
+    assert cache.read(key="b" * 64) == b"b" * 80
+    assert cache.read(key="c" * 64) == b"c" * 80
+
+
+def test_open_entry_survives_eviction() -> None:
+    """
+    An entry that was opened can still be read completely after it has been
+    evicted.
+    """
+    cache = DiskCache(name="test", max_size=100)
+
+    cache.put(key="a" * 64, content=b"a" * 80)
+
+    file = cache.open(key="a" * 64)
+    assert file is not None
+
+    cache.put(key="b" * 64, content=b"b" * 80)
+
+    with file:
+        assert cache.open(key="a" * 64) is None
+        assert file.read() == b"a" * 80
+
+
+def test_index_is_loaded_from_disk() -> None:
+    """
+    A new cache instance (e.g. of another worker process) finds the entries
+    written by a previous one.
+    """
+    DiskCache(name="test", max_size=100).put(key="a" * 64, content=b"a")
+
+    cache = DiskCache(name="test", max_size=100)
+
+    assert cache.read(key="a" * 64) == b"a"
+    assert cache.open(key="b" * 64) is None
@@ -0,0 +1,151 @@
+# ---------------------------------------------------------------------------- #
+
+import os
+import hashlib
+import pathlib
+import pytest
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.file import local
+from mrkr.src.file.fingerprint import FingerprintCache
+from mrkr.src.file.local import LocalFileProvider
+
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.fixture
+def cache(tmp_path: pathlib.Path) -> FingerprintCache:
+    """
+    Provide an empty fingerprint cache.
+    """
+    return FingerprintCache(path=tmp_path / "fingerprints.sqlite")
+
+
+@pytest.fixture
+def file(tmp_path: pathlib.Path) -> pathlib.Path:
+    """
+    Provide a file with a fixed modification time.
+    """
+    path = tmp_path / "file.bin"
+    path.write_bytes(b"first")
+    os.utime(path, ns=(1_000_000_000, 1_000_000_000))
+
+    return path
+
+# ---------------------------------------------------------------------------- #
+
+
+def test_unchanged_file_hits(
+    cache: FingerprintCache,
+    file: pathlib.Path
+) -> None:
+    """
+    A checksum is returned as long as the file is unchanged, and only for
+    the algorithm it was computed with.
+    """
+    cache.put(path=str(file), algorithm="sha256", stat=file.stat(),
+              checksum="abc")
+
+    assert cache.get(path=str(file), algorithm="sha256",
+                     stat=file.stat()) == "abc"
+    assert cache.get(path=str(file), algorithm="md5",
+                     stat=file.stat()) is None
+
+
+def test_modification_time_invalidates(
+    cache: FingerprintCache,
+    file: pathlib.Path
+) -> None:
+    """
+    A file rewritten with content of the same size is hashed again.
+    """
+    cache.put(path=str(file), algorithm="sha256", stat=file.stat(),
+              checksum="abc")
+
+    file.write_bytes(b"other")
+    os.utime(file, ns=(2_000_000_000, 2_000_000_000))
+
+    assert cache.get(path=str(file), algorithm="sha256",
+                     stat=file.stat()) is None
+
+
+def test_size_invalidates(
+    cache: FingerprintCache,
+    file: pathlib.Path
+) -> None:
+    """
+    A file whose size changed is hashed again, even if its modification
+    time was preserved (e.g. by a copy tool).
+    """
+    cache.put(path=str(file), algorithm="sha256", stat=file.stat(),
+              checksum="abc")
+
+    file.write_bytes(b"first and more")
+    os.utime(file, ns=(1_000_000_000, 1_000_000_000))
+
+    assert cache.get(path=str(file), algorithm="sha256",
+                     stat=file.stat()) is None
+
+
+def test_replaced_file_invalidates(
+    cache: FingerprintCache,
+    file: pathlib.Path,
+    tmp_path: pathlib.Path
+) -> None:
+    """
+    A file replaced by another one (a new inode) with the same size and
+    modification time is hashed again.
+    """
+    cache.put(path=str(file), algorithm="sha256", stat=file.stat(),
+              checksum="abc")
+
+    replacement = tmp_path / "replacement.bin"
+    replacement.write_bytes(b"other")
+    os.utime(replacement, ns=(1_000_000_000, 1_000_000_000))
+
+    # keep the old file, so that its inode is not reused
+    os.link(file, tmp_path / "old.bin")
+    os.replace(replacement, file)
+
+    assert cache.get(path=str(file), algorithm="sha256",
+                     stat=file.stat()) is None
+
+
+def test_cache_is_persistent(
+    cache: FingerprintCache,
+    file: pathlib.Path
+) -> None:
+    """
+    Checksums survive a restart (a new cache on the same database).
+    """
+    cache.put(path=str(file), algorithm="sha256", stat=file.stat(),
+              checksum="abc")
+
+    reopened = FingerprintCache(path=cache.path)
+
+    assert reopened.get(path=str(file), algorithm="sha256",
+                        stat=file.stat()) == "abc"
+
+
+def test_local_checksum_follows_changes(
+    cache: FingerprintCache,
+    file: pathlib.Path,
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    The local file provider returns the checksum of the file's current
+    content.
+    """
+    monkeypatch.setattr(local, "fingerprint_cache", cache)
+
+    provider = LocalFileProvider()
+
+    assert provider.get_checksum(uri=str(file)) == \
+        hashlib.sha256(b"first").hexdigest()
+
+    file.write_bytes(b"other")
+    os.utime(file, ns=(2_000_000_000, 2_000_000_000))
+
+    assert provider.get_checksum(uri=str(file)) == \
+        hashlib.sha256(b"other").hexdigest()
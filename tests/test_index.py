@@ -0,0 +1,141 @@
+# ---------------------------------------------------------------------------- #
+
+import numpy
+import pytest
+from typing import List
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.ocr import BlockIndex
+
+# ---------------------------------------------------------------------------- #
+
+DIMENSIONS = (1200, 1800)
+
+
+@pytest.fixture
+def boxes() -> numpy.ndarray:
+    """
+    Provide random word boxes (left, top, width, height in percent), some of
+    them spanning several cells or reaching over the page's border.
+    """
+    generator = numpy.random.default_rng(seed=1)
+
+    count = 500
+
+    return numpy.column_stack((
+        generator.uniform(-2, 98, count),
+        generator.uniform(-2, 98, count),
+        generator.uniform(0.5, 20, count),
+        generator.uniform(0.2, 4, count)
+    ))
+
+
+def build(boxes: numpy.ndarray, cells: int) -> BlockIndex:
+    """
+    Build an index whose ids differ from the blocks' positions.
+    """
+    return BlockIndex.build(
+        ids=numpy.arange(len(boxes)) + 1000,
+        left=boxes[:, 0],
+        top=boxes[:, 1],
+        width=boxes[:, 2],
+        height=boxes[:, 3],
+        dimensions=DIMENSIONS,
+        cells=cells
+    )
+
+
+def distances(boxes: numpy.ndarray, x: float, y: float) -> numpy.ndarray:
+    """
+    Return the distances (in pixels) of a point to all boxes.
+    """
+    dx = numpy.maximum(numpy.maximum(boxes[:, 0] - x,
+                                     x - boxes[:, 0] - boxes[:, 2]), 0)
+    dy = numpy.maximum(numpy.maximum(boxes[:, 1] - y,
+                                     y - boxes[:, 1] - boxes[:, 3]), 0)
+
+    return numpy.hypot(dx * DIMENSIONS[0] / 100, dy * DIMENSIONS[1] / 100)
+
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.mark.parametrize("cells", [1, 7, 32])
+def test_intersecting_matches_brute_force(
+    boxes: numpy.ndarray,
+    cells: int
+) -> None:
+    """
+    A region query returns exactly the blocks intersecting the region, in
+    the order they were indexed.
+    """
+    index = build(boxes=boxes, cells=cells)
+
+    generator = numpy.random.default_rng(seed=2)
+
+    for _ in range(200):
+        left, right = sorted(generator.uniform(-5, 105, 2))
+        top, bottom = sorted(generator.uniform(-5, 105, 2))
+
+        mask = (boxes[:, 0] <= right) & \
+            (boxes[:, 0] + boxes[:, 2] >= left) & \
+            (boxes[:, 1] <= bottom) & \
+            (boxes[:, 1] + boxes[:, 3] >= top)
+
+        expected: List[int] = (numpy.flatnonzero(mask) + 1000).tolist()
+
+        assert index.intersecting(
+            left=left, top=top, right=right, bottom=bottom) == expected
+
+
+@pytest.mark.parametrize("cells", [1, 7, 32])
+def test_nearest_matches_brute_force(
+    boxes: numpy.ndarray,
+    cells: int
+) -> None:
+    """
+    The nearest block is as close to the point as the closest of all blocks,
+    and blocks beyond the maximum distance are not returned.
+    """
+    index = build(boxes=boxes[:40], cells=cells)
+
+    generator = numpy.random.default_rng(seed=3)
+
+    for x, y in generator.uniform(-5, 105, (200, 2)):
+        expected = distances(boxes=boxes[:40], x=x, y=y)
+
+        id = index.nearest(x=x, y=y)
+
+        assert id is not None
+        assert expected[id - 1000] == pytest.approx(expected.min())
+
+        # max_distance is given in percent of the page's width
+        limit = expected.min() / DIMENSIONS[0] * 100
+
+        assert index.nearest(x=x, y=y, max_distance=limit * 1.01) is not None
+        if limit > 0:
+            assert index.nearest(x=x, y=y, max_distance=limit * 0.99) is None
+
+
+def test_empty_index() -> None:
+    """
+    An index without blocks finds nothing and survives serialization.
+    """
+    index = build(boxes=numpy.empty((0, 4)), cells=8)
+    index = BlockIndex.from_bytes(data=index.to_bytes())
+
+    assert len(index) == 0
+    assert index.intersecting(left=0, top=0, right=100, bottom=100) == []
+    assert index.nearest(x=50, y=50) is None
+
+
+def test_serialization_keeps_results(boxes: numpy.ndarray) -> None:
+    """
+    A deserialized index answers queries like the original one.
+    """
+    index = build(boxes=boxes, cells=16)
+    copy = BlockIndex.from_bytes(data=index.to_bytes())
+
+    assert copy.intersecting(left=10, top=10, right=60, bottom=40) == \
+        index.intersecting(left=10, top=10, right=60, bottom=40)
+    assert copy.nearest(x=33, y=77) == index.nearest(x=33, y=77)
@@ -0,0 +1,41 @@
+# ---------------------------------------------------------------------------- #
+
+import pytest
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.models import Label, LabelLink
+
+# ---------------------------------------------------------------------------- #
+
+
+def test_link_to_packed_block() -> None:
+    """
+    Block ids of packed pages ("<page id>:<index>") link to the page and the
+    block's position.
+    """
+    link = LabelLink.from_block_key(label=Label(), key="12:3")
+
+    assert link.block_id is None
+    assert (link.page_id, link.block_index) == (12, 3)
+    assert link.block_key == "12:3"
+
+
+def test_link_to_block_row() -> None:
+    """
+    Numeric block ids link to a block row.
+    """
+    link = LabelLink.from_block_key(label=Label(), key="42")
+
+    assert link.block_id == 42
+    assert link.page_id is None and link.block_index is None
+    assert link.block_key == 42
+
+
+@pytest.mark.parametrize("key", ["", "x", "1:", ":2", "1:2:3", "1.5"])
+def test_malformed_block_ids(key: str) -> None:
+    """
+    Malformed block ids are rejected (save_labels answers them with 400).
+    """
+    with pytest.raises(ValueError):
+        LabelLink.from_block_key(label=Label(), key=key)
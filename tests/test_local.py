@@ -0,0 +1,32 @@
+# ---------------------------------------------------------------------------- #
+
+import pathlib
+import pytest
+from PIL import Image
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.file.local import LocalFileProvider
+
+# ---------------------------------------------------------------------------- #
+
+
+def test_page_count_of_image(tmp_path: pathlib.Path) -> None:
+    """
+    Images have a single page.
+    """
+    path = tmp_path / "page.png"
+    Image.new("RGB", (40, 30), color=(255, 255, 255)).save(path)
+
+    assert LocalFileProvider().page_count(uri=str(path)) == 1
+
+
+def test_page_count_rejects_unsupported_files(tmp_path: pathlib.Path) -> None:
+    """
+    Files that are neither PDFs nor images are not counted as pages.
+    """
+    path = tmp_path / "notes.txt"
+    path.write_text("not an image")
+
+    with pytest.raises(Exception, match="could not be read"):
+        LocalFileProvider().page_count(uri=str(path))
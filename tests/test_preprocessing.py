@@ -0,0 +1,144 @@
+# ---------------------------------------------------------------------------- #
+
+import numpy
+import pytest
+from PIL import Image, ImageDraw
+from typing import List, Optional, Tuple
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.models import PageStatus
+from mrkr.src.ocr import BlockArray, OcrProviderFactory
+from mrkr.src.ocr.base import BaseOcrProvider
+from mrkr.src.ocr.executor import _run_ocr
+
+# ---------------------------------------------------------------------------- #
+
+Box = Tuple[int, int, int, int]
+
+# three "words", on two lines, far enough from the centre that a rotation by
+# a few degrees moves them by several percent of the page
+WORDS: List[Box] = [
+    (120, 250, 420, 290),
+    (600, 250, 900, 290),
+    (350, 1050, 650, 1090)
+]
+
+
+def find_glyphs(image: Image.Image) -> List[Box]:
+    """
+    Return the bounding boxes (left, top, right, bottom) of the dark areas
+    of an image, assuming that they are separated by blank rows and columns.
+    """
+    dark = numpy.asarray(image.convert("L")) < 128
+
+    def runs(mask: numpy.ndarray) -> List[Tuple[int, int]]:
+        indices = numpy.flatnonzero(mask)
+        if len(indices) == 0:
+            return []
+        breaks = numpy.flatnonzero(numpy.diff(indices) > 1)
+        starts = numpy.concatenate(([indices[0]], indices[breaks + 1]))
+        ends = numpy.concatenate((indices[breaks], [indices[-1]]))
+        return list(zip(starts.tolist(), ends.tolist()))
+
+    boxes = []
+    for top, bottom in runs(dark.any(axis=1)):
+        line = dark[top:bottom + 1]
+        for left, right in runs(line.any(axis=0)):
+            rows = runs(line[:, left:right + 1].any(axis=1))
+            boxes.append((left, top + rows[0][0], right + 1,
+                          top + rows[-1][1] + 1))
+
+    return boxes
+
+
+class GlyphOcrProvider(BaseOcrProvider):
+    """
+    Reports every dark area of an image as a word, so that the coordinates
+    of the results can be checked without an OCR engine.
+    """
+
+    def run_ocr(
+        self,
+        image: Image.Image,
+        timeout: Optional[float] = None
+    ) -> BlockArray:
+        boxes = find_glyphs(image)
+        return BlockArray.from_pixels(
+            content=[f"word{index}" for index in range(len(boxes))],
+            confidence=[90.0] * len(boxes),
+            left=[box[0] for box in boxes],
+            top=[box[1] for box in boxes],
+            width=[box[2] - box[0] for box in boxes],
+            height=[box[3] - box[1] for box in boxes],
+            dimensions=image.size
+        )
+
+# ---------------------------------------------------------------------------- #
+
+
+@pytest.mark.parametrize("angle", [-3.0, 2.0, 4.0])
+def test_deskewed_boxes_match_page(
+    monkeypatch: pytest.MonkeyPatch,
+    angle: float
+) -> None:
+    """
+    Words found on a deskewed and cropped page are reported where they are
+    on the page as it was rendered.
+    """
+    monkeypatch.setattr(
+        OcrProviderFactory, "get_provider",
+        staticmethod(lambda provider: GlyphOcrProvider()))
+
+    page = Image.new("L", (1000, 1400), color=255)
+    draw = ImageDraw.Draw(page)
+    for box in WORDS:
+        draw.rectangle(box, fill=0)
+
+    page = page.rotate(angle, resample=Image.Resampling.BICUBIC,
+                       fillcolor=255)
+
+    status, blocks = _run_ocr(
+        provider="glyphs",
+        mode=page.mode,
+        size=page.size,
+        data=page.tobytes(),
+        dpi=300,
+        preprocessing={"deskew": True, "crop_margins": True},
+        timeout=None
+    )
+
+    assert status == PageStatus.complete
+    assert len(blocks) == len(WORDS)
+
+    expected = sorted(
+        ((left + right) / 2 / page.width * 100,
+         (top + bottom) / 2 / page.height * 100)
+        for left, top, right, bottom in find_glyphs(page)
+    )
+    found = sorted(zip(blocks.left + blocks.width / 2,
+                       blocks.top + blocks.height / 2))
+
+    for (x, y), (expected_x, expected_y) in zip(found, expected):
+        assert x == pytest.approx(expected_x, abs=0.5)
+        assert y == pytest.approx(expected_y, abs=0.5)
+
+
+def test_unrotate_inverts_rotation() -> None:
+    """
+    A box on an image rotated counter-clockwise by 90 degrees is moved back
+    to its position on the unrotated image: right of the centre instead of
+    above it.
+    """
+    size = (800, 400)
+
+    rotated = BlockArray.from_pixels(
+        content=["a"], confidence=[90.0], left=[390], top=[90], width=[20],
+        height=[20], dimensions=size)
+
+    blocks = rotated.unrotate(angle=90.0, size=size)
+
+    assert blocks.left[0] == pytest.approx(490 / 8, abs=1e-3)
+    assert blocks.top[0] == pytest.approx(190 / 4, abs=1e-3)
+    assert blocks.width[0] == rotated.width[0]
+    assert blocks.height[0] == rotated.height[0]
@@ -0,0 +1,190 @@
+# ---------------------------------------------------------------------------- #
+
+import io
+import math
+import hashlib
+import pytest
+import moto
+from PIL import Image
+from typing import Any, Dict, Generator, List
+
+# ---------------------------------------------------------------------------- #
+
+from mrkr.src.config import config
+from mrkr.src.cache import spill_cache
+from mrkr.src.file.s3 import S3FileProvider
+
+# ---------------------------------------------------------------------------- #
+
+BUCKET = "mrkr"
+
+
+@pytest.fixture
+def s3(monkeypatch: pytest.MonkeyPatch) -> Generator[Any, None, None]:
+    """
+    Provide a client of a local S3 stand-in with an empty bucket.
+    """
+    monkeypatch.setenv("AWS_ACCESS_KEY_ID", "testing")
+    monkeypatch.setenv("AWS_SECRET_ACCESS_KEY", "testing")
+    monkeypatch.setenv("S3_REGION", "us-east-1")
+    monkeypatch.delenv("S3_ENDPOINT_URL", raising=False)
+
+    with moto.mock_aws():
+        monkeypatch.setattr(S3FileProvider, "_client", None)
+
+        client = S3FileProvider.client()
+        client.create_bucket(Bucket=BUCKET)
+
+        yield client
+
+    S3FileProvider._client = None
+
+
+@pytest.fixture
+def requests(s3: Any) -> List[Dict[str, Any]]:
+    """
+    Record the operations (and their parameters) sent to S3.
+    """
+    sent: List[Dict[str, Any]] = []
+
+    def record(model: Any, params: Dict[str, Any], **kwargs: Any) -> None:
+        sent.append({"operation": model.name, **params})
+
+    s3.meta.events.register("provide-client-params.s3.*", record)
+
+    return sent
+
+
+def operations(requests: List[Dict[str, Any]], name: str) -> List[Dict]:
+    """
+    Return the recorded requests of an operation (e.g. GetObject).
+    """
+    return [request for request in requests if request["operation"] == name]
+
+# ---------------------------------------------------------------------------- #
+
+
+def test_list_files_paginates(s3: Any, requests: List[Dict]) -> None:
+    """
+    Listings with more than 1000 objects are read page by page.
+    """
+    for index in range(1005):
+        s3.put_object(Bucket=BUCKET, Key=f"scans/{index:04}.pdf", Body=b"x")
+
+    s3.put_object(Bucket=BUCKET, Key="scans/nested/0.pdf", Body=b"x")
+    s3.put_object(Bucket=BUCKET, Key="scans/notes.txt", Body=b"x")
+
+    files = S3FileProvider().list_files(uri=f"{BUCKET}/scans/*.pdf")
+
+    assert len(files) == 1005
+    assert files[0].uri == f"s3://{BUCKET}/scans/0000.pdf"
+    assert len(operations(requests, "ListObjectsV2")) > 1
+
+
+def test_list_files_matches_per_segment(s3: Any) -> None:
+    """
+    Wildcards only match within a path segment, while '**/' matches any
+    number of directories.
+    """
+    for key in ("scans/a.pdf", "scans/nested/b.pdf", "scans/nested/c/d.pdf"):
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+
+    provider = S3FileProvider()
+
+    assert [file.name for file in provider.list_files(
+        uri=f"{BUCKET}/scans/*.pdf")] == ["a.pdf"]
+    assert [file.name for file in provider.list_files(
+        uri=f"{BUCKET}/scans/*/*.pdf")] == ["b.pdf"]
+    assert [file.name for file in provider.list_files(
+        uri=f"{BUCKET}/scans/**/*.pdf")] == ["a.pdf", "b.pdf", "d.pdf"]
+
+
+def test_list_files_without_wildcards(s3: Any) -> None:
+    """
+    A pattern without wildcards only matches the object of that name, not
+    the objects it is a prefix of.
+    """
+    for key in ("scans/a.pdf", "scans/a.pdf.bak", "scans/a.pdfx"):
+        s3.put_object(Bucket=BUCKET, Key=key, Body=b"x")
+
+    provider = S3FileProvider()
+
+    assert [file.name for file in provider.list_files(
+        uri=f"{BUCKET}/scans/a.pdf")] == ["a.pdf"]
+    assert provider.list_files(uri=f"{BUCKET}/scans/a") == []
+
+
+def test_etag_without_download(s3: Any, requests: List[Dict]) -> None:
+    """
+    Listings and checksums use the objects' etags instead of downloading
+    the objects.
+    """
+    content = b"%PDF-1.4 test"
+    s3.put_object(Bucket=BUCKET, Key="scans/a.pdf", Body=content)
+
+    provider = S3FileProvider()
+
+    files = provider.list_files(uri=f"{BUCKET}/scans/*.pdf")
+    checksum = provider.get_checksum(uri=files[0].uri)
+
+    assert files[0].etag == hashlib.md5(content).hexdigest()
+    assert checksum == files[0].etag
+    assert operations(requests, "GetObject") == []
+
+
+def test_download_with_ranges(
+    s3: Any,
+    requests: List[Dict],
+    monkeypatch: pytest.MonkeyPatch
+) -> None:
+    """
+    Objects are downloaded in ranges into the spill cache, and the cached
+    copy is used the next time.
+    """
+    monkeypatch.setattr(config.s3, "range_size", 1000)
+
+    content = bytes(range(256)) * 20
+    s3.put_object(Bucket=BUCKET, Key="scans/a.bin", Body=content)
+
+    provider = S3FileProvider()
+    uri = f"s3://{BUCKET}/scans/a.bin"
+
+    with provider.local_file(uri=uri) as path:
+        assert path.read_bytes() == content
+
+    ranges = [request["Range"]
+              for request in operations(requests, "GetObject")]
+
+    assert len(ranges) == math.ceil(len(content) / 1000)
+    assert "bytes=5000-5119" in ranges
+
+    etag = provider.get_checksum(uri=uri)
+    assert spill_cache.get(key=spill_cache.key(uri, etag)) is not None
+
+    # the second copy is served from the spill cache
+    with provider.local_file(uri=uri) as path:
+        assert path.read_bytes() == content
+
+    assert len(operations(requests, "GetObject")) == len(ranges)
+
+
+def test_file_to_image(s3: Any) -> None:
+    """
+    Images stored in S3 are rendered like local ones.
+    """
+    image = Image.new("RGB", (120, 80), color=(200, 10, 10))
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG")
+
+    s3.put_object(Bucket=BUCKET, Key="scans/page.png",
+                  Body=buffer.getvalue())
+
+    images = S3FileProvider().file_to_image(
+        uri=f"s3://{BUCKET}/scans/page.png")
+
+    assert len(images) == 1
+    assert images[0].size == (120, 80)
+    assert images[0].getpixel((10, 10)) == (200, 10, 10)
+
+# ---------------------------------------------------------------------------- #